@@ -0,0 +1,151 @@
+# accounts/autenticacion.py
+"""
+Autenticación JWT sin consultar el usuario en cada petición.
+
+JWTAuthentication de simplejwt carga el Usuario de la base en cada petición
+y request.user.cliente hace otra consulta más adelante (permisos, filtros
+por cliente, dashboard). Aquí el token lleva como claims lo que esas partes
+leen: username, nombre, apellido, rol, cliente_id y el nombre del cliente
+(TokenConDatosSerializer en /login/; el refresh los copia al nuevo access).
+JWTSinConsultaAuthentication arma con ellos una instancia de Usuario sin ir
+a la base: las demás columnas quedan diferidas (si algo las lee, Django las
+carga) y request.user.cliente es un Cliente con id y nombre.
+
+Para que desactivar un usuario o cambiarle rol o cliente surta efecto sin
+esperar a que venza el token, los claims se comparan con el usuario guardado
+en una caché del proceso de USUARIOS_CACHE_TTL segundos: a lo sumo una
+consulta por usuario y TTL en cada proceso. Si cambió, el token se rechaza y
+hay que iniciar sesión de nuevo. Los tokens emitidos sin estos claims se
+autentican como antes, consultando la base. Los tokens revocados se
+rechazan antes de todo esto (accounts/revocacion.py).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from partners.models import Cliente
+from .models import Usuario
+from .revocacion import comprobar_revocacion
+
+# Claims con el mismo nombre que la columna de Usuario
+CLAIMS_USUARIO = ('username', 'nombre', 'apellido', 'rol', 'cliente_id', 'is_staff', 'is_superuser')
+CLAIM_CLIENTE_NOMBRE = 'cliente_nombre'
+
+_lock = threading.Lock()
+_usuarios = {}  # id -> (expira, usuario)
+# Cambia con cada invalidación: una consulta que empezó antes no guarda su resultado
+_generacion = 0
+
+
+class TokenConDatosSerializer(TokenObtainPairSerializer):
+    """Login: agrega al token los datos del usuario que lee JWTSinConsultaAuthentication"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in CLAIMS_USUARIO:
+            token[claim] = getattr(user, claim)
+        token[CLAIM_CLIENTE_NOMBRE] = user.cliente.nombre if user.cliente_id else None
+        return token
+
+
+def _instancia(modelo, datos):
+    """Instancia como si viniera de la base con solo esas columnas; el resto queda diferido"""
+    # from_db espera los valores en el orden de los campos del modelo
+    nombres = [f.attname for f in modelo._meta.concrete_fields if f.attname in datos]
+    return modelo.from_db(DEFAULT_DB_ALIAS, nombres, [datos[nombre] for nombre in nombres])
+
+
+def usuario_desde_token(token):
+    """Usuario armado con los claims del token, sin consultar la base; None si el token no los trae"""
+    if any(claim not in token for claim in CLAIMS_USUARIO):
+        return None
+    datos = {claim: token[claim] for claim in CLAIMS_USUARIO}
+    datos[jwt_settings.USER_ID_FIELD] = token[jwt_settings.USER_ID_CLAIM]
+    datos['is_active'] = True
+    usuario = _instancia(Usuario, datos)
+
+    cliente = None
+    if usuario.cliente_id:
+        cliente = _instancia(Cliente, {'id': usuario.cliente_id, 'nombre': token.get(CLAIM_CLIENTE_NOMBRE)})
+    Usuario.cliente.field.set_cached_value(usuario, cliente)
+    return usuario
+
+
+def en_cache(usuario_id):
+    """Usuario guardado si está en caché y vigente, sin consultar la base"""
+    with _lock:
+        entrada = _usuarios.get(usuario_id)
+    if entrada is None or entrada[0] < time.monotonic():
+        return None
+    return entrada[1]
+
+
+def usuario_guardado(usuario_id):
+    """
+    Usuario completo (con su cliente) desde la caché del proceso, o None si
+    no existe. La instancia es compartida entre peticiones: no modificarla.
+    """
+    usuario = en_cache(usuario_id)
+    if usuario is not None:
+        return usuario
+
+    generacion = _generacion
+    usuario = Usuario.objects.select_related('cliente').filter(pk=usuario_id).first()
+    if usuario is not None:
+        with _lock:
+            if generacion == _generacion:
+                _usuarios[usuario_id] = (time.monotonic() + settings.USUARIOS_CACHE_TTL, usuario)
+    return usuario
+
+
+def comprobar_vigencia(usuario, guardado):
+    """Rechaza el token si el usuario ya no existe, está inactivo o cambió de rol o cliente"""
+    if guardado is None or not guardado.is_active:
+        raise AuthenticationFailed('El usuario está inactivo', code='user_inactive')
+    if (guardado.rol, guardado.cliente_id) != (usuario.rol, usuario.cliente_id):
+        raise InvalidToken('Los datos del usuario cambiaron: inicie sesión de nuevo')
+
+
+def invalidar_usuario(usuario_id):
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _usuarios.pop(usuario_id, None)
+
+
+def limpiar():
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _usuarios.clear()
+
+
+class JWTSinConsultaAuthentication(JWTAuthentication):
+    """JWTAuthentication con el usuario armado desde los claims del token"""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        comprobar_revocacion(token)
+        return token
+
+    def get_user(self, validated_token):
+        usuario = usuario_desde_token(validated_token)
+        if usuario is None:
+            return super().get_user(validated_token)
+        comprobar_vigencia(usuario, usuario_guardado(usuario.pk))
+        return usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def usuario_modificado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
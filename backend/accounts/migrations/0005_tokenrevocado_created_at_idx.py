@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_tokens_revocados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tokenrevocado',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -54,3 +54,24 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return f'{self.nombre} {self.apellido} ({self.rol})'
+
+
+class TokenRevocado(models.Model):
+    """
+    Revocaciones de JWT (accounts/revocacion.py). Cada fila revoca un token
+    puntual (jti) o todos los de un usuario emitidos antes de `emitidos_hasta`.
+    Cada proceso relee solo las filas creadas desde su último refresco.
+    """
+    jti = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, null=True, blank=True, related_name='revocaciones')
+    emitidos_hasta = models.DateTimeField(null=True, blank=True)
+    # Después de esta fecha los tokens revocados ya vencieron: la fila se puede borrar
+    expira = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Token revocado'
+        verbose_name_plural = 'Tokens revocados'
+
+    def __str__(self):
+        return self.jti or f'Usuario {self.usuario_id} hasta {self.emitidos_hasta}'
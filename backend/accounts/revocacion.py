@@ -0,0 +1,137 @@
+# accounts/revocacion.py
+"""
+Revocación de JWT.
+
+Los tokens duran un año y no se usa la blacklist de simplejwt: sin esto la
+única forma de dejar fuera a un usuario era cambiar SECRET_KEY. Cada
+revocación es una fila de TokenRevocado: un token puntual por su jti (cierre
+de sesión) o todos los tokens de un usuario emitidos hasta ese momento
+(acción revocar-tokens de UsuarioViewSet).
+
+Consultar la tabla en cada petición sumaría latencia a todas. Cada proceso
+tiene en memoria el conjunto de jti revocados y el corte (iat) por usuario,
+y cada TOKENS_REVOCADOS_REFRESCO segundos lee solo las filas recientes.
+Comprobar un token es una búsqueda en un set y un dict, casi siempre sin
+tocar la base. Lo revocado en este proceso se aplica al confirmar la
+transacción; en los demás, en su próximo refresco.
+
+El id no sirve como versión: una transacción que tomó un id menor puede
+confirmarse después de otra con id mayor y esa fila no se vería nunca. Cada
+refresco relee desde el anterior menos TOKENS_REVOCADOS_MARGEN segundos;
+volver a aplicar una fila ya vista no cambia nada.
+
+El iat de los tokens tiene resolución de segundos. El corte se guarda
+truncado al segundo y se revocan los tokens emitidos antes de ese segundo:
+un login inmediatamente posterior a la revocación sigue siendo válido, a
+cambio de que también lo sea un token emitido en el mismo segundo, justo
+antes de revocar.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import TokenRevocado
+
+_lock = threading.Lock()
+_jtis = set()
+_cortes = {}  # usuario_id -> se revocan los tokens con iat menor
+_desde = None  # created_at desde el que lee el próximo refresco; None: toda la tabla
+_proximo_refresco = 0.0
+
+
+def _aplicar(filas):
+    """filas: (jti, usuario_id, emitidos_hasta); llamar con _lock tomado"""
+    for jti, usuario_id, emitidos_hasta in filas:
+        if jti:
+            _jtis.add(jti)
+        elif usuario_id and emitidos_hasta:
+            corte = int(emitidos_hasta.timestamp())
+            if corte > _cortes.get(usuario_id, -1):
+                _cortes[usuario_id] = corte
+
+
+def _aplicar_al_confirmar(filas):
+    def aplicar():
+        with _lock:
+            _aplicar(filas)
+    transaction.on_commit(aplicar)
+
+
+def necesita_refresco():
+    return time.monotonic() >= _proximo_refresco
+
+
+def refrescar():
+    """Aplica las revocaciones creadas desde el refresco anterior (con margen) que no vencieron"""
+    global _desde, _proximo_refresco
+    ahora = timezone.now()
+    filas = TokenRevocado.objects.filter(expira__gt=ahora)
+    if _desde is not None:
+        filas = filas.filter(created_at__gte=_desde)
+    filas = list(filas.values_list('jti', 'usuario_id', 'emitidos_hasta'))
+    with _lock:
+        _aplicar(filas)
+        _desde = ahora - timedelta(seconds=settings.TOKENS_REVOCADOS_MARGEN)
+        _proximo_refresco = time.monotonic() + settings.TOKENS_REVOCADOS_REFRESCO
+
+
+def revocado_en_memoria(token):
+    """¿Token revocado según lo que ya conoce el proceso? No consulta la base"""
+    if token.get(jwt_settings.JTI_CLAIM) in _jtis:
+        return True
+    corte = _cortes.get(token.get(jwt_settings.USER_ID_CLAIM))
+    return corte is not None and token.get('iat', 0) < corte
+
+
+def comprobar_revocacion(token):
+    if necesita_refresco():
+        refrescar()
+    if revocado_en_memoria(token):
+        raise InvalidToken('El token fue revocado')
+
+
+def revocar_token(token):
+    """Revoca un token puntual (access o refresh) por su jti"""
+    jti = token[jwt_settings.JTI_CLAIM]
+    TokenRevocado.objects.get_or_create(jti=jti, defaults={
+        'usuario_id': token.get(jwt_settings.USER_ID_CLAIM),
+        'expira': datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+    })
+    _aplicar_al_confirmar([(jti, None, None)])
+
+
+def revocar_usuario(usuario):
+    """Revoca los tokens del usuario emitidos antes del segundo actual; retorna la fecha de corte"""
+    ahora = timezone.now().replace(microsecond=0)
+    # Un access obtenido con refresh conserva el iat del login: vence a más tardar en la vida más larga
+    vida = max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME)
+    TokenRevocado.objects.create(usuario=usuario, emitidos_hasta=ahora, expira=ahora + vida)
+    # Las revocaciones de tokens ya vencidos no hacen falta
+    TokenRevocado.objects.filter(expira__lte=ahora).delete()
+    _aplicar_al_confirmar([(None, usuario.pk, ahora)])
+    return ahora
+
+
+def limpiar():
+    """Olvida lo cargado en memoria; el próximo chequeo relee la tabla completa"""
+    global _desde, _proximo_refresco
+    with _lock:
+        _jtis.clear()
+        _cortes.clear()
+        _desde = None
+        _proximo_refresco = 0.0
+
+
+class RefreshSinRevocadosSerializer(TokenRefreshSerializer):
+    """token/refresh/: un refresh revocado no emite nuevos access"""
+
+    def validate(self, attrs):
+        comprobar_revocacion(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
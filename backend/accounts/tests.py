@@ -1,5 +1,10 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from .models import Usuario
@@ -67,4 +72,154 @@ class UsuarioTest(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('results', response.data)  # Paginado
\ No newline at end of file
+        self.assertIn('results', response.data)  # Paginado
+
+class AutenticacionClaimsTests(APITestCase):
+    """El usuario se arma desde los claims del token, sin consultar la base"""
+
+    def setUp(self):
+        from partners.models import Cliente
+        from .autenticacion import limpiar
+
+        limpiar()
+        self.addCleanup(limpiar)
+        self.empresa = Cliente.objects.create(nombre='Empresa Uno', nit='E-1')
+        self.usuario = Usuario.objects.create_user(
+            username='cliente1', password='pass123', nombre='Ana', apellido='Ruiz', rol='cliente', cliente=self.empresa
+        )
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'cliente1', 'password': 'pass123'}, format='json')
+        self.token = response.data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_claims_y_me_sin_consultas(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        token = AccessToken(self.token)
+        self.assertEqual((token['rol'], token['cliente_id'], token['cliente_nombre']), ('cliente', self.empresa.id, 'Empresa Uno'))
+
+        self.client.get(reverse('me'))  # llena la caché del usuario
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cliente_info'], {'id': self.empresa.id, 'nombre': 'Empresa Uno'})
+        self.assertEqual(response.data['nombre'], 'Ana')
+
+    def test_rechaza_usuario_inactivo_o_con_otro_rol(self):
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_200_OK)
+
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.usuario.is_active = True
+        self.usuario.rol = 'operador'
+        self.usuario.cliente = None
+        self.usuario.save()
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_sin_claims_sigue_valido(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.usuario)}')
+        response = self.client.get(reverse('me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['username'], 'cliente1')
+
+
+class RevocacionTokensTests(APITestCase):
+    """Tokens revocados por jti (logout) o por usuario (acción del admin)"""
+
+    def setUp(self):
+        from .autenticacion import limpiar as limpiar_usuarios
+        from .revocacion import limpiar
+
+        for funcion in (limpiar, limpiar_usuarios):
+            funcion()
+            self.addCleanup(funcion)
+        self.admin = Usuario.objects.create_user(username='admin', password='admin', nombre='Admin', apellido='Admin', rol='admin')
+        self.conductor = Usuario.objects.create_user(username='cond', password='cond', nombre='Juan', apellido='Pérez', rol='conductor')
+
+    def _login(self, username):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': username}, format='json')
+        return response.data
+
+    def _me(self, access):
+        return self.client.get(reverse('me'), HTTP_AUTHORIZATION=f'Bearer {access}').status_code
+
+    def _tokens_anteriores(self, usuario):
+        """Par de tokens emitido un minuto antes: en un segundo anterior al de la revocación"""
+        from .autenticacion import TokenConDatosSerializer
+
+        refresh = TokenConDatosSerializer.get_token(usuario)
+        refresh.set_iat(at_time=refresh.current_time - timedelta(minutes=1))
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+    def test_admin_revoca_todos_los_tokens_del_usuario(self):
+        tokens = self._tokens_anteriores(self.conductor)
+        admin = self._login('admin')['access']
+        self.assertEqual(self._me(tokens['access']), status.HTTP_200_OK)
+
+        url = reverse('usuarios-revocar-tokens', args=[self.conductor.id])
+        self.assertEqual(
+            self.client.post(url, HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}').status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, HTTP_AUTHORIZATION=f'Bearer {admin}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Rechazado en este proceso sin consultar la tabla, y el refresh no emite nuevos
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._me(tokens['access']), status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse([q for q in ctx.captured_queries if 'accounts_tokenrevocado' in q['sql']])
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._me(admin), status.HTTP_200_OK)
+
+    def test_otro_proceso_ve_la_revocacion_al_refrescar(self):
+        from .revocacion import limpiar, revocar_usuario
+
+        access = self._tokens_anteriores(self.conductor)['access']
+        revocar_usuario(self.conductor)  # sin aplicar en memoria: como si fuera otro proceso
+        limpiar()
+        self.assertEqual(self._me(access), status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_en_el_segundo_de_la_revocacion_es_valido(self):
+        from .revocacion import revocar_usuario
+
+        anterior = self._tokens_anteriores(self.conductor)['access']
+        with self.captureOnCommitCallbacks(execute=True):
+            revocar_usuario(self.conductor)
+        self.assertEqual(self._me(anterior), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._me(self._login('cond')['access']), status.HTTP_200_OK)
+
+    def test_refresco_ve_revocaciones_confirmadas_tarde(self):
+        from .models import TokenRevocado
+        from .revocacion import refrescar, revocado_en_memoria
+
+        expira = timezone.now() + timedelta(days=1)
+        tarde_id = TokenRevocado.objects.create(jti='tarde', expira=expira).id
+        TokenRevocado.objects.create(jti='pronto', expira=expira)
+        # La fila con id menor todavía no está confirmada cuando este proceso refresca
+        TokenRevocado.objects.filter(id=tarde_id).delete()
+        refrescar()
+        self.assertTrue(revocado_en_memoria({'jti': 'pronto'}))
+        self.assertFalse(revocado_en_memoria({'jti': 'tarde'}))
+
+        TokenRevocado.objects.create(id=tarde_id, jti='tarde', expira=expira)
+        refrescar()
+        self.assertTrue(revocado_en_memoria({'jti': 'tarde'}))
+
+    def test_logout_revoca_access_y_refresh(self):
+        tokens = self._login('cond')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('logout'), {'refresh': tokens['refresh']}, format='json',
+                HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}'
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._me(tokens['access']), status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        # Un login nuevo no queda afectado
+        self.assertEqual(self._me(self._login('cond')['access']), status.HTTP_200_OK)
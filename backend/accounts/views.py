@@ -6,6 +6,12 @@ from .permissions import IsAdminRole
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .revocacion import revocar_token, revocar_usuario
 
 class UsuarioViewSet(viewsets.ModelViewSet):
     queryset = Usuario.objects.all().order_by('id')
@@ -17,6 +23,16 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     search_fields = ['username', 'nombre', 'apellido']
     filterset_fields = ['rol', 'is_active']
     ordering_fields = ['id', 'username', 'nombre', 'apellido']
+
+    @action(detail=True, methods=['post'], url_path='revocar-tokens')
+    def revocar_tokens(self, request, pk=None):
+        """Cierra todas las sesiones del usuario: revoca los tokens emitidos hasta ahora"""
+        usuario = self.get_object()
+        corte = revocar_usuario(usuario)
+        return Response({
+            'detail': f'Tokens de {usuario.username} revocados',
+            'revocados_hasta': corte,
+        })
     
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
@@ -31,3 +47,22 @@ class MeView(APIView):
                 'nombre': request.user.cliente.nombre
             }
         return Response(data)
+
+
+class LogoutView(APIView):
+    """Cierra la sesión: revoca el access en uso y el refresh si se envía"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh = RefreshToken(refresh)
+            except TokenError:
+                return Response({'detail': 'Refresh token inválido'}, status=status.HTTP_400_BAD_REQUEST)
+            if refresh.get(jwt_settings.USER_ID_CLAIM) != request.user.pk:
+                return Response({'detail': 'El refresh token es de otro usuario'}, status=status.HTTP_400_BAD_REQUEST)
+            revocar_token(refresh)
+        if request.auth is not None:
+            revocar_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
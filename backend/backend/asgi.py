@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Servido por ASGI: usar las vistas async de por-codigo, estado-verificacion y dashboard
+os.environ.setdefault('VISTAS_ASINCRONAS', 'True')
 
 application = get_asgi_application()
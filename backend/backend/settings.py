@@ -161,6 +161,68 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Etiquetas: unidades leídas por bloque del cursor al generar el PDF
+ETIQUETAS_CHUNK_SIZE = int(os.getenv('ETIQUETAS_CHUNK_SIZE', '500'))
+# Máximo de páginas de etiquetas que se generan dentro del request; rangos mayores se encolan (202)
+ETIQUETAS_MAX_PAGINAS_SINCRONO = int(os.getenv('ETIQUETAS_MAX_PAGINAS_SINCRONO', '500'))
+
+# Unidades insertadas por bulk_create al generar las unidades de una carga
+UNIDADES_BATCH_SIZE = int(os.getenv('UNIDADES_BATCH_SIZE', '2000'))
+
+# Caché en memoria de códigos de barras escaneados (por proceso): vigencia en segundos y máximo de códigos
+CODIGOS_CACHE_TTL = int(os.getenv('CODIGOS_CACHE_TTL', '300'))
+CODIGOS_CACHE_MAX = int(os.getenv('CODIGOS_CACHE_MAX', '20000'))
+
+# Autenticación JWT por claims: segundos que cada proceso reutiliza el usuario guardado para comprobar
+# que sigue activo y con el mismo rol y cliente que dice el token
+USUARIOS_CACHE_TTL = int(os.getenv('USUARIOS_CACHE_TTL', '60'))
+
+# Revocación de tokens: cada cuántos segundos cada proceso lee las revocaciones nuevas de la base
+TOKENS_REVOCADOS_REFRESCO = int(os.getenv('TOKENS_REVOCADOS_REFRESCO', '5'))
+# Segundos que cada refresco relee hacia atrás: cubre revocaciones confirmadas tarde
+TOKENS_REVOCADOS_MARGEN = int(os.getenv('TOKENS_REVOCADOS_MARGEN', '60'))
+
+# Buscador de cargas y envíos: máximo de resultados por relevancia que devuelve ?search=
+BUSQUEDA_MAX_RESULTADOS = int(os.getenv('BUSQUEDA_MAX_RESULTADOS', '500'))
+
+# Trabajos de documentos en segundo plano (comando procesar_trabajos)
+TRABAJOS_CACHE_TTL = int(os.getenv('TRABAJOS_CACHE_TTL', '300'))  # segundos que se reutiliza un PDF ya generado
+TRABAJOS_TIMEOUT = int(os.getenv('TRABAJOS_TIMEOUT', '1800'))  # segundos antes de considerar colgado un trabajo
+TRABAJOS_MAX_INTENTOS = int(os.getenv('TRABAJOS_MAX_INTENTOS', '3'))
+TRABAJOS_INTERVALO = float(os.getenv('TRABAJOS_INTERVALO', '2'))  # espera del worker con la cola vacía
+
+# Sincronización offline de escaneos: segundos que cada sincronización relee antes del servidor_ts anterior
+ESCANEOS_SYNC_MARGEN = int(os.getenv('ESCANEOS_SYNC_MARGEN', '60'))
+
+# Caché en disco de PDFs generados (acta de entrega, cuenta de cobro, consolidado)
+DOCUMENTOS_CACHE_DIR = os.getenv('DOCUMENTOS_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'documentos'))
+DOCUMENTOS_CACHE_MAX_BYTES = int(os.getenv('DOCUMENTOS_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+# Segundos entre recuentos del tamaño real de la caché (entre uno y otro se estima por proceso)
+DOCUMENTOS_CACHE_RECUENTO = int(os.getenv('DOCUMENTOS_CACHE_RECUENTO', '300'))
+
+# Caché de Django (memoria local por defecto; con varios procesos usar archivo, p.ej.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache y CACHE_LOCATION=/var/tmp/logistic)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'logistic-app'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '2000'))},
+    }
+}
+
+# Segundos que se reutiliza una respuesta del dashboard
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+
+# Eventos en tiempo real de envíos (SSE): segundos entre pings y espera del navegador antes de reconectar
+EVENTOS_HEARTBEAT = int(os.getenv('EVENTOS_HEARTBEAT', '15'))
+EVENTOS_RECONEXION_MS = int(os.getenv('EVENTOS_RECONEXION_MS', '3000'))
+# Vigencia en segundos del ticket de un solo uso para abrir un stream; los tickets
+# canjeados se registran en CACHES (debe ser compartida si hay varios procesos)
+TICKET_STREAM_TTL = int(os.getenv('TICKET_STREAM_TTL', '60'))
+
+# Vistas async para consultas frecuentes y el dashboard (asgi.py la activa por defecto)
+VISTAS_ASINCRONAS = os.getenv('VISTAS_ASINCRONAS', 'False') == 'True'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -170,7 +232,7 @@ AUTH_USER_MODEL = 'accounts.Usuario'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.autenticacion.JWTSinConsultaAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -204,6 +266,10 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    # Login con rol y cliente en los claims (accounts/autenticacion.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.autenticacion.TokenConDatosSerializer',
+    # Refresh que rechaza tokens revocados (accounts/revocacion.py)
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.revocacion.RefreshSinRevocadosSerializer',
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
     'JTI_CLAIM': 'jti',
@@ -233,6 +299,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://31.97.10.251:5173",
     "http://31.97.10.251",
 ]
+# Cabeceras que el frontend puede leer (nombre de archivo y total de páginas de etiquetas)
+CORS_EXPOSE_HEADERS = ['Content-Disposition', 'X-Total-Paginas']
 
 # Configuración adicional para desarrollo
 if not USING_ENV_FILE:
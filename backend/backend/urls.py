@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/', include('cargas.urls')),
     path('api/', include('envios.urls')),
     path('api/', include('dashboard.urls')),
+    path('api/', include('core.urls')),
     
 ]
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CargasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cargas'
+
+    def ready(self):
+        from . import codigos  # noqa: F401
@@ -0,0 +1,144 @@
+# cargas/codigos.py
+"""
+Caché de resolución de códigos de barras.
+
+Escanear es el camino más frecuente: por-codigo, la validación de los
+serializers de escaneo y agregar_item buscan la misma Unidad por
+codigo_barra, a veces dos veces en la misma petición. `resolver_codigo`
+guarda en memoria del proceso los datos de la unidad (id, estado, carga,
+cliente y producto) y las siguientes búsquedas no tocan la base.
+
+El estado se invalida al guardar una Unidad y en los UPDATE en bloque que
+cambian estados (reservas, liberación y despacho), que deben llamar a
+`invalidar_unidades`. Con varios procesos cada uno tiene su copia y otro
+proceso puede ver un estado viejo hasta CODIGOS_CACHE_TTL segundos: la
+reserva (reservar_unidades) vuelve a comprobar el estado con la fila
+bloqueada, así que un dato viejo termina en 409 y no en una doble asignación.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Carga, CargaItem, Unidad
+
+CAMPOS = {
+    'carga_id': F('carga_item__carga_id'),
+    'cliente_id': F('carga_item__carga__cliente_id'),
+    'cliente_nombre': F('carga_item__carga__cliente__nombre'),
+    'producto_id': F('carga_item__producto_id'),
+    'producto_nombre': F('carga_item__producto__nombre'),
+    'producto_sku': F('carga_item__producto__sku'),
+    'remision': F('carga_item__carga__remision'),
+}
+
+_lock = threading.Lock()
+_por_codigo = OrderedDict()  # codigo -> (expira, datos)
+_codigo_por_id = {}
+# Cambia con cada invalidación: una consulta que empezó antes no guarda su resultado
+_generacion = 0
+
+
+def _quitar(codigo):
+    entrada = _por_codigo.pop(codigo, None)
+    if entrada is not None:
+        _codigo_por_id.pop(entrada[1]['id'], None)
+
+
+def valores_unidades(queryset):
+    """
+    Filas planas (dicts) de las unidades con los datos de su carga, cliente y
+    producto en una consulta, sin instanciar modelos. Las usan resolver_codigo
+    y el listado de unidades (serializers.representar_unidad).
+    """
+    return queryset.values('id', 'codigo_barra', 'estado', 'carga_item_id', 'created_at', **CAMPOS)
+
+
+def en_cache(codigo_barra):
+    """Datos de la unidad si están en caché y vigentes, sin consultar la base"""
+    with _lock:
+        entrada = _por_codigo.get(codigo_barra)
+        if entrada is None:
+            return None
+        if entrada[0] < time.monotonic():
+            _quitar(codigo_barra)
+            return None
+        _por_codigo.move_to_end(codigo_barra)
+        return dict(entrada[1])
+
+
+def resolver_codigo(codigo_barra):
+    """
+    Datos de la unidad con ese código (dict con id, codigo_barra, estado,
+    carga_item_id, carga_id, cliente_id, producto_id, nombres y created_at)
+    o None si no existe. Los códigos inexistentes no se guardan.
+    """
+    datos = en_cache(codigo_barra)
+    if datos is not None:
+        return datos
+
+    generacion = _generacion
+    datos = valores_unidades(Unidad.objects.filter(codigo_barra=codigo_barra)).first()
+    if datos is None:
+        return None
+
+    with _lock:
+        if generacion == _generacion:
+            _quitar(codigo_barra)
+            _por_codigo[codigo_barra] = (time.monotonic() + settings.CODIGOS_CACHE_TTL, datos)
+            _codigo_por_id[datos['id']] = codigo_barra
+            while len(_por_codigo) > settings.CODIGOS_CACHE_MAX:
+                _quitar(next(iter(_por_codigo)))
+    return dict(datos)
+
+
+def _invalidar(codigos, ids):
+    global _generacion
+    ids = list(ids) if _por_codigo else []
+    with _lock:
+        _generacion += 1
+        if not _por_codigo:
+            return
+        for unidad_id in ids:
+            codigo = _codigo_por_id.get(unidad_id)
+            if codigo is not None:
+                _quitar(codigo)
+        for codigo in codigos:
+            _quitar(codigo)
+
+
+def invalidar_unidades(codigos=(), ids=()):
+    """
+    Descarta de la caché las unidades indicadas por código o por id (lista o
+    queryset de ids, que solo se evalúa si la caché tiene entradas). Se repite
+    al confirmar la transacción para no guardar lo leído antes del commit.
+    """
+    codigos = list(codigos)
+    _invalidar(codigos, ids)
+    transaction.on_commit(lambda: _invalidar(codigos, ids))
+
+
+def limpiar():
+    global _generacion
+    with _lock:
+        _generacion += 1
+        _por_codigo.clear()
+        _codigo_por_id.clear()
+
+
+@receiver(post_save, sender=Unidad)
+def unidad_guardada(sender, instance, **kwargs):
+    invalidar_unidades(codigos=[instance.codigo_barra], ids=[instance.id])
+
+
+@receiver(post_delete, sender=Carga)
+@receiver(post_delete, sender=CargaItem)
+def carga_eliminada(sender, **kwargs):
+    # Sus unidades se borran en cascada sin señales: vaciar la caché completa
+    limpiar()
+    transaction.on_commit(limpiar)
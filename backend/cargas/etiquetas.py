@@ -0,0 +1,170 @@
+# cargas/etiquetas.py
+import tempfile
+
+from django.conf import settings
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import mm, landscape
+from reportlab.graphics.barcode import code128
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph
+from reportlab.lib.enums import TA_CENTER
+
+from .models import Unidad
+
+
+# Tamaño de los bloques leídos del archivo temporal al hacer streaming
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class EtiquetasRenderer:
+    """
+    Motor de etiquetas para una carga.
+    1 unidad = 1 página (100x80mm, landscape)
+    - Barcode: 80mm ancho x 22mm alto, centrado
+    - Tipografía: Helvetica, 12pt (líneas)
+
+    Los estilos, la geometría y los párrafos de texto se calculan una sola vez
+    (el texto depende solo de la carga y del producto), de modo que por unidad
+    solo se construye el Code128. Las unidades se recorren con un cursor en
+    bloques, sin cargar todas las filas a la vez. El canvas de ReportLab sí
+    mantiene las páginas en memoria hasta save(): las cargas muy grandes se
+    generan en segundo plano (core/trabajos.py).
+    """
+
+    label_w, label_h = 100*mm, 80*mm
+    margin = 5*mm
+    # Medidas del barcode optimizadas para escaneo
+    target_bw = 80*mm
+    target_bh = 22*mm
+
+    def __init__(self, carga, item_id=None, chunk_size=None):
+        self.carga = carga
+        self.item_id = item_id
+        self.chunk_size = chunk_size or getattr(settings, 'ETIQUETAS_CHUNK_SIZE', 500)
+
+        self.page_size = landscape((self.label_w, self.label_h))
+        self.inner_w = self.label_w - 2*self.margin
+        # Posición vertical fija del barcode dentro de la etiqueta
+        self.barcode_y = self.label_h - self.margin - self.target_bh - (5*mm)
+
+        styles = getSampleStyleSheet()
+        self.base_style = ParagraphStyle(
+            'LabelBase',
+            parent=styles['Normal'],
+            alignment=TA_CENTER,
+            fontName='Helvetica',      # Core PDF font
+            fontSize=12,               # texto general
+            leading=13
+        )
+        self._lineas_por_item = {}
+
+    def get_queryset(self):
+        """Unidades de la carga (opcionalmente de un item) en orden de impresión"""
+        qs = Unidad.objects.filter(carga_item__carga=self.carga)
+        if self.item_id:
+            qs = qs.filter(carga_item_id=self.item_id)
+        return qs.order_by('id')
+
+    def total_paginas(self):
+        return self.get_queryset().count()
+
+    def _lineas_texto(self, carga_item_id):
+        """Párrafos ya maquetados para las unidades de un item (se calculan una vez)"""
+        lineas = self._lineas_por_item.get(carga_item_id)
+        if lineas is not None:
+            return lineas
+
+        if not self._lineas_por_item:
+            # Primera llamada: cargar todos los items de la carga en una sola consulta
+            self._productos = {
+                item.id: item.producto
+                for item in self.carga.items.select_related('producto')
+            }
+
+        producto = self._productos[carga_item_id]
+        carga = self.carga
+        paragraphs = [
+            Paragraph(f"<b>CLIENTE:</b> {carga.cliente.nombre[:24]}", self.base_style),
+            Paragraph(f"<b>PRODUCTO:</b> {producto.nombre[:24]}", self.base_style),
+            Paragraph(f"<b>REM:</b> {carga.remision} <b>DEST:</b> {carga.destino}", self.base_style),
+        ]
+
+        lineas = []
+        y = 8*mm
+        for p in paragraphs:
+            p.wrap(self.inner_w, 12*mm)
+            lineas.append((p, y))
+            y += p.height + (1.0*mm)
+
+        self._lineas_por_item[carga_item_id] = lineas
+        return lineas
+
+    def _dibujar_barcode(self, c, codigo):
+        # humanReadable para que aparezca el ID debajo del código
+        bcode = code128.Code128(codigo, barHeight=self.target_bh, humanReadable=True)
+        nat_w, _ = bcode.wrap(0, 0)
+
+        # Escala para ocupar el ancho objetivo dejando "Quiet Zone" a los lados.
+        # No escalamos en Y para mantener la proporción de las barras nítida.
+        sx = float(self.target_bw) / float(nat_w) if nat_w else 1.0
+        bx = (self.label_w - (nat_w * sx)) / 2.0
+
+        c.saveState()
+        c.translate(bx, self.barcode_y)
+        c.scale(sx, 1.0)
+        bcode.drawOn(c, 0, 0)
+        c.restoreState()
+
+    def render(self, destino, pagina_desde=None, pagina_hasta=None):
+        """
+        Escribe el PDF en `destino` (ruta o archivo binario).
+        pagina_desde/pagina_hasta son 1-based e inclusivas.
+        Retorna el número de páginas generadas.
+        """
+        qs = self.get_queryset()
+        if pagina_desde or pagina_hasta:
+            inicio = (pagina_desde or 1) - 1
+            qs = qs[inicio:pagina_hasta] if pagina_hasta else qs[inicio:]
+
+        c = canvas.Canvas(destino, pagesize=self.page_size, pageCompression=1)
+        paginas = 0
+        for codigo, carga_item_id in qs.values_list('codigo_barra', 'carga_item_id').iterator(chunk_size=self.chunk_size):
+            self._dibujar_barcode(c, codigo)
+            for p, y in self._lineas_texto(carga_item_id):
+                p.drawOn(c, self.margin, y)
+            c.showPage()
+            paginas += 1
+
+        c.save()
+        return paginas
+
+    def stream(self, pagina_desde=None, pagina_hasta=None):
+        """
+        Generador de bytes del PDF, apto para StreamingHttpResponse.
+
+        No es streaming de verdad: el documento completo se genera en un
+        archivo temporal antes del primer bloque, así que el primer byte llega
+        cuando terminó todo el render. No se puede generar por tramos de N
+        etiquetas (un canvas por tramo) y enviar cada tramo al terminarlo: cada
+        canvas produce un PDF completo con su propia tabla de objetos, y unirlos
+        en un solo documento requiere reescribir esos objetos, algo que
+        ReportLab no expone. Por eso la vista solo lo usa para rangos de hasta
+        ETIQUETAS_MAX_PAGINAS_SINCRONO páginas; los mayores van a la cola de trabajos.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=STREAM_BLOCK_SIZE * 16) as tmp:
+            self.render(tmp, pagina_desde, pagina_hasta)
+            tmp.seek(0)
+            while True:
+                block = tmp.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    def filename(self, pagina_desde=None, pagina_hasta=None):
+        nombre = f"etiquetas_carga_{self.carga.id}"
+        if self.item_id:
+            nombre += f"_item_{self.item_id}"
+        if pagina_desde or pagina_hasta:
+            nombre += f"_p{pagina_desde or 1}-{pagina_hasta or 'fin'}"
+        return f"{nombre}.pdf"
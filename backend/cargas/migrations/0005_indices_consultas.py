@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargas', '0004_carga_direccion'),
+        ('partners', '0004_alter_proveedor_nit'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carga',
+            index=models.Index(fields=['cliente', '-created_at', '-id'], name='carga_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carga',
+            index=models.Index(fields=['-created_at', '-id'], name='carga_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carga',
+            index=models.Index(fields=['estado', '-created_at', '-id'], name='carga_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unidad',
+            index=models.Index(fields=['carga_item', 'estado'], name='unidad_item_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unidad',
+            index=models.Index(condition=models.Q(('estado', 'disponible')), fields=['carga_item'], name='unidad_disponible_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 from django.conf import settings
@@ -59,6 +60,12 @@ class Carga(models.Model):
                 name='unique_carga_cliente_proveedor_remision'
                 )
         ]
+        indexes = [
+            # Listado por cliente y paginación keyset (-created_at, -id)
+            models.Index(fields=['cliente', '-created_at', '-id'], name='carga_cliente_fecha_idx'),
+            models.Index(fields=['-created_at', '-id'], name='carga_fecha_idx'),
+            models.Index(fields=['estado', '-created_at', '-id'], name='carga_estado_fecha_idx'),
+        ]
         
     def __str__(self):
         return f"CG{self.id} = {self.cliente.nombre} {self.remision}"    
@@ -92,6 +99,13 @@ class Unidad(models.Model):
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['carga_item', 'estado'], name='unidad_item_estado_idx'),
+            # Solo las disponibles: es lo que buscan reservas y cargas-por-cliente
+            models.Index(
+                fields=['carga_item'], condition=Q(estado='disponible'), name='unidad_disponible_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.codigo_barra} ({self.estado})'
\ No newline at end of file
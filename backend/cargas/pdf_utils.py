@@ -13,6 +13,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 
+def nombre_archivo_consolidado(carga):
+    """Nombre del PDF de consolidado, sin caracteres problemáticos de la remisión"""
+    safe_remision = carga.remision.replace('/', '_').replace('\\', '_')
+    return f"consolidado_carga_{carga.id}_{safe_remision}.pdf"
+
 def generate_consolidado_pdf(carga):
     try:
         buffer = BytesIO()
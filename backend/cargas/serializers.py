@@ -3,13 +3,15 @@ import json
 from rest_framework import serializers
 from django.db import transaction
 from .models import Carga, CargaItem, Unidad, Producto
+from .signals import items_carga_creados
+from core.campos import CamposDinamicosMixin
 
 class ProductoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = ['id', 'sku', 'nombre', 'unidad', 'peso_kg', 'is_active', 'created_at', 'updated_at']
 
-class UnidadSerializer(serializers.ModelSerializer):
+class UnidadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     cliente_nombre = serializers.CharField(source='carga_item.carga.cliente.nombre', read_only=True)
     cliente_id = serializers.IntegerField(source='carga_item.carga.cliente.id', read_only=True)
     producto_nombre = serializers.CharField(source='carga_item.producto.nombre', read_only=True)
@@ -21,6 +23,21 @@ class UnidadSerializer(serializers.ModelSerializer):
         model = Unidad
         fields = ['id', 'codigo_barra', 'estado', 'cliente_nombre', 'cliente_id', 'producto_nombre', 'producto_sku', 'remision', 'carga_id','created_at']
 
+_fecha_unidad = serializers.DateTimeField()
+
+
+def representar_unidad(fila, campos=UnidadSerializer.Meta.fields):
+    """
+    Misma salida que UnidadSerializer a partir de una fila de
+    codigos.valores_unidades (o del dict de resolver_codigo), sin pasar por
+    los campos de DRF: el listado de unidades y por-codigo arman así miles de
+    filas por página. `campos` permite devolver solo una parte (?fields=).
+    """
+    datos = {campo: fila[campo] for campo in campos}
+    if 'created_at' in datos:
+        datos['created_at'] = _fecha_unidad.to_representation(datos['created_at'])
+    return datos
+
 class CargaItemWriteSerializer(serializers.Serializer):
     producto_id = serializers.IntegerField(required=False)
     producto_nombre = serializers.CharField(required=False, allow_blank=False)
@@ -33,15 +50,16 @@ class CargaItemWriteSerializer(serializers.Serializer):
             raise serializers.ValidationError('Debe indicar producto_id o producto_nombre.')
         return attrs
 
-class CargaItemReadSerializer(serializers.ModelSerializer):
+class CargaItemReadSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     producto = ProductoSerializer(read_only=True)
     unidades_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CargaItem
         fields = ['id', 'producto', 'cantidad', 'unidades_count', 'created_at']
+        expandibles = ('producto',)
 
-class CargaSerializer(serializers.ModelSerializer):
+class CargaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     items = CargaItemReadSerializer(many=True, read_only=True)
     items_data = serializers.JSONField(write_only=True, required=False)
     auto_generar_unidades = serializers.BooleanField(write_only=True, required=False, default=True)
@@ -58,6 +76,8 @@ class CargaSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['estado', 'created_at', 'updated_at']
+        # Anidados que ?expand= puede omitir (core/campos.py)
+        expandibles = ('items',)
 
     def validate_cliente(self, value):
         """Validación adicional para usuarios cliente"""
@@ -149,6 +169,7 @@ class CargaSerializer(serializers.ModelSerializer):
 
         if items_to_create:
             CargaItem.objects.bulk_create(items_to_create)
+            items_carga_creados.send(sender=CargaItem, carga=carga, items=items_to_create)
 
         if auto and items_to_create:
             from .services import generar_unidades_para_carga
@@ -218,6 +239,7 @@ class CargaSerializer(serializers.ModelSerializer):
 
             if items_to_create:
                 CargaItem.objects.bulk_create(items_to_create)
+                items_carga_creados.send(sender=CargaItem, carga=instance, items=items_to_create)
 
             # Regenerar unidades si está habilitado
             if auto and items_to_create:
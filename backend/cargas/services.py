@@ -1,34 +1,41 @@
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Count
 from .models import Carga, Unidad
-from .utils import generate_barcode
+from .utils import generate_barcodes
 
 @transaction.atomic
-def generar_unidades_para_carga(carga: Carga):
+def generar_unidades_para_carga(carga: Carga, batch_size: int = None):
     """
     Crea una Unidad por cada cantiidad de cada CargaItem
     Genera codigos de barras unicos
+
+    Las unidades existentes por item salen de una sola consulta agregada,
+    los codigos se generan por lotes y se insertan en bloques de batch_size.
     """
-    
-    cliente_id = carga.cliente.id
-    seq = 0
+    batch_size = batch_size or settings.UNIDADES_BATCH_SIZE
+    items = list(carga.items.annotate(existentes=Count('unidades')).order_by('id'))
+
+    # La secuencia continúa después de las unidades ya generadas para la carga
+    seq = sum(item.existentes for item in items)
     unidades_bulk = []
-    
-    for item in carga.items.select_related('carga').all():
-        existentes = item.unidades.count()
-        if existentes >= item.cantidad:
+
+    for item in items:
+        unidades_a_crear = item.cantidad - item.existentes
+        if unidades_a_crear <= 0:
             continue
-        
-        unidades_a_crear = item.cantidad - existentes
-        for _ in range(unidades_a_crear):
-            seq += 1
-            codigo = generate_barcode(cliente_id, carga.id, seq)
+
+        codigos = generate_barcodes(carga.cliente_id, carga.id, seq + 1, unidades_a_crear)
+        seq += unidades_a_crear
+        for codigo in codigos:
             unidades_bulk.append(Unidad(carga_item=item, codigo_barra=codigo))
-            
+            if len(unidades_bulk) >= batch_size:
+                Unidad.objects.bulk_create(unidades_bulk, batch_size=batch_size)
+                unidades_bulk = []
+
     if unidades_bulk:
-        Unidad.objects.bulk_create(unidades_bulk)
-        
-    if carga.items.filter(unidades__isnull=False).exists():
+        Unidad.objects.bulk_create(unidades_bulk, batch_size=batch_size)
+
+    if seq:
         carga.estado = 'etiquetada'
         carga.save(update_fields=['estado'])
-        
-            
\ No newline at end of file
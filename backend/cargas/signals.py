@@ -0,0 +1,6 @@
+# cargas/signals.py
+from django.dispatch import Signal
+
+# bulk_create no dispara post_save: se envía después de crear los items de una carga.
+# Argumentos: carga, items (lista de CargaItem creados)
+items_carga_creados = Signal()
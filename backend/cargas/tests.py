@@ -1,10 +1,15 @@
-from django.test import TestCase
+import json
+import re
+
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 
 from accounts.models import Usuario
 from partners.models import Cliente, Proveedor
-from .models import Producto, Unidad
+from .models import Carga, CargaItem, Producto, Unidad
 
 
 class CargasAPITests(TestCase):
@@ -101,5 +106,241 @@ class CargasAPITests(TestCase):
         client2.force_authenticate(user=other)  # autenticado pero no admin
         resp = client2.get('/api/cargas/')
         self.assertEqual(resp.status_code, 403)
-        
-    
\ No newline at end of file
+
+    def test_etiquetas_streaming_y_rango(self):
+        resp = self.client_api.post('/api/cargas/', data={
+            'cliente': self.cliente.id,
+            'proveedor': self.proveedor.id,
+            'remision': 'REM-ETQ',
+            'items_data': [
+                {'producto_id': self.prod1.id, 'cantidad': 3},
+                {'producto_id': self.prod2.id, 'cantidad': 2},
+            ],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        carga_id = resp.data['id']
+
+        def paginas(r):
+            pdf = b''.join(r.streaming_content)
+            self.assertTrue(pdf.startswith(b'%PDF'))
+            return len(re.findall(rb'/Type /Page\b(?!s)', pdf))
+
+        completo = self.client_api.get(f'/api/cargas/{carga_id}/etiquetas/')
+        self.assertEqual(completo.status_code, 200)
+        self.assertEqual(completo['X-Total-Paginas'], '5')
+        self.assertEqual(paginas(completo), 5)
+
+        rango = self.client_api.get(f'/api/cargas/{carga_id}/etiquetas/?pagina_desde=2&pagina_hasta=4')
+        self.assertEqual(rango.status_code, 200)
+        self.assertEqual(paginas(rango), 3)
+
+        invalido = self.client_api.get(f'/api/cargas/{carga_id}/etiquetas/?pagina_desde=9')
+        self.assertEqual(invalido.status_code, 400)
+
+        # Un rango mayor al límite síncrono no se genera en el request: se encola
+        with override_settings(ETIQUETAS_MAX_PAGINAS_SINCRONO=3):
+            grande = self.client_api.get(f'/api/cargas/{carga_id}/etiquetas/?pagina_desde=2')
+            self.assertEqual(grande.status_code, 202)
+            self.assertEqual(grande.data['tipo'], 'etiquetas')
+            self.assertEqual(grande.data['parametros'], {'pagina_desde': 2})
+            self.assertEqual(
+                self.client_api.get(f'/api/cargas/{carga_id}/etiquetas/?pagina_desde=3').status_code, 200
+            )
+
+
+class GeneracionUnidadesTests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        self.proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        self.producto = Producto.objects.create(sku='SKU1', nombre='Tambor')
+
+    def test_generate_barcodes_lote(self):
+        from .utils import _luhn_mod10, generate_barcodes
+
+        codigos = generate_barcodes(5, 12, 1, 1000)
+        self.assertEqual(len(set(codigos)), 1000)
+        for seq, codigo in enumerate(codigos[:20], start=1):
+            self.assertRegex(codigo, r'^CL5CG12[0-9A-Z]{13}\d$')
+            # El DV se puede recalcular desde los 32 bits aleatorios del código
+            valor = 0
+            for c in codigo[7:-1]:
+                valor = valor * 32 + '0123456789ABCDEFGHJKMNPQRSTVWXYZ'.index(c)
+            self.assertEqual(codigo[-1], _luhn_mod10(f'512{seq}{valor & 0xFFFFFFFF}'))
+
+    def test_generar_unidades_consultas_constantes(self):
+        from .models import Carga, CargaItem
+        from .services import generar_unidades_para_carga
+
+        carga = Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision='REM-1')
+        for cantidad in (3, 4, 5):
+            CargaItem.objects.create(carga=carga, producto=self.producto, cantidad=cantidad)
+
+        # Conteo de unidades por item en una consulta + 2 bloques de inserción
+        with CaptureQueriesContext(connection) as ctx:
+            generar_unidades_para_carga(carga, batch_size=10)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'cargas_unidad' in q['sql']]), 3)
+        self.assertEqual(Unidad.objects.filter(carga_item__carga=carga).count(), 12)
+
+        # Volver a generar no crea duplicados
+        generar_unidades_para_carga(carga)
+        self.assertEqual(Unidad.objects.filter(carga_item__carga=carga).count(), 12)
+
+
+class UnidadPorCodigoAsincronaTests(TestCase):
+    """La vista async de por-codigo responde lo mismo que la acción del viewset"""
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.admin = Usuario.objects.create_user(
+            username='admin_async', password='pass123', rol='admin', nombre='Admin', apellido='Async'
+        )
+        self.token = str(AccessToken.for_user(self.admin))
+        cliente = Cliente.objects.create(nombre='Cliente Async', nit='CA-1')
+        proveedor = Proveedor.objects.create(nombre='Prov Async', nit='PA-1')
+        producto = Producto.objects.create(sku='ASY1', nombre='Caja')
+        carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision='REM-ASY')
+        item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=1)
+        Unidad.objects.create(carga_item=item, codigo_barra='ASYNC-1')
+
+    async def _get(self, codigo, token=None):
+        from .views import unidad_por_codigo_asincrona
+
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        request = AsyncRequestFactory().get(
+            '/api/cargas/unidades/por-codigo/', {'codigo_barra': codigo}, headers=headers
+        )
+        return await unidad_por_codigo_asincrona(request)
+
+    async def test_misma_respuesta_que_el_viewset(self):
+        from asgiref.sync import sync_to_async
+
+        cliente_api = APIClient()
+        cliente_api.force_authenticate(user=self.admin)
+        esperado = await sync_to_async(cliente_api.get)('/api/cargas/unidades/por-codigo/', {'codigo_barra': 'ASYNC-1'})
+
+        response = await self._get('ASYNC-1', self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(esperado.data)))
+
+        self.assertEqual((await self._get('NO-EXISTE', self.token)).status_code, 404)
+        self.assertEqual((await self._get('ASYNC-1')).status_code, 401)
+
+
+class CodigosCacheTests(TestCase):
+    """Caché de resolución de códigos de barras"""
+
+    def setUp(self):
+        from .codigos import limpiar
+
+        limpiar()
+        self.addCleanup(limpiar)
+        self.admin = Usuario.objects.create_user(
+            username='admin_cod', password='pass123', rol='admin', nombre='Admin', apellido='Cod'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+        cliente = Cliente.objects.create(nombre='Cliente Cod', nit='CC-1')
+        proveedor = Proveedor.objects.create(nombre='Prov Cod', nit='PC-1')
+        producto = Producto.objects.create(sku='COD1', nombre='Saco')
+        carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision='REM-COD')
+        item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=1)
+        self.unidad = Unidad.objects.create(carga_item=item, codigo_barra='COD-1')
+
+    def _por_codigo(self):
+        return self.client_api.get('/api/cargas/unidades/por-codigo/', {'codigo_barra': 'COD-1'})
+
+    def test_segunda_busqueda_sin_consultas_e_invalidacion(self):
+        from envios.reservas import reservar_unidades
+        from .serializers import UnidadSerializer
+
+        esperado = UnidadSerializer(Unidad.objects.get(pk=self.unidad.pk)).data
+        self.assertEqual(self._por_codigo().data, esperado)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._por_codigo().status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'cargas_unidad' in q['sql']])
+
+        # El UPDATE en bloque de la reserva invalida la entrada
+        reservar_unidades({self.unidad.id: 'COD-1'})
+        self.assertEqual(self._por_codigo().data['estado'], 'reservada')
+
+        self.unidad.refresh_from_db()
+        self.unidad.estado = 'perdida'
+        self.unidad.save()
+        self.assertEqual(self._por_codigo().data['estado'], 'perdida')
+
+
+class PaginacionKeysetTests(TestCase):
+    """Listado de cargas paginado por (created_at, id)"""
+
+    def setUp(self):
+        from django.utils import timezone
+
+        admin = Usuario.objects.create_user(
+            username='admin_pag', password='pass123', rol='admin', nombre='Admin', apellido='Pag'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=admin)
+        cliente = Cliente.objects.create(nombre='Cliente Pag', nit='CP-1')
+        proveedor = Proveedor.objects.create(nombre='Prov Pag', nit='PP-1')
+        for i in range(5):
+            Carga.objects.create(cliente=cliente, proveedor=proveedor, remision=f'REM-PAG{i}')
+        # Fechas repetidas: el id desempata
+        Carga.objects.filter(remision__in=['REM-PAG1', 'REM-PAG2', 'REM-PAG3']).update(created_at=timezone.now())
+
+    def test_recorre_todo_sin_count_ni_repetidos(self):
+        remisiones = []
+        url = '/api/cargas/?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client_api.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotIn('count', resp.data)
+            self.assertFalse([q for q in ctx.captured_queries if 'COUNT(*)' in q['sql']])
+            remisiones += [c['remision'] for c in resp.data['results']]
+            url = resp.data['next']
+        self.assertEqual(sorted(remisiones), [f'REM-PAG{i}' for i in range(5)])
+
+        resp = self.client_api.get('/api/cargas/', {'page': 2, 'page_size': 2})
+        self.assertEqual(resp.data['count'], 5)
+        self.assertEqual(len(resp.data['results']), 2)
+
+        self.assertEqual(self.client_api.get('/api/cargas/', {'cursor': 'basura'}).status_code, 404)
+
+
+class UnidadesListadoTests(TestCase):
+    """Listado de unidades armado con values() (representar_unidad)"""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user(
+            username='admin_uni', password='pass123', rol='admin', nombre='Admin', apellido='Uni'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=admin)
+        cliente = Cliente.objects.create(nombre='Cliente Uni', nit='CU-1')
+        proveedor = Proveedor.objects.create(nombre='Prov Uni', nit='PU-1')
+        carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision='REM-UNI')
+        for i in range(3):
+            producto = Producto.objects.create(sku=f'UNI{i}', nombre=f'Producto {i}')
+            item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=1)
+            Unidad.objects.create(carga_item=item, codigo_barra=f'UNI-{i}')
+
+    def test_misma_salida_que_el_serializer_en_una_consulta(self):
+        from .serializers import UnidadSerializer
+
+        esperado = UnidadSerializer(Unidad.objects.order_by('-created_at', '-id'), many=True).data
+        with self.assertNumQueries(1):
+            resp = self.client_api.get('/api/cargas/unidades/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['results'], [dict(fila) for fila in esperado])
+
+    def test_cursor_y_fields(self):
+        codigos = []
+        url = '/api/cargas/unidades/?page_size=2&fields=codigo_barra,producto_sku'
+        while url:
+            resp = self.client_api.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual({tuple(fila) for fila in resp.data['results']}, {('codigo_barra', 'producto_sku')})
+            codigos += [fila['codigo_barra'] for fila in resp.data['results']]
+            url = resp.data['next']
+        self.assertEqual(codigos, ['UNI-2', 'UNI-1', 'UNI-0'])
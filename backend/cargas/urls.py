@@ -1,9 +1,17 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import CargaViewSet, UnidadViewSet, ProductoViewSet
+from .views import CargaViewSet, UnidadViewSet, ProductoViewSet, unidad_por_codigo_asincrona
 
 router = DefaultRouter()
-router.register(r'cargas', CargaViewSet, basename='carga')
+# Las rutas anidadas antes que 'cargas': si no, cargas/<pk>/ captura 'unidades' y 'productos'
 router.register(r'cargas/unidades', UnidadViewSet, basename='unidad')
 router.register(r'cargas/productos', ProductoViewSet, basename='producto')  # CRUD básico
+router.register(r'cargas', CargaViewSet, basename='carga')
+
+urlpatterns = []
+if settings.VISTAS_ASINCRONAS:
+    # Antes del router: reemplaza la acción por-codigo del viewset
+    urlpatterns.append(path('cargas/unidades/por-codigo/', unidad_por_codigo_asincrona))
 
-urlpatterns = router.urls
+urlpatterns += router.urls
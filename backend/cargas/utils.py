@@ -4,6 +4,11 @@ import time
 import uuid
 
 _ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+# Todos los pares de caracteres: codifica 10 bits por búsqueda en lugar de 5
+_PARES = [a + b for a in _ALPHABET for b in _ALPHABET]
+# Dígito duplicado en Luhn (d*2, restando 9 si pasa de 9)
+_DOBLE = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+_MASCARA_32 = (1 << 32) - 1
 
 def _base32_encode(num: int, length: int = 26) -> str:
     chars = []
@@ -12,24 +17,60 @@ def _base32_encode(num: int, length: int = 26) -> str:
         chars.append(_ALPHABET[rem])
     return ''.join(reversed(chars))
 
-def _entropy () -> int:
-    ts = int(time.time() * 1000) & ((1 << 48) - 1)
-    rnd = random.getrandbits(32)
-    return (ts << 32) | rnd
+def _base32_35bits(num: int) -> str:
+    """Los 7 caracteres base32 de un valor de 35 bits"""
+    return (
+        _PARES[(num >> 25) & 1023] + _PARES[(num >> 15) & 1023]
+        + _PARES[(num >> 5) & 1023] + _ALPHABET[num & 31]
+    )
+
+def _luhn_suma(num_str: str) -> tuple:
+    """
+    Suma de Luhn de los dígitos de num_str en las dos paridades posibles:
+    (como sufijo, desplazado una posición). Permite calcular una sola vez
+    la parte fija del número.
+    """
+    digitos = [int(c) for c in num_str if c.isdigit()]
+    digitos.reverse()
+    normal = sum(d if i % 2 == 0 else _DOBLE[d] for i, d in enumerate(digitos))
+    desplazada = sum(_DOBLE[d] if i % 2 == 0 else d for i, d in enumerate(digitos))
+    return normal, desplazada
+
+def _luhn_digitos(digitos: str) -> int:
+    """Suma de Luhn de una cadena solo de dígitos (camino rápido por código)"""
+    return sum(map(int, digitos[::-2])) + sum(_DOBLE[int(c)] for c in digitos[-2::-2])
 
 def _luhn_mod10(num_str: str) -> str:
-    total = 0
-    reversed_digits = list(map(int, [c for c in num_str if c.isdigit()]))
-    reversed_digits.reverse()
-    for i, d in enumerate(reversed_digits):
-        if i % 2 == 0:
-            total += d
-        
-        else:
-            d2 = d * 2
-            total += d2 - 9 if d2 > 9 else d2
-            
-    return str((10 - (total % 10)) % 10)
+    return str((10 - (_luhn_suma(num_str)[0] % 10)) % 10)
+
+def generate_barcodes(cliente_id: int, carga_id: int, start_seq: int, n: int) -> list:
+    """
+    Genera n codigos de barras unicos para las unidades start_seq..start_seq+n-1
+    CL<cliente>CG<carga><base32 13><DV>
+
+    El timestamp y la entropia se toman una vez por lote: los 32 bits
+    aleatorios avanzan como contador desde un valor aleatorio, asi que los
+    codigos de un mismo lote no pueden repetirse. Los 6 primeros caracteres
+    base32 (solo timestamp) y la suma de Luhn del prefijo numerico se calculan
+    una sola vez. El DV es Luhn sobre <cliente><carga><seq><aleatorio>.
+    """
+    if n <= 0:
+        return []
+
+    ts = int(time.time() * 1000) & ((1 << 48) - 1)
+    inicio = random.getrandbits(32)
+    prefix = f'CL{cliente_id}CG{carga_id}{_base32_encode(ts >> 3, 6)}'
+    alto = (ts & 7) << 32
+    suma_prefijo = _luhn_suma(f'{cliente_id}{carga_id}')
+
+    codigos = []
+    for i in range(n):
+        rnd = (inicio + i) & _MASCARA_32
+        sufijo = f'{start_seq + i}{rnd}'
+        total = _luhn_digitos(sufijo) + suma_prefijo[len(sufijo) % 2]
+        dv = (10 - (total % 10)) % 10
+        codigos.append(f'{prefix}{_base32_35bits(alto | rnd)}{dv}')
+    return codigos
 
 def generate_barcode(cliente_id: int, carga_id: int, unidad_seq: int) -> str:
     """
@@ -37,8 +78,4 @@ def generate_barcode(cliente_id: int, carga_id: int, unidad_seq: int) -> str:
     CL<cliente>-CG<carga>-<base32>-<DV>
     Ej: CL5CG12-01C9T...7
     """
-    rnd = _base32_encode(_entropy(), 13)
-    prefix = f'CL{cliente_id}CG{carga_id}'
-    digits = f'{cliente_id}{carga_id}{unidad_seq}{abs(hash(rnd))}'
-    dv = _luhn_mod10(digits)
-    return f'{prefix}{rnd}{dv}'
\ No newline at end of file
+    return generate_barcodes(cliente_id, carga_id, unidad_seq, 1)[0]
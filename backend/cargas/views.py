@@ -1,32 +1,33 @@
 from fileinput import filename
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, decorators, response, status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db.models import Prefetch, Count
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from .models import Carga, Unidad, CargaItem, Producto
-from .serializers import CargaSerializer, UnidadSerializer, ProductoSerializer
+from .serializers import CargaSerializer, UnidadSerializer, ProductoSerializer, representar_unidad
 from .permissions import IsAdminOrOperador, IsAdminOrOperadorForCargas, PuedeImprimirEtiquetas, IsAdminRole
 from .services import generar_unidades_para_carga
+from .etiquetas import EtiquetasRenderer
+from .codigos import en_cache, resolver_codigo, valores_unidades
 
 from .filters import CargaFilter
 from accounts.permissions import EsClienteYTieneCliente, SoloSuCliente
 
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import mm, landscape
-from reportlab.graphics.barcode import code128
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import Paragraph
-from reportlab.lib.enums import TA_CENTER
-
 from rest_framework.response import Response
 from rest_framework import status, decorators
 
-from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta, datetime
 
-from .pdf_utils import generate_consolidado_pdf
+from .pdf_utils import generate_consolidado_pdf, nombre_archivo_consolidado
+from core.asincrono import vista_asincrona
+from core.busqueda import buscar
+from core.campos import ConsultaPorCamposMixin
+from core.paginacion import KeysetFechaPagination
+from core.trabajos import solicita_asincrono, encolar_trabajo, respuesta_trabajo
+from core.documentos import respuesta_documento, huella_carga
 from django.http import HttpResponse
 
 
@@ -41,7 +42,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
 
-class CargaViewSet(viewsets.ModelViewSet):
+class CargaViewSet(ConsultaPorCamposMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar cargas del sistema.
     Incluye funcionalidades para generar unidades y etiquetas.
@@ -60,6 +61,7 @@ class CargaViewSet(viewsets.ModelViewSet):
     )
     serializer_class = CargaSerializer
     parser_classes = [JSONParser, MultiPartParser, FormParser]
+    pagination_class = KeysetFechaPagination
     
     def get_permissions(self):
         """
@@ -114,17 +116,6 @@ class CargaViewSet(viewsets.ModelViewSet):
         if estado:
             queryset = queryset.filter(estado=estado)
         
-        # Filtro de búsqueda
-        if search:
-            queryset = queryset.filter(
-                Q(remision__icontains=search) |
-                Q(id__icontains=search) |
-                Q(cliente__nombre__icontains=search) |
-                Q(proveedor__nombre__icontains=search) |
-                Q(items__producto__nombre__icontains=search) |
-                Q(items__producto__sku__icontains=search)
-            ).distinct()
-        
         # Filtros de fecha
         now = timezone.now()
         if fecha_rango:
@@ -155,6 +146,11 @@ class CargaViewSet(viewsets.ModelViewSet):
                 # Si las fechas no son válidas, ignorar el filtro
                 pass
         
+        # Filtro de búsqueda: índice de texto (remisión, id, cliente, proveedor y productos).
+        # Al final: el límite de resultados se aplica sobre las cargas ya filtradas
+        if search:
+            queryset = buscar(queryset, 'carga', search)
+        
         return queryset
     
     def list(self, request, *args, **kwargs):
@@ -178,23 +174,20 @@ class CargaViewSet(viewsets.ModelViewSet):
         """
         Genera y descarga el PDF de Consolidado de Mercancía
         GET /api/cargas/{id}/consolidado_pdf/
+        Con ?asincrono=1 se encola y responde 202 con el trabajo a descargar luego.
         """
         carga = self.get_object()
         
+        if solicita_asincrono(request):
+            return respuesta_trabajo(encolar_trabajo('consolidado', carga.id, usuario=request.user), request)
+        
         try:
-            # Generar el PDF
-            pdf_buffer = generate_consolidado_pdf(carga)
-            
-            # Crear la respuesta HTTP
-            response = HttpResponse(pdf_buffer, content_type='application/pdf')
-            
-            # Configurar el nombre del archivo
-            # Reemplazar caracteres problemáticos en la remisión
-            safe_remision = carga.remision.replace('/', '_').replace('\\', '_')
-            filename = f"consolidado_carga_{carga.id}_{safe_remision}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            return response
+            # Se sirve desde la caché de documentos si la carga no cambió
+            return respuesta_documento(
+                request, 'consolidado', 'carga', carga, huella_carga(carga),
+                lambda: generate_consolidado_pdf(carga),
+                nombre_archivo_consolidado(carga)
+            )
             
         except Exception as e:
             print(f"Error generando consolidado PDF: {str(e)}")
@@ -219,120 +212,69 @@ class CargaViewSet(viewsets.ModelViewSet):
     @decorators.action(detail=True, methods=['get'], url_path='etiquetas', permission_classes=[IsAdminOrOperador])
     def etiquetas(self, request, pk=None):
         """
-        GET /api/cargas/<id>/etiquetas/?item_id=XX
+        GET /api/cargas/<id>/etiquetas/?item_id=XX&pagina_desde=1&pagina_hasta=500
         1 unidad = 1 página (100x80mm, landscape)
-        - Barcode EXACTO: 85mm ancho x 44mm alto, centrado
-        - Tipografía: Helvetica, 12pt (líneas), 11pt (ID)
+        El PDF se genera completo y luego se entrega por bloques (ver
+        EtiquetasRenderer.stream); pagina_desde/pagina_hasta (1-based,
+        inclusivas) permiten a las impresoras descargar la carga por partes.
+        El total de páginas se informa en la cabecera X-Total-Paginas.
+        Con ?asincrono=1, o si el rango pedido pasa de ETIQUETAS_MAX_PAGINAS_SINCRONO
+        páginas, se encola y responde 202 con el trabajo a descargar luego: así
+        una carga grande no ocupa el worker ni su memoria durante todo el render.
         """
-        
-        print(f"Usuario: {request.user}")
-        print(f"Rol: {request.user.rol}")
-        print(f"Autenticado: {request.user.is_authenticated}")
-        print(f"Método: {request.method}")
-        
-        carga = self.get_object()    
-        
+        carga = self.get_object()
         item_id = request.query_params.get('item_id')
 
-        qs = Unidad.objects.select_related(
-            'carga_item__producto', 'carga_item__carga',
-            'carga_item__carga__cliente', 'carga_item__carga__proveedor'
-        ).filter(carga_item__carga=carga)
-        if item_id:
-            qs = qs.filter(carga_item_id=item_id)
-        unidades = list(qs.order_by('id'))
-        if not unidades:
+        try:
+            pagina_desde = int(request.query_params.get('pagina_desde') or 0) or None
+            pagina_hasta = int(request.query_params.get('pagina_hasta') or 0) or None
+        except ValueError:
             return response.Response(
-                {'detail': 'No hay unidades para generar etiquetas. ¿Ya generaste las unidades?'},
+                {'detail': 'pagina_desde y pagina_hasta deben ser números enteros.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (pagina_desde and pagina_desde < 1) or (pagina_hasta and pagina_hasta < (pagina_desde or 1)):
+            return response.Response(
+                {'detail': 'Rango de páginas inválido.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Tamaño etiqueta
-        label_w, label_h = 100*mm, 80*mm
-        page_size = landscape((label_w, label_h))
-        margin = 5*mm
-        inner_w = label_w - 2*margin
-
-        # Texto: centrado, tamaños ajustados
-        styles = getSampleStyleSheet()
-        base = ParagraphStyle(
-            'LabelBase',
-            parent=styles['Normal'],
-            alignment=TA_CENTER,
-            fontName='Helvetica',      # Core PDF font
-            fontSize=12,               # texto general
-            leading=13
-        )
-        # Para el ID ligeramente menor
-        small = ParagraphStyle(
-            'LabelSmall',
-            parent=base,
-            fontSize=11,
-            leading=12
-        )
-
-        buf = BytesIO()
-        c = canvas.Canvas(buf, pagesize=page_size)
-
-        # Medidas del barcode optimizadas para escaneo
-        # Aumentamos el width para que las barras no sean tan delgadas (menor densidad)
-        target_bw = 80*mm
-        target_bh = 22*mm
-
-        for u in unidades:
-            producto = u.carga_item.producto
-            cliente = u.carga_item.carga.cliente
-
-            codigo = u.codigo_barra
-            # Agregamos humanReadable para que aparezca el ID debajo del código
-            bcode = code128.Code128(codigo, barHeight=target_bh, humanReadable=True)
-            nat_w, nat_h = bcode.wrap(0, 0)
-
-            # Calculamos escala para ocupar el ancho objetivo sin exceder los límites
-            # Usamos un ancho máximo de 80mm para dar buena "Quiet Zone" a los lados
-            sx = float(target_bw) / float(nat_w) if nat_w else 1.0
-            # No escalamos en Y para mantener la proporción de las barras nítida
-            sy = 1.0 
-
-            bx = (label_w - (nat_w * sx)) / 2.0
-            by = label_h - margin - target_bh - (5*mm)
-
-            c.saveState()
-            c.translate(bx, by)
-            c.scale(sx, sy)
-            bcode.drawOn(c, 0, 0)
-            c.restoreState()
-
-            info_lines = [
-                Paragraph(f"<b>CLIENTE:</b> {cliente.nombre[:24]}", base),
-                Paragraph(f"<b>PRODUCTO:</b> {producto.nombre[:24]}", base),
-                Paragraph(f"<b>REM:</b> {u.carga_item.carga.remision} <b>DEST:</b> {u.carga_item.carga.destino}", base),
-            ]
-
-            y = 8*mm
-            for p in info_lines:
-                p.wrapOn(c, inner_w, 12*mm)
-                p.drawOn(c, margin, y)
-                y += p.height + (1.0*mm)
-
-            c.showPage() 
+        renderer = EtiquetasRenderer(carga, item_id=item_id)
+        total = renderer.total_paginas()
+        if not total:
+            return response.Response(
+                {'detail': 'No hay unidades para generar etiquetas. ¿Ya generaste las unidades?'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if pagina_desde and pagina_desde > total:
+            return response.Response(
+                {'detail': f'La carga solo tiene {total} páginas de etiquetas.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        c.save()
-        buf.seek(0)
+        paginas = min(pagina_hasta or total, total) - (pagina_desde or 1) + 1
+        if solicita_asincrono(request) or paginas > settings.ETIQUETAS_MAX_PAGINAS_SINCRONO:
+            trabajo = encolar_trabajo('etiquetas', carga.id, {
+                'item_id': item_id,
+                'pagina_desde': pagina_desde,
+                'pagina_hasta': pagina_hasta,
+            }, usuario=request.user)
+            return respuesta_trabajo(trabajo, request)
 
-        filename = (
-            f"etiquetas_carga_{carga.id}_item_{item_id}.pdf" if item_id
-            else f"etiquetas_carga_{carga.id}.pdf"
+        resp = StreamingHttpResponse(
+            renderer.stream(pagina_desde, pagina_hasta),
+            content_type='application/pdf'
         )
-        resp = HttpResponse(buf.getvalue(), content_type='application/pdf')
-        resp['Content-Disposition'] = f'inline; filename="{filename}"'
+        resp['Content-Disposition'] = f'inline; filename="{renderer.filename(pagina_desde, pagina_hasta)}"'
+        resp['X-Total-Paginas'] = str(total)
         return resp
 
 
-class UnidadViewSet(viewsets.ReadOnlyModelViewSet):
+class UnidadViewSet(ConsultaPorCamposMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Unidad.objects.select_related('carga_item__carga__cliente', 'carga_item__producto', 'carga_item__carga').all().order_by('id')
     serializer_class = UnidadSerializer
     permission_classes = [IsAdminRole]
+    pagination_class = KeysetFechaPagination
     parser_classes = [JSONParser]
     
     def get_queryset(self):
@@ -344,6 +286,22 @@ class UnidadViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(codigo_barra=codigo_barra)
         
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Listado con filas de values() en lugar de instancias y UnidadSerializer:
+        misma salida (también con ?fields=), pero sin crear modelos ni recorrer
+        cinco fuentes con punto por unidad.
+        """
+        campos = list(self.get_serializer().fields)
+        queryset = valores_unidades(self.filter_queryset(self.get_queryset()))
+
+        pagina = self.paginate_queryset(queryset)
+        filas = pagina if pagina is not None else queryset
+        datos = [representar_unidad(fila, campos) for fila in filas]
+        if pagina is not None:
+            return self.get_paginated_response(datos)
+        return Response(datos)
     
     @decorators.action(detail=False, methods=['get'], url_path='por-codigo')
     def por_codigo(self, request):
@@ -356,17 +314,24 @@ class UnidadViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            unidad = Unidad.objects.select_related(
-                'carga_item__carga__cliente', 
-                'carga_item__producto'  # ← AÑADE ESTA RELACIÓN
-            ).get(codigo_barra=codigo_barra)
-            
-            serializer = self.get_serializer(unidad)
-            return Response(serializer.data)
-            
-        except Unidad.DoesNotExist:
+        datos = resolver_codigo(codigo_barra)
+        if datos is None:
             return Response(
                 {'error': 'Unidad no encontrada'},
                 status=status.HTTP_404_NOT_FOUND
-        )
+            )
+        return Response(representar_unidad(datos))
+
+
+@vista_asincrona(roles=['admin'])
+async def unidad_por_codigo_asincrona(request):
+    """por-codigo para el modo ASGI: misma respuesta que la acción del viewset"""
+    codigo_barra = request.GET.get('codigo_barra')
+    if not codigo_barra:
+        return JsonResponse({'error': 'Se requiere parámetro codigo_barra'}, status=400)
+
+    # Con el código en caché no se cambia de hilo ni se consulta la base
+    datos = en_cache(codigo_barra) or await sync_to_async(resolver_codigo)(codigo_barra)
+    if datos is None:
+        return JsonResponse({'error': 'Unidad no encontrada'}, status=404)
+    return JsonResponse(representar_unidad(datos))
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import TrabajoDocumento
 
-# Register your models here.
+
+@admin.register(TrabajoDocumento)
+class TrabajoDocumentoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'objeto_id', 'estado', 'solicitado_por', 'created_at', 'finished_at']
+    list_filter = ['tipo', 'estado', 'created_at']
+    readonly_fields = ['clave', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,143 @@
+# core/asincrono.py
+"""
+Soporte para las vistas async del modo ASGI (VISTAS_ASINCRONAS).
+
+DRF no ejecuta vistas async y, bajo ASGI, Django corre todas las vistas
+síncronas en un mismo hilo: una agregación lenta del dashboard frena al
+resto. Las consultas livianas y muy frecuentes (por-codigo,
+estado-verificacion) se reescriben con el ORM async; las acciones más
+pesadas se delegan con `adaptar_viewset` a un pool de hilos, sin duplicar su
+lógica.
+
+Los streams (EventSource) no pueden enviar cabeceras: en lugar del JWT de
+acceso, que quedaría en URLs y logs de proxies, la URL lleva un ticket
+firmado de un solo uso que se pide con el JWT (`emitir_ticket`).
+"""
+import secrets
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from accounts.autenticacion import comprobar_vigencia, en_cache, usuario_desde_token, usuario_guardado
+from accounts.revocacion import necesita_refresco, refrescar, revocado_en_memoria
+
+
+async def usuario_jwt(request):
+    """
+    Usuario activo del JWT en Authorization. Retorna None si falta, no es
+    válido o está inactivo. Con los claims de accounts/autenticacion.py y el
+    usuario en caché no consulta la base ni cambia de hilo.
+    """
+    autenticador = JWTAuthentication()
+    encabezado = autenticador.get_header(request)
+    crudo = autenticador.get_raw_token(encabezado) if encabezado else None
+    if not crudo:
+        return None
+    try:
+        token = autenticador.get_validated_token(crudo)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    if necesita_refresco():
+        await sync_to_async(refrescar)()
+    if revocado_en_memoria(token):
+        return None
+
+    usuario = usuario_desde_token(token)
+    if usuario is not None:
+        guardado = en_cache(usuario.pk) or await sync_to_async(usuario_guardado)(usuario.pk)
+        try:
+            comprobar_vigencia(usuario, guardado)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+        return usuario
+
+    # Token sin claims (emitido antes): consultar el usuario
+    usuario_id = token.get(jwt_settings.USER_ID_CLAIM)
+    usuario = await get_user_model().objects.filter(
+        **{jwt_settings.USER_ID_FIELD: usuario_id}, is_active=True
+    ).select_related('cliente').afirst()
+    return usuario
+
+
+TICKET_SALT = 'core.asincrono.ticket'
+
+
+def emitir_ticket(usuario, recurso):
+    """
+    Ticket firmado para abrir el stream de `recurso` (p. ej. 'envio:12') sin
+    poner el JWT en la URL. Vence a los TICKET_STREAM_TTL segundos y se
+    acepta una sola vez.
+    """
+    datos = {'u': usuario.pk, 'r': recurso, 'n': secrets.token_urlsafe(12)}
+    return signing.dumps(datos, salt=TICKET_SALT)
+
+
+async def usuario_ticket(request, recurso):
+    """Usuario activo del ?ticket= emitido para `recurso`, o None"""
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None
+    try:
+        datos = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.TICKET_STREAM_TTL)
+    except signing.BadSignature:
+        return None
+    if datos.get('r') != recurso:
+        return None
+    # Un solo uso: el primer canje registra el nonce hasta que el ticket vence
+    if not await cache.aadd(f"ticket-stream:{datos['n']}", True, settings.TICKET_STREAM_TTL):
+        return None
+    return await get_user_model().objects.filter(
+        pk=datos['u'], is_active=True
+    ).select_related('cliente').afirst()
+
+
+def vista_asincrona(roles=None):
+    """
+    Decorador para vistas async: autentica por JWT y restringe por rol.
+    Deja el usuario en request.user y responde 401/403 como DRF.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        async def wrapper(request, *args, **kwargs):
+            usuario = await usuario_jwt(request)
+            if usuario is None:
+                return JsonResponse({'detail': 'Credenciales de autenticación no válidas'}, status=401)
+            if roles is not None and usuario.rol not in roles:
+                return JsonResponse({'detail': 'No tiene permiso para realizar esta acción'}, status=403)
+            request.user = usuario
+            return await vista(request, *args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def _ejecutar_en_hilo(vista, request, *args, **kwargs):
+    try:
+        response = vista(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        # Los hilos del pool no reciben request_finished: cerrar sus conexiones aquí
+        close_old_connections()
+
+
+def adaptar_viewset(viewset, accion):
+    """Vista async que ejecuta la acción GET del viewset en el pool de hilos"""
+    vista = viewset.as_view({'get': accion})
+
+    async def adaptada(request, *args, **kwargs):
+        return await sync_to_async(_ejecutar_en_hilo, thread_sensitive=False)(
+            vista, request, *args, **kwargs
+        )
+    adaptada.__name__ = f'{accion}_asincrona'
+    return adaptada
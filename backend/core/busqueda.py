@@ -0,0 +1,194 @@
+# core/busqueda.py
+"""
+Buscador de cargas y envíos (?search= en sus listados).
+
+Los filtros `icontains` sobre varias columnas y joins (productos de la
+carga) recorren la tabla completa y repiten filas. Aquí cada carga y cada
+envío tiene un texto precalculado en DocumentoBusqueda, que se actualiza al
+guardar (core/signals.py), y la búsqueda usa su índice de texto completo:
+
+- PostgreSQL: índice GIN sobre to_tsvector('simple', texto).
+- SQLite: tabla virtual FTS5 sincronizada con triggers (migración 0002).
+
+Cada palabra buscada se toma como prefijo ("rem" encuentra "REM-001") y
+deben aparecer todas. La consulta de texto se restringe a los objetos del
+queryset ya filtrado (cliente del usuario, estado, fechas) y solo entonces
+se toman hasta BUSQUEDA_MAX_RESULTADOS, ordenados por relevancia: los
+resultados de otros clientes no ocupan el cupo. Para reconstruir los textos:
+`python manage.py reindexar_busqueda`.
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+CONFIG_PG = 'simple'
+TABLA_FTS = 'core_documentobusqueda_fts'
+INDICE_GIN = 'documento_busqueda_gin'
+MODELOS = {
+    'carga': ('cargas', 'Carga'),
+    'envio': ('envios', 'Envio'),
+}
+# Objetos por consulta al reindexar
+LOTE = 500
+
+
+def terminos(texto):
+    """Palabras de la búsqueda en minúsculas, sin signos ni guiones"""
+    return re.findall(r'[^\W_]+', (texto or '').lower())
+
+
+def documentos_cargas(ids, apps=global_apps):
+    """{carga_id: texto} con id, remisión, cliente, proveedor y productos (nombre y SKU)"""
+    Carga = apps.get_model('cargas', 'Carga')
+    CargaItem = apps.get_model('cargas', 'CargaItem')
+
+    partes = {
+        c['id']: [f"CG{c['id']}", str(c['id']), c['remision'], c['cliente__nombre'], c['proveedor__nombre']]
+        for c in Carga.objects.filter(id__in=ids).order_by()
+        .values('id', 'remision', 'cliente__nombre', 'proveedor__nombre')
+    }
+    productos = (
+        CargaItem.objects.filter(carga_id__in=ids).order_by()
+        .values_list('carga_id', 'producto__nombre', 'producto__sku').distinct()
+    )
+    for carga_id, nombre, sku in productos:
+        partes[carga_id] += [nombre, sku]
+    return {carga_id: ' '.join(filter(None, textos)) for carga_id, textos in partes.items()}
+
+
+def documentos_envios(ids, apps=global_apps):
+    """{envio_id: texto} con número de guía, cliente, conductor y placa"""
+    Envio = apps.get_model('envios', 'Envio')
+    return {
+        e['id']: ' '.join(filter(None, [e['numero_guia'], e['cliente__nombre'], e['conductor'], e['placa_vehiculo']]))
+        for e in Envio.objects.filter(id__in=ids).order_by()
+        .values('id', 'numero_guia', 'cliente__nombre', 'conductor', 'placa_vehiculo')
+    }
+
+
+DOCUMENTOS = {
+    'carga': documentos_cargas,
+    'envio': documentos_envios,
+}
+
+
+def indexar(tipo, ids, apps=global_apps):
+    """
+    Recalcula el texto de los objetos indicados (lista o queryset de ids).
+    Los que ya no existen se quitan del índice.
+    """
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    ids = list(ids)
+    for inicio in range(0, len(ids), LOTE):
+        lote = ids[inicio:inicio + LOTE]
+        textos = DOCUMENTOS[tipo](lote, apps=apps)
+        DocumentoBusqueda.objects.bulk_create(
+            [DocumentoBusqueda(tipo=tipo, objeto_id=objeto_id, texto=texto) for objeto_id, texto in textos.items()],
+            update_conflicts=True, unique_fields=['tipo', 'objeto_id'], update_fields=['texto'],
+        )
+        eliminados = set(lote) - set(textos)
+        if eliminados:
+            eliminar(tipo, eliminados, apps=apps)
+
+
+def eliminar(tipo, ids, apps=global_apps):
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id__in=list(ids)).delete()
+
+
+def reindexar(tipos=tuple(MODELOS), apps=global_apps):
+    """Reconstruye los documentos de los tipos indicados; retorna {tipo: documentos}"""
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    totales = {}
+    for tipo in tipos:
+        modelo = apps.get_model(*MODELOS[tipo])
+        DocumentoBusqueda.objects.filter(tipo=tipo).delete()
+        indexar(tipo, modelo.objects.order_by('id').values_list('id', flat=True), apps=apps)
+        totales[tipo] = DocumentoBusqueda.objects.filter(tipo=tipo).count()
+    return totales
+
+
+def _ids_postgres(tipo, palabras, limite, alcance):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    from .models import DocumentoBusqueda
+
+    # La misma expresión del índice GIN, para que la consulta lo use
+    vector = SearchVector('texto', config=CONFIG_PG)
+    consulta = SearchQuery(' & '.join(f'{p}:*' for p in palabras), config=CONFIG_PG, search_type='raw')
+    documentos = DocumentoBusqueda.objects.filter(tipo=tipo)
+    if alcance is not None:
+        documentos = documentos.filter(objeto_id__in=alcance)
+    return list(
+        documentos
+        .annotate(vector=vector).filter(vector=consulta)
+        .annotate(relevancia=SearchRank(vector, consulta))
+        .order_by('-relevancia', '-objeto_id')
+        .values_list('objeto_id', flat=True)[:limite]
+    )
+
+
+def _ids_sqlite(tipo, palabras, limite, alcance):
+    # Cada palabra entre comillas (sin operadores FTS5) y como prefijo
+    consulta = ' '.join(f'"{p}"*' for p in palabras)
+    filtro_alcance, params_alcance = '', []
+    if alcance is not None:
+        sql, params_alcance = alcance.query.sql_with_params()
+        filtro_alcance = f'AND d.objeto_id IN ({sql}) '
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT d.objeto_id FROM {TABLA_FTS} '
+            f'JOIN core_documentobusqueda d ON d.id = {TABLA_FTS}.rowid '
+            f'WHERE {TABLA_FTS} MATCH %s AND d.tipo = %s {filtro_alcance}'
+            f'ORDER BY {TABLA_FTS}.rank, d.objeto_id DESC LIMIT %s',
+            [consulta, tipo, *params_alcance, limite]
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _ids_texto(tipo, palabras, limite, alcance):
+    """Otros motores: sin índice de texto, pero sobre una sola columna y sin joins"""
+    from .models import DocumentoBusqueda
+
+    filtro = Q(tipo=tipo)
+    for palabra in palabras:
+        filtro &= Q(texto__icontains=palabra)
+    if alcance is not None:
+        filtro &= Q(objeto_id__in=alcance)
+    return list(
+        DocumentoBusqueda.objects.filter(filtro).order_by('-objeto_id')
+        .values_list('objeto_id', flat=True)[:limite]
+    )
+
+
+def ids_por_relevancia(tipo, texto, limite=None, queryset=None):
+    """
+    Ids de los objetos del tipo que coinciden con la búsqueda, del más relevante
+    al menos. Con `queryset`, solo entre sus objetos (el límite se aplica después).
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+    limite = limite or settings.BUSQUEDA_MAX_RESULTADOS
+    alcance = queryset.order_by().values('pk') if queryset is not None else None
+    if connection.vendor == 'postgresql':
+        return _ids_postgres(tipo, palabras, limite, alcance)
+    if connection.vendor == 'sqlite':
+        return _ids_sqlite(tipo, palabras, limite, alcance)
+    return _ids_texto(tipo, palabras, limite, alcance)
+
+
+def buscar(queryset, tipo, texto):
+    """
+    Filtra el queryset a los resultados de la búsqueda, ordenados por relevancia.
+    Aplicar después de los demás filtros: el límite de resultados cuenta solo
+    los objetos del queryset recibido.
+    """
+    ids = ids_por_relevancia(tipo, texto, queryset=queryset)
+    if not ids:
+        return queryset.none()
+    orden = Case(*[When(pk=pk, then=Value(posicion)) for posicion, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(orden)
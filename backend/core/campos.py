@@ -0,0 +1,239 @@
+# core/campos.py
+"""
+Selección de campos en las respuestas GET: ?fields= y ?expand=.
+
+- ?fields=id,remision,cliente_nombre devuelve solo esos campos. Con punto
+  se eligen campos de un serializer anidado: ?fields=id,items.cantidad.
+- Los campos anidados pesados de cada serializer (Meta.expandibles, p.ej.
+  los items de una carga) se incluyen por defecto; con ?expand= solo los
+  indicados: ?expand= (vacío) no trae ninguno, ?expand=items solo items.
+  También se incluyen si se nombran en ?fields=.
+- Sin ninguno de los dos parámetros la respuesta es la completa de siempre.
+
+El serializer recorta su salida con CamposDinamicosMixin. El viewset, con
+ConsultaPorCamposMixin, ajusta su queryset a los campos pedidos: quita los
+select_related/prefetch_related que nadie va a leer, agrega los que faltan
+y limita las columnas con only(). Los campos que no salen de una columna o
+relación del modelo (SerializerMethodField, anotaciones) declaran lo que
+necesitan en Meta.relaciones; si no lo declaran no se usa only().
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer
+
+PARAMETRO_CAMPOS = 'fields'
+PARAMETRO_EXPANDIR = 'expand'
+
+
+def _arbol(valor):
+    """'id,items.cantidad' -> {'id': {}, 'items': {'cantidad': {}}}"""
+    arbol = {}
+    for ruta in filter(None, (parte.strip() for parte in valor.split(','))):
+        nodo = arbol
+        for nombre in ruta.split('.'):
+            nodo = nodo.setdefault(nombre, {})
+    return arbol
+
+
+def _subarbol(arbol, ruta):
+    """Restricción para el serializer en `ruta`: None si no hay (se nombró sin subcampos)"""
+    for nombre in ruta:
+        if arbol is None or not arbol.get(nombre):
+            return None
+        arbol = arbol[nombre]
+    return arbol
+
+
+def seleccion_pedida(request):
+    """(campos, expandir) de la petición, o None si es una petición sin selección"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    parametros = request.query_params
+    if PARAMETRO_CAMPOS not in parametros and PARAMETRO_EXPANDIR not in parametros:
+        return None
+    campos = parametros.get(PARAMETRO_CAMPOS)
+    expandir = parametros.get(PARAMETRO_EXPANDIR)
+    return (
+        _arbol(campos) if campos is not None else None,
+        _arbol(expandir) if expandir is not None else None,
+    )
+
+
+class CamposDinamicosMixin:
+    """
+    Recorta los campos del serializer según ?fields= y ?expand= (ver arriba).
+    También sirve en serializers anidados: cada uno toma la parte de la
+    selección que corresponde a su ruta.
+    """
+
+    def _ruta(self):
+        ruta = []
+        nodo = self
+        while nodo.parent is not None:
+            if nodo.field_name:
+                ruta.insert(0, nodo.field_name)
+            nodo = nodo.parent
+        return ruta
+
+    def get_fields(self):
+        campos = super().get_fields()
+        seleccion = seleccion_pedida(self.context.get('request'))
+        if seleccion is None:
+            return campos
+
+        ruta = self._ruta()
+        pedidos = _subarbol(seleccion[0], ruta) if seleccion[0] is not None else None
+        expandidos = _subarbol(seleccion[1], ruta) if seleccion[1] is not None else None
+        if ruta and (pedidos is None and expandidos is None):
+            # Anidado nombrado sin subcampos: completo
+            return campos
+
+        expandibles = getattr(getattr(self, 'Meta', None), 'expandibles', ())
+        for nombre in list(campos):
+            if campos[nombre].write_only:
+                continue
+            en_campos = pedidos is not None and nombre in pedidos
+            en_expandir = expandidos is not None and nombre in expandidos
+            if nombre in expandibles:
+                incluir = en_campos or en_expandir or (pedidos is None and expandidos is None)
+            else:
+                incluir = pedidos is None or en_campos or en_expandir
+            if not incluir:
+                del campos[nombre]
+        return campos
+
+
+def _rutas_select(arbol, prefijo=''):
+    """Árbol de query.select_related -> ['cliente', 'carga_item__producto', ...]"""
+    rutas = []
+    for nombre, hijos in arbol.items():
+        ruta = f'{prefijo}{nombre}'
+        rutas.append(ruta)
+        rutas.extend(_rutas_select(hijos, f'{ruta}__'))
+    return rutas
+
+
+def _relacionadas(ruta, necesarias):
+    return any(ruta == n or ruta.startswith(n + '__') or n.startswith(ruta + '__') for n in necesarias)
+
+
+def _necesidades(modelo, campos, relaciones):
+    """
+    Columnas del modelo, columnas de las relaciones unidas ('cliente__nombre'),
+    relaciones a unir (select), relaciones a precargar (prefetch) y lookups
+    declarados en Meta.relaciones que leen los campos. columnas es None si
+    algún campo lee algo que no se puede deducir; las relaciones unidas que
+    se leen completas (serializer anidado, propiedades) no entran en
+    columnas_unidas sino en `completas`.
+    """
+    columnas, columnas_unidas, completas = set(), set(), set()
+    select, prefetch, declarados = set(), set(), set()
+    for nombre, campo in campos.items():
+        if campo.write_only:
+            continue
+        if nombre in relaciones:
+            declarados.update(relaciones[nombre])
+            continue
+        if campo.source == '*':
+            columnas = None
+            continue
+
+        actual = modelo
+        ruta = []
+        for posicion, atributo in enumerate(campo.source_attrs):
+            try:
+                campo_modelo = actual._meta.get_field(atributo)
+            except FieldDoesNotExist:
+                # Propiedad, método o anotación: no se sabe qué columnas usa
+                if posicion == 0:
+                    columnas = None
+                else:
+                    completas.add('__'.join(ruta))
+                break
+            if posicion == 0 and columnas is not None and campo_modelo.concrete:
+                columnas.add(campo_modelo.name)
+            if not campo_modelo.is_relation:
+                if ruta:
+                    columnas_unidas.add('__'.join(ruta + [atributo]))
+                break
+            ruta.append(atributo)
+            if campo_modelo.one_to_many or campo_modelo.many_to_many:
+                prefetch.add('__'.join(ruta))
+                ruta = []
+                break
+            ultimo = posicion == len(campo.source_attrs) - 1
+            if ultimo and not isinstance(campo, BaseSerializer):
+                # Solo el id de la relación (PrimaryKeyRelatedField): no hace falta el join
+                ruta.pop()
+                break
+            if ultimo:
+                completas.add('__'.join(ruta))
+            actual = campo_modelo.related_model
+        if ruta:
+            select.add('__'.join(ruta))
+    completas |= declarados
+    return columnas, columnas_unidas, completas, select, prefetch, declarados
+
+
+def optimizar_queryset(queryset, serializer, campos_requeridos=()):
+    """
+    Ajusta joins, prefetch y columnas del queryset a los campos que va a
+    serializar `serializer` (instancia ya recortada por la petición).
+    """
+    child = getattr(serializer, 'child', serializer)
+    modelo = queryset.model
+    relaciones = getattr(getattr(child, 'Meta', None), 'relaciones', {})
+    columnas, columnas_unidas, completas, select, prefetch, declarados = _necesidades(
+        modelo, child.fields, relaciones
+    )
+
+    originales = queryset.query.select_related
+    if isinstance(originales, dict):
+        rutas = {r for r in _rutas_select(originales) if _relacionadas(r, select | declarados)} | select
+        # select_related() sin argumentos uniría todas las llaves foráneas
+        queryset = queryset.select_related(None)
+        if rutas:
+            queryset = queryset.select_related(*rutas)
+    elif select:
+        queryset = queryset.select_related(*select)
+
+    lookups = []
+    for lookup in queryset._prefetch_related_lookups:
+        nombre = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+        if _relacionadas(nombre, prefetch | declarados):
+            lookups.append(lookup)
+    cubiertos = [lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup for lookup in lookups]
+    lookups += [p for p in prefetch | declarados if not _relacionadas(p, cubiertos)]
+    queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+
+    if columnas is not None:
+        # Siempre la pk y las llaves foráneas (permisos, joins), el orden y lo que pida el paginador
+        columnas |= {modelo._meta.pk.name}
+        columnas |= {f.name for f in modelo._meta.concrete_fields if f.is_relation}
+        orden = list(queryset.query.order_by) or list(modelo._meta.ordering)
+        columnas |= {o.lstrip('-').split('__')[0] for o in orden if isinstance(o, str)}
+        columnas |= set(campos_requeridos)
+        columnas = {c for c in columnas if c != 'pk'}
+        # De las relaciones unidas, solo las columnas que se leen. Si algo de
+        # la relación se lee completo se deja entera: only() parcial en una
+        # rama y select_related en otra chocan
+        completas = {c.split('__')[0] for c in completas}
+        columnas |= {c for c in columnas_unidas if c.split('__')[0] not in completas}
+        queryset = queryset.only(*columnas)
+    return queryset
+
+
+class ConsultaPorCamposMixin:
+    """
+    Para viewsets: en list y retrieve con ?fields= o ?expand=, el queryset
+    solo trae lo que el serializer va a mostrar.
+    """
+    acciones_por_campos = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.acciones_por_campos or seleccion_pedida(self.request) is None:
+            return queryset
+        requeridos = getattr(self.pagination_class, 'campos_requeridos', ())
+        return optimizar_queryset(queryset, self.get_serializer(), requeridos)
@@ -0,0 +1,217 @@
+# core/documentos.py
+"""
+Caché en disco de documentos PDF generados (acta de entrega, cuenta de cobro,
+consolidado de carga).
+
+Cada documento se guarda bajo un digest de (tipo, objeto, updated_at, huella
+de los items), así que cualquier cambio en los datos produce otra clave. El
+digest también se usa como ETag. Las señales de core.apps borran los archivos
+de un objeto cuando cambian sus items o su estado, y el tamaño total se
+limita expulsando los archivos menos usados (LRU por mtime).
+
+Recorrer todo el directorio en cada escritura cuesta más a medida que crece
+la caché. Cada proceso lleva el tamaño total estimado (sumando lo que escribe
+y restando lo que borra) y solo recorre el directorio para recortar cuando la
+estimación pasa de max_bytes o tiene más de DOCUMENTOS_CACHE_RECUENTO
+segundos: el recuento también incorpora lo escrito por otros procesos.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_totales = {}  # directorio -> (bytes estimados, time.monotonic() del último recuento)
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else None
+
+
+def huella_envio(envio):
+    """
+    Versión de los datos de un envío que influyen en sus PDFs (una consulta,
+    más la del cliente si no viene con select_related). Incluye los nombres
+    que se imprimen: cliente, y producto, proveedor y remisión de cada item.
+    """
+    agg = envio.items.aggregate(
+        n=Count('id'), suma_ids=Sum('id'), max_id=Max('id'), suma_valores=Sum('valor_unitario'),
+        producto=Max('unidad__carga_item__producto__updated_at'),
+        carga=Max('unidad__carga_item__carga__updated_at'),
+        proveedor=Max('unidad__carga_item__carga__proveedor__updated_at'),
+    )
+    return [
+        envio.updated_at.isoformat(), envio.estado, str(envio.valor_total), _fecha(envio.cliente.updated_at),
+        agg['n'], agg['suma_ids'], agg['max_id'], str(agg['suma_valores']),
+        _fecha(agg['producto']), _fecha(agg['carga']), _fecha(agg['proveedor']),
+    ]
+
+
+def huella_carga(carga):
+    """
+    Versión de los datos de una carga que influyen en su consolidado (una
+    consulta, más las de cliente y proveedor si no vienen con select_related)
+    """
+    agg = carga.items.aggregate(
+        n=Count('id'), suma_ids=Sum('id'), max_id=Max('id'), suma_cantidad=Sum('cantidad'),
+        producto=Max('producto__updated_at'),
+    )
+    return [
+        carga.updated_at.isoformat(), carga.estado,
+        _fecha(carga.cliente.updated_at), _fecha(carga.proveedor.updated_at),
+        agg['n'], agg['suma_ids'], agg['max_id'], agg['suma_cantidad'], _fecha(agg['producto']),
+    ]
+
+
+def huella_etiquetas(carga):
+    """huella_carga más las unidades generadas, cuyos códigos van en las etiquetas"""
+    from cargas.models import Unidad
+
+    agg = Unidad.objects.filter(carga_item__carga=carga).aggregate(
+        n=Count('id'), suma_ids=Sum('id'), max_id=Max('id')
+    )
+    return huella_carga(carga) + [agg['n'], agg['suma_ids'], agg['max_id']]
+
+
+class DocumentoCache:
+    def __init__(self, directorio=None, max_bytes=None):
+        self.directorio = str(directorio or settings.DOCUMENTOS_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.DOCUMENTOS_CACHE_MAX_BYTES
+
+    def _dir_objeto(self, modelo, objeto_id):
+        return os.path.join(self.directorio, modelo, str(objeto_id))
+
+    def digest(self, tipo, modelo, objeto_id, huella):
+        raw = json.dumps([tipo, modelo, objeto_id, huella], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def ruta(self, tipo, modelo, objeto_id, digest):
+        return os.path.join(self._dir_objeto(modelo, objeto_id), f'{tipo}-{digest}.pdf')
+
+    def abrir(self, ruta):
+        """Archivo abierto del documento si está en caché (y lo marca como usado recientemente)"""
+        try:
+            archivo = open(ruta, 'rb')
+        except FileNotFoundError:
+            return None
+        os.utime(ruta)
+        return archivo
+
+    def guardar(self, ruta, data):
+        """Escribe el documento de forma atómica y aplica el límite de tamaño"""
+        carpeta = os.path.dirname(ruta)
+        os.makedirs(carpeta, exist_ok=True)
+        try:
+            anterior = os.path.getsize(ruta)
+        except FileNotFoundError:
+            anterior = 0
+        fd, tmp = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, ruta)
+        self._sumar(len(data) - anterior)
+        if self.necesita_recorte():
+            self.recortar()
+        return ruta
+
+    def invalidar(self, modelo, objeto_id):
+        """Elimina todos los documentos en caché de un objeto"""
+        carpeta = self._dir_objeto(modelo, objeto_id)
+        try:
+            liberados = sum(e.stat().st_size for e in os.scandir(carpeta) if e.is_file())
+        except FileNotFoundError:
+            return
+        shutil.rmtree(carpeta, ignore_errors=True)
+        self._sumar(-liberados)
+
+    def _sumar(self, delta):
+        with _lock:
+            total, contado = _totales.get(self.directorio, (None, 0.0))
+            if total is not None:
+                _totales[self.directorio] = (max(total + delta, 0), contado)
+
+    def necesita_recorte(self):
+        """True si no hay estimación del tamaño, está vencida o pasa de max_bytes"""
+        with _lock:
+            total, contado = _totales.get(self.directorio, (None, 0.0))
+        return (
+            total is None
+            or total > self.max_bytes
+            or time.monotonic() - contado >= settings.DOCUMENTOS_CACHE_RECUENTO
+        )
+
+    def recortar(self):
+        """Expulsa los documentos menos usados hasta quedar bajo max_bytes y recuenta el total"""
+        archivos = []
+        total = 0
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                if not nombre.endswith('.pdf'):
+                    continue
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                archivos.append((st.st_mtime, st.st_size, ruta))
+                total += st.st_size
+
+        expulsados = 0
+        if total > self.max_bytes:
+            for _, size, ruta in sorted(archivos):
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                expulsados += 1
+                if total <= self.max_bytes:
+                    break
+
+        with _lock:
+            _totales[self.directorio] = (total, time.monotonic())
+        return expulsados
+
+
+def get_cache():
+    return DocumentoCache()
+
+
+def respuesta_documento(request, tipo, modelo, objeto, huella, generar, filename):
+    """
+    Sirve el documento desde la caché o lo genera con `generar()` (debe
+    retornar un buffer con getvalue()). Soporta If-None-Match -> 304.
+    """
+    cache = get_cache()
+    digest = cache.digest(tipo, modelo, objeto.id, huella)
+    etag = quote_etag(digest)
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    ruta = cache.ruta(tipo, modelo, objeto.id, digest)
+    archivo = cache.abrir(ruta)
+    if archivo is None:
+        buffer = generar()
+        cache.guardar(ruta, buffer.getvalue())
+        buffer.seek(0)
+        archivo = buffer
+        logger.debug("Documento %s generado: %s", tipo, ruta)
+
+    response = FileResponse(archivo, as_attachment=True, filename=filename, content_type='application/pdf')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
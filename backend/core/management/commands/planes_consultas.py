@@ -0,0 +1,165 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from cargas.models import Carga, CargaItem, Producto, Unidad
+from envios.models import Envio
+from partners.models import Cliente, Proveedor
+
+PREFIJO = 'PLANES'
+MODELOS_CON_INDICES = (Carga, Unidad, Envio)
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un conjunto de datos sintético y compara los planes (EXPLAIN) y tiempos de las '
+        'consultas más frecuentes sin y con los índices compuestos. Todo corre en una transacción '
+        'que se revierte al final: la base queda como estaba.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=20)
+        parser.add_argument('--cargas', type=int, default=2000, help='Cargas a sembrar')
+        parser.add_argument('--unidades', type=int, default=10, help='Unidades por ítem (3 ítems por carga)')
+        parser.add_argument('--envios', type=int, default=5000, help='Envíos a sembrar')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta (se reporta la mediana)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            datos = self._sembrar(options)
+            with connection.cursor() as cursor:
+                for modelo in (Carga, CargaItem, Unidad, Envio):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}')
+
+            consultas = self._consultas(datos)
+            self._cambiar_indices(crear=False)
+            antes = self._medir(consultas, options['repeticiones'])
+            self._cambiar_indices(crear=True)
+            despues = self._medir(consultas, options['repeticiones'])
+
+            for nombre in consultas:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{nombre}'))
+                for etiqueta, resultados in (('sin índices', antes), ('con índices', despues)):
+                    plan, ms = resultados[nombre]
+                    self.stdout.write(f'  {etiqueta}: {ms:.2f} ms')
+                    for linea in plan.splitlines():
+                        self.stdout.write(f'    {linea}')
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nResumen (mediana ms)'))
+            for nombre in consultas:
+                self.stdout.write(f'  {antes[nombre][1]:8.2f} -> {despues[nombre][1]:8.2f}  {nombre}')
+            transaction.set_rollback(True)
+
+    def _sembrar(self, options):
+        ahora = timezone.now()
+        clientes = Cliente.objects.bulk_create([
+            Cliente(nombre=f'{PREFIJO} Cliente {i}', nit=f'{PREFIJO}-C-{i}')
+            for i in range(options['clientes'])
+        ])
+        proveedor = Proveedor.objects.create(nombre=f'{PREFIJO} Proveedor', nit=f'{PREFIJO}-P')
+        productos = Producto.objects.bulk_create([
+            Producto(sku=f'{PREFIJO}-SKU-{i}', nombre=f'Producto {i}') for i in range(10)
+        ])
+
+        estados_carga = [estado for estado, _ in Carga.ESTADOS]
+        cargas = Carga.objects.bulk_create([
+            Carga(
+                cliente=clientes[i % len(clientes)], proveedor=proveedor,
+                remision=f'{PREFIJO}-{i}', estado=estados_carga[i % len(estados_carga)]
+            )
+            for i in range(options['cargas'])
+        ], batch_size=500)
+        # auto_now_add fija la misma fecha a todas: repartirlas en el último año
+        for i, carga in enumerate(cargas):
+            carga.created_at = ahora - timedelta(minutes=i * 5)
+        Carga.objects.bulk_update(cargas, ['created_at'], batch_size=500)
+
+        items = CargaItem.objects.bulk_create([
+            CargaItem(carga=carga, producto=productos[(i + j) % len(productos)], cantidad=options['unidades'])
+            for i, carga in enumerate(cargas) for j in range(3)
+        ], batch_size=500)
+
+        estados_unidad = ['disponible', 'despachada', 'despachada', 'reservada']
+        unidades = (
+            Unidad(
+                carga_item=item, codigo_barra=f'{PREFIJO}-{item.pk}-{j}',
+                estado=estados_unidad[(item.pk + j) % len(estados_unidad)]
+            )
+            for item in items for j in range(options['unidades'])
+        )
+        lote = []
+        for unidad in unidades:
+            lote.append(unidad)
+            if len(lote) == 2000:
+                Unidad.objects.bulk_create(lote)
+                lote = []
+        Unidad.objects.bulk_create(lote)
+
+        estados_envio = [estado for estado, _ in Envio.ESTADOS_ENVIO]
+        envios = Envio.objects.bulk_create([
+            Envio(
+                numero_guia=f'PL{i:08d}', cliente=clientes[i % len(clientes)], conductor='Conductor',
+                placa_vehiculo='AAA000', origen='Bodega', estado=estados_envio[i % len(estados_envio)]
+            )
+            for i in range(options['envios'])
+        ], batch_size=500)
+        for i, envio in enumerate(envios):
+            envio.created_at = ahora - timedelta(minutes=i * 2)
+        Envio.objects.bulk_update(envios, ['created_at'], batch_size=500)
+
+        self.stdout.write(
+            f'Sembrado: {len(cargas)} cargas, {len(items)} ítems, '
+            f'{len(items) * options["unidades"]} unidades, {len(envios)} envíos'
+        )
+        return {'cliente': clientes[0], 'carga': cargas[len(cargas) // 2], 'producto': items[len(items) // 2].producto_id}
+
+    def _consultas(self, datos):
+        cliente = datos['cliente']
+        carga = datos['carga']
+        recientes = ('-created_at', '-id')
+        return {
+            'Cargas del cliente (listado, keyset)':
+                Carga.objects.filter(cliente=cliente).order_by(*recientes)[:25],
+            'Cargas por estado (listado, keyset)':
+                Carga.objects.filter(estado='almacenada').order_by(*recientes)[:25],
+            'Envíos del cliente por estado (listado)':
+                Envio.objects.filter(cliente=cliente, estado='pendiente').order_by(*recientes)[:25],
+            'Envíos del cliente (listado, keyset)':
+                Envio.objects.filter(cliente=cliente).order_by(*recientes)[:25],
+            'Unidades disponibles de carga y producto (_procesar_items_manuales)':
+                Unidad.objects.filter(
+                    carga_item__carga=carga, carga_item__producto_id=datos['producto'], estado='disponible'
+                ).order_by('id')[:50],
+            'Disponibles por carga y producto (cargas-por-cliente)':
+                Unidad.objects.filter(
+                    estado='disponible', carga_item__carga__cliente=cliente,
+                    carga_item__carga__estado__in=['etiquetada', 'almacenada'],
+                ).values('carga_item__carga_id', 'carga_item__producto_id')
+                .annotate(disponibles=Count('id')).order_by('carga_item__carga_id'),
+        }
+
+    def _cambiar_indices(self, crear):
+        # Sin entrar al schema editor: en SQLite no se permite dentro de una transacción
+        editor = connection.schema_editor(collect_sql=True)
+        editor.deferred_sql = []
+        with connection.cursor() as cursor:
+            for modelo in MODELOS_CON_INDICES:
+                for indice in modelo._meta.indexes:
+                    sql = indice.create_sql(modelo, editor) if crear else indice.remove_sql(modelo, editor)
+                    cursor.execute(str(sql))
+
+    def _medir(self, consultas, repeticiones):
+        resultados = {}
+        for nombre, queryset in consultas.items():
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = (queryset.explain(), statistics.median(tiempos))
+        return resultados
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.trabajos import (
+    tomar_siguiente_trabajo, procesar_trabajo, recuperar_trabajos_colgados, limpiar_trabajos
+)
+
+
+class Command(BaseCommand):
+    help = 'Worker que genera los documentos PDF encolados (consolidado, etiquetas, acta de entrega, cuenta de cobro)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Procesa los trabajos pendientes y termina en lugar de quedarse esperando'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=settings.TRABAJOS_INTERVALO,
+            help='Segundos de espera cuando la cola está vacía'
+        )
+        parser.add_argument(
+            '--limpiar-dias', type=int, default=None,
+            help='Antes de empezar, elimina trabajos terminados con más de N días'
+        )
+
+    def handle(self, *args, **options):
+        if options['limpiar_dias'] is not None:
+            eliminados = limpiar_trabajos(options['limpiar_dias'])
+            self.stdout.write(f'Trabajos antiguos eliminados: {eliminados}')
+
+        recuperados, agotados = recuperar_trabajos_colgados()
+        if recuperados:
+            self.stdout.write(f'Trabajos colgados devueltos a la cola: {recuperados}')
+        if agotados:
+            self.stdout.write(f'Trabajos colgados marcados como fallidos: {agotados}')
+
+        while True:
+            trabajo = tomar_siguiente_trabajo()
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            procesar_trabajo(trabajo)
+            estilo = self.style.SUCCESS if trabajo.estado == 'completado' else self.style.ERROR
+            self.stdout.write(estilo(f'{trabajo} -> {trabajo.nombre_archivo or trabajo.error}'))
@@ -0,0 +1,62 @@
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP contra un servidor en marcha: lanza peticiones GET concurrentes '
+        'y reporta rendimiento y latencias. Sirve para comparar WSGI contra ASGI con las mismas URLs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs a consultar (se reparten en rotación)')
+        parser.add_argument('--token', help='JWT de acceso para la cabecera Authorization')
+        parser.add_argument('--concurrencia', type=int, default=20, help='Peticiones simultáneas')
+        parser.add_argument('--peticiones', type=int, default=500, help='Total de peticiones')
+        parser.add_argument('--timeout', type=float, default=30, help='Segundos por petición')
+
+    def _peticion(self, url, token, timeout):
+        request = Request(url)
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+        inicio = time.perf_counter()
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                response.read()
+                codigo = response.status
+        except HTTPError as e:
+            codigo = e.code
+        except (URLError, TimeoutError, OSError):
+            codigo = 'error'
+        return codigo, time.perf_counter() - inicio
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        total = options['peticiones']
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as pool:
+            resultados = list(pool.map(
+                lambda i: self._peticion(urls[i % len(urls)], options['token'], options['timeout']),
+                range(total)
+            ))
+        duracion = time.perf_counter() - inicio
+
+        codigos = Counter(codigo for codigo, _ in resultados)
+        latencias = sorted(latencia * 1000 for _, latencia in resultados)
+        percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+
+        self.stdout.write(f'Peticiones: {total} con concurrencia {options["concurrencia"]} en {duracion:.2f} s')
+        self.stdout.write(f'Rendimiento: {total / duracion:.1f} req/s')
+        self.stdout.write(
+            f'Latencia ms: p50={percentiles[49]:.1f} p95={percentiles[94]:.1f} '
+            f'p99={percentiles[98]:.1f} max={latencias[-1]:.1f}'
+        )
+        estilo = self.style.SUCCESS if set(codigos) <= {200} else self.style.WARNING
+        self.stdout.write(estilo('Respuestas: ' + ', '.join(f'{c}={n}' for c, n in sorted(codigos.items(), key=str))))
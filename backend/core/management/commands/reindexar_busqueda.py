@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.busqueda import MODELOS, reindexar
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye los textos del buscador de cargas y envíos (core/busqueda.py). '
+        'Útil después de cargar datos con bulk_create o SQL directo, que no disparan señales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', action='append', choices=list(MODELOS),
+            help='Tipo a reindexar (repetible); por defecto todos'
+        )
+
+    def handle(self, *args, **options):
+        totales = reindexar(tipos=options['tipo'] or tuple(MODELOS))
+        for tipo, total in totales.items():
+            self.stdout.write(self.style.SUCCESS(f'{tipo}: {total} documentos'))
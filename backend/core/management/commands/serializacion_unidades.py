@@ -0,0 +1,76 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cargas.codigos import valores_unidades
+from cargas.models import Carga, CargaItem, Producto, Unidad
+from cargas.serializers import UnidadSerializer, representar_unidad
+from partners.models import Cliente, Proveedor
+
+PREFIJO = 'SERIAL'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el tiempo de armar una página del listado de unidades con UnidadSerializer '
+        '(instancias con select_related) y con filas de values() (representar_unidad). '
+        'Siembra los datos en una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unidades', type=int, default=5000, help='Unidades a sembrar')
+        parser.add_argument('--pagina', type=int, default=1000, help='Filas por página medida')
+        parser.add_argument('--repeticiones', type=int, default=10, help='Ejecuciones por método (se reporta la mediana)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._sembrar(options['unidades'])
+            tamano = options['pagina']
+            base = Unidad.objects.filter(codigo_barra__startswith=PREFIJO).order_by('-created_at', '-id')
+
+            def serializer():
+                queryset = base.select_related('carga_item__carga__cliente', 'carga_item__producto')
+                return UnidadSerializer(queryset[:tamano], many=True).data
+
+            def valores():
+                return [representar_unidad(fila) for fila in valores_unidades(base)[:tamano]]
+
+            # Misma salida antes de medir
+            if [dict(fila) for fila in serializer()] != valores():
+                self.stderr.write(self.style.ERROR('Las dos salidas no coinciden'))
+
+            resultados = {
+                'UnidadSerializer': self._medir(serializer, options['repeticiones']),
+                'values() + representar_unidad': self._medir(valores, options['repeticiones']),
+            }
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nPágina de {tamano} unidades (mediana ms)'))
+            for nombre, ms in resultados.items():
+                self.stdout.write(f'  {ms:8.2f} ms  {ms * 1000 / tamano:6.1f} µs/fila  {nombre}')
+            transaction.set_rollback(True)
+
+    def _sembrar(self, total):
+        cliente = Cliente.objects.create(nombre=f'{PREFIJO} Cliente', nit=f'{PREFIJO}-C')
+        proveedor = Proveedor.objects.create(nombre=f'{PREFIJO} Proveedor', nit=f'{PREFIJO}-P')
+        productos = Producto.objects.bulk_create([
+            Producto(sku=f'{PREFIJO}-SKU-{i}', nombre=f'Producto {i}') for i in range(5)
+        ])
+        carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision=f'{PREFIJO}-REM')
+        items = CargaItem.objects.bulk_create([
+            CargaItem(carga=carga, producto=producto, cantidad=total // len(productos) + 1)
+            for producto in productos
+        ])
+        Unidad.objects.bulk_create([
+            Unidad(carga_item=items[i % len(items)], codigo_barra=f'{PREFIJO}-{i}')
+            for i in range(total)
+        ], batch_size=1000)
+        self.stdout.write(f'Sembrado: {total} unidades')
+
+    def _medir(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
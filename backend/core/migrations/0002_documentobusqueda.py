@@ -0,0 +1,79 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:04
+
+from django.db import migrations, models
+
+from core.busqueda import CONFIG_PG, INDICE_GIN, TABLA_FTS, reindexar
+
+# FTS5 con contenido externo: el texto vive en core_documentobusqueda y los
+# triggers mantienen el índice. Si una migración futura recrea esa tabla en
+# SQLite (cambios de columnas) hay que volver a crear los triggers.
+SQL_FTS = [
+    f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+    f"texto, content='core_documentobusqueda', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {TABLA_FTS}_ai AFTER INSERT ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.id, new.texto); END",
+    f"CREATE TRIGGER {TABLA_FTS}_ad AFTER DELETE ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto); END",
+    f"CREATE TRIGGER {TABLA_FTS}_au AFTER UPDATE ON core_documentobusqueda BEGIN "
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.id, old.texto); "
+    f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.id, new.texto); END",
+]
+
+
+def _indice_gin():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(SearchVector('texto', config=CONFIG_PG), name=INDICE_GIN)
+
+
+def crear_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQL_FTS:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('core', 'DocumentoBusqueda'), _indice_gin())
+
+
+def borrar_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sufijo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+    elif vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('core', 'DocumentoBusqueda'), _indice_gin())
+
+
+def poblar_documentos(apps, schema_editor):
+    reindexar(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('cargas', '0005_indices_consultas'),
+        ('envios', '0007_indices_consultas'),
+        ('partners', '0004_alter_proveedor_nit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('carga', 'Carga'), ('envio', 'Envío')], max_length=10)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('texto', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='unique_documento_busqueda')],
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, borrar_indice_texto),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
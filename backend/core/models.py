@@ -1,3 +1,76 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class TrabajoDocumento(models.Model):
+    """
+    Trabajo en segundo plano para generar un documento PDF.
+    Lo procesa el comando `procesar_trabajos` y el resultado queda en MEDIA_ROOT.
+    """
+    TIPOS = (
+        ('consolidado', 'Consolidado de carga'),
+        ('etiquetas', 'Etiquetas de carga'),
+        ('acta_entrega', 'Acta de entrega'),
+        ('cuenta_cobro', 'Cuenta de cobro'),
+    )
+
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    objeto_id = models.PositiveBigIntegerField()
+    parametros = models.JSONField(default=dict, blank=True)
+    # Hash de (tipo, objeto_id, parametros, huella de los datos) para reutilizar trabajos equivalentes
+    clave = models.CharField(max_length=40, db_index=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    archivo = models.FileField(upload_to='trabajos/%Y/%m/%d', blank=True, null=True)
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Trabajo de documento'
+        verbose_name_plural = 'Trabajos de documentos'
+        indexes = [
+            models.Index(fields=['estado', 'created_at'], name='trabajo_estado_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trabajo #{self.id} {self.tipo} ({self.estado})"
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Texto precalculado para el buscador de cargas y envíos (ver core/busqueda.py).
+    Se indexa con FTS5 en SQLite y con un índice GIN en PostgreSQL.
+    """
+    TIPOS = (
+        ('carga', 'Carga'),
+        ('envio', 'Envío'),
+    )
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    objeto_id = models.PositiveBigIntegerField()
+    texto = models.TextField()
+
+    class Meta:
+        verbose_name = 'Documento de búsqueda'
+        verbose_name_plural = 'Documentos de búsqueda'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='unique_documento_busqueda'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id}"
@@ -0,0 +1,117 @@
+# core/paginacion.py
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# Máximo de filas por página que puede pedir una integración con ?page_size=
+MAX_PAGE_SIZE = 1000
+
+
+class CursorPorIdPagination(CursorPagination):
+    """
+    Paginación por cursor sobre id: cada página es un WHERE id > cursor
+    con LIMIT, sin COUNT ni OFFSET, y no se salta filas si entran nuevas.
+    """
+    ordering = 'id'
+    page_size = 200
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class NumeroPaginaPagination(PageNumberPagination):
+    """Paginación clásica por número de página (con count), page_size configurable"""
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetFechaPagination(BasePagination):
+    """
+    Paginación keyset sobre (created_at, id) descendente: la página siguiente
+    es WHERE (created_at, id) < (último created_at, último id) con LIMIT, así
+    que cuesta lo mismo en la página 1 que en la 10.000 y no hace COUNT(*).
+    Solo avanza (next); la respuesta es {'next', 'results'}.
+
+    Con ?page= o ?ordering= se usa NumeroPaginaPagination, para las pantallas
+    que necesitan saltar a una página o el total. También con ?search=, que
+    devuelve los resultados ordenados por relevancia (core/busqueda.py).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    # Columnas que lee el paginador (core/campos.py no las excluye con only())
+    campos_requeridos = ('created_at',)
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self):
+        self.paginador_numerico = None
+
+    def _usa_numero_pagina(self, request):
+        return any(param in request.query_params for param in ('page', 'ordering', 'search'))
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(tamano, 1), self.max_page_size)
+
+    def codificar_cursor(self, objeto):
+        # Instancia o fila de values() (listado de unidades)
+        if isinstance(objeto, dict):
+            fecha, pk = objeto['created_at'], objeto['id']
+        else:
+            fecha, pk = objeto.created_at, objeto.pk
+        crudo = f'{fecha.isoformat()}|{pk}'
+        return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+    def decodificar_cursor(self, cursor):
+        try:
+            fecha, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(fecha), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._usa_numero_pagina(request):
+            self.paginador_numerico = NumeroPaginaPagination()
+            return self.paginador_numerico.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        tamano = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-pk')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            fecha, pk = self.decodificar_cursor(cursor)
+            queryset = queryset.filter(Q(created_at__lt=fecha) | Q(created_at=fecha, pk__lt=pk))
+
+        # Una fila de más indica si hay página siguiente sin contar
+        filas = list(queryset[:tamano + 1])
+        self.siguiente = self.codificar_cursor(filas[tamano - 1]) if len(filas) > tamano else None
+        return filas[:tamano]
+
+    def get_next_link(self):
+        if self.siguiente is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.siguiente)
+
+    def get_paginated_response(self, data):
+        if self.paginador_numerico is not None:
+            return self.paginador_numerico.get_paginated_response(data)
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,22 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .models import TrabajoDocumento
+
+
+class TrabajoDocumentoSerializer(serializers.ModelSerializer):
+    url_descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoDocumento
+        fields = [
+            'id', 'tipo', 'objeto_id', 'parametros', 'estado', 'nombre_archivo',
+            'error', 'url_descarga', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_url_descarga(self, obj):
+        if obj.estado != 'completado':
+            return None
+        url = reverse('trabajo-descargar', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
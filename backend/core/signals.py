@@ -0,0 +1,103 @@
+# core/signals.py
+"""
+Invalidación de la caché de documentos y actualización del índice de
+búsqueda cuando cambian envíos, cargas o los nombres que aparecen en ellos
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from cargas.models import Carga, CargaItem, Producto
+from cargas.signals import items_carga_creados
+from envios.models import Envio, EnvioItem
+from partners.models import Cliente, Proveedor
+from . import busqueda
+from .documentos import get_cache
+
+
+@receiver(post_save, sender=Envio)
+def invalidar_documentos_envio(sender, instance, **kwargs):
+    get_cache().invalidar('envio', instance.id)
+
+
+@receiver([post_save, post_delete], sender=EnvioItem)
+def invalidar_documentos_envio_item(sender, instance, **kwargs):
+    get_cache().invalidar('envio', instance.envio_id)
+
+
+@receiver(post_save, sender=Carga)
+def invalidar_documentos_carga(sender, instance, **kwargs):
+    get_cache().invalidar('carga', instance.id)
+
+
+@receiver([post_save, post_delete], sender=CargaItem)
+def invalidar_documentos_carga_item(sender, instance, **kwargs):
+    get_cache().invalidar('carga', instance.carga_id)
+
+
+# Índice de búsqueda (core/busqueda.py)
+
+@receiver(post_save, sender=Carga)
+def indexar_carga(sender, instance, **kwargs):
+    busqueda.indexar('carga', [instance.id])
+
+
+@receiver(post_delete, sender=Carga)
+def desindexar_carga(sender, instance, **kwargs):
+    busqueda.eliminar('carga', [instance.id])
+
+
+@receiver([post_save, post_delete], sender=CargaItem)
+def indexar_carga_item(sender, instance, **kwargs):
+    busqueda.indexar('carga', [instance.carga_id])
+
+
+@receiver(items_carga_creados)
+def indexar_items_creados(sender, carga, **kwargs):
+    busqueda.indexar('carga', [carga.id])
+
+
+@receiver(post_save, sender=Envio)
+def indexar_envio(sender, instance, **kwargs):
+    busqueda.indexar('envio', [instance.id])
+
+
+@receiver(post_delete, sender=Envio)
+def desindexar_envio(sender, instance, **kwargs):
+    busqueda.eliminar('envio', [instance.id])
+
+
+# Un cambio de nombre o SKU reindexa las cargas y envíos donde aparece
+CAMPOS_INDEXADOS = {
+    Producto: ('nombre', 'sku'),
+    Cliente: ('nombre',),
+    Proveedor: ('nombre',),
+}
+
+
+@receiver(pre_save, sender=Producto)
+@receiver(pre_save, sender=Cliente)
+@receiver(pre_save, sender=Proveedor)
+def guardar_nombres_anteriores(sender, instance, **kwargs):
+    campos = CAMPOS_INDEXADOS[sender]
+    instance._busqueda_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list(*campos).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Proveedor)
+def reindexar_por_nombre(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_busqueda_anterior', None)
+    actual = tuple(getattr(instance, campo) for campo in CAMPOS_INDEXADOS[sender])
+    if created or anterior is None or tuple(anterior) == actual:
+        return
+
+    if sender is Producto:
+        cargas = CargaItem.objects.filter(producto=instance).values_list('carga_id', flat=True).distinct()
+        busqueda.indexar('carga', cargas)
+    elif sender is Cliente:
+        busqueda.indexar('carga', Carga.objects.filter(cliente=instance).values_list('id', flat=True))
+        busqueda.indexar('envio', Envio.objects.filter(cliente=instance).values_list('id', flat=True))
+    else:
+        busqueda.indexar('carga', Carga.objects.filter(proveedor=instance).values_list('id', flat=True))
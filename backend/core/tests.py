@@ -1,3 +1,287 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Usuario
+from partners.models import Cliente, Proveedor
+from cargas.models import Carga, CargaItem, Producto
+from envios.models import Envio
+from .models import TrabajoDocumento
+from .trabajos import encolar_trabajo, recuperar_trabajos_colgados
+
+MEDIA_TEMPORAL = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEMPORAL)
+class TrabajosDocumentoTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEMPORAL, ignore_errors=True)
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+
+        cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        producto = Producto.objects.create(sku='SKU1', nombre='Tambor')
+        self.carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision='REM-1')
+        CargaItem.objects.create(carga=self.carga, producto=producto, cantidad=2)
+
+    def test_consolidado_asincrono(self):
+        url = f'/api/cargas/{self.carga.id}/consolidado_pdf/?asincrono=1'
+        resp = self.client_api.get(url)
+        self.assertEqual(resp.status_code, 202, resp.content)
+        trabajo_id = resp.data['id']
+        self.assertEqual(resp.data['estado'], 'pendiente')
+        self.assertIsNone(resp.data['url_descarga'])
+
+        # Una solicitud equivalente reutiliza el trabajo en cola
+        self.assertEqual(self.client_api.get(url).data['id'], trabajo_id)
+
+        call_command('procesar_trabajos', '--una-vez', stdout=open('/dev/null', 'w'))
+
+        trabajo = TrabajoDocumento.objects.get(id=trabajo_id)
+        self.assertEqual(trabajo.estado, 'completado', trabajo.error)
+
+        detalle = self.client_api.get(f'/api/trabajos/{trabajo_id}/')
+        self.assertTrue(detalle.data['url_descarga'])
+
+        descarga = self.client_api.get(f'/api/trabajos/{trabajo_id}/descargar/')
+        self.assertEqual(descarga.status_code, 200)
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'%PDF'))
+
+        # Ya completado y sin cambios en la carga: se reutiliza el resultado
+        self.assertEqual(self.client_api.get(url).data['id'], trabajo_id)
+
+    def test_no_reutiliza_documentos_de_datos_viejos(self):
+        from cargas.services import generar_unidades_para_carga
+
+        anterior = encolar_trabajo('consolidado', self.carga.id, usuario=self.admin)
+        TrabajoDocumento.objects.filter(id=anterior.id).update(estado='completado', finished_at=timezone.now())
+        self.assertEqual(encolar_trabajo('consolidado', self.carga.id, usuario=self.admin).id, anterior.id)
+
+        def renombrar(modelo, **filtro):
+            objeto = modelo.objects.get(**filtro)
+            objeto.nombre += ' (renombrado)'
+            objeto.save()
+
+        # Ninguno de estos cambios toca carga.updated_at
+        cambios = [
+            lambda: CargaItem.objects.create(
+                carga=self.carga, producto=Producto.objects.create(sku='SKU2', nombre='Caja'), cantidad=1
+            ),
+            lambda: renombrar(Producto, sku='SKU1'),
+            lambda: renombrar(Cliente, nit='C-001'),
+        ]
+        for cambio in cambios:
+            cambio()
+            trabajo = encolar_trabajo('consolidado', self.carga.id, usuario=self.admin)
+            self.assertNotEqual(trabajo.id, anterior.id)
+            TrabajoDocumento.objects.filter(id=trabajo.id).update(estado='completado', finished_at=timezone.now())
+            anterior = trabajo
+
+        etiquetas = encolar_trabajo('etiquetas', self.carga.id, usuario=self.admin)
+        generar_unidades_para_carga(self.carga)
+        self.assertNotEqual(encolar_trabajo('etiquetas', self.carga.id, usuario=self.admin).id, etiquetas.id)
+
+    def test_no_reutiliza_trabajos_de_otro_usuario(self):
+        operador = Usuario.objects.create_user(
+            username='operador', password='pass123', rol='operador', nombre='Op', apellido='User'
+        )
+        del_admin = encolar_trabajo('consolidado', self.carga.id, usuario=self.admin)
+        del_operador = encolar_trabajo('consolidado', self.carga.id, usuario=operador)
+        self.assertNotEqual(del_admin.id, del_operador.id)
+        self.assertEqual(encolar_trabajo('consolidado', self.carga.id, usuario=operador).id, del_operador.id)
+
+        client_operador = APIClient()
+        client_operador.force_authenticate(user=operador)
+        self.assertEqual(client_operador.get(f'/api/trabajos/{del_operador.id}/').status_code, 200)
+
+    def test_colgados_sin_intentos_quedan_fallidos(self):
+        hace_rato = timezone.now() - timedelta(seconds=settings.TRABAJOS_TIMEOUT + 60)
+        reintentable = TrabajoDocumento.objects.create(
+            tipo='consolidado', objeto_id=self.carga.id, clave='a',
+            estado='en_proceso', started_at=hace_rato, intentos=1,
+        )
+        agotado = TrabajoDocumento.objects.create(
+            tipo='consolidado', objeto_id=self.carga.id, clave='b',
+            estado='en_proceso', started_at=hace_rato, intentos=settings.TRABAJOS_MAX_INTENTOS,
+        )
+
+        self.assertEqual(recuperar_trabajos_colgados(), (1, 1))
+        reintentable.refresh_from_db()
+        agotado.refresh_from_db()
+        self.assertEqual(reintentable.estado, 'pendiente')
+        self.assertEqual(agotado.estado, 'fallido')
+        self.assertTrue(agotado.error)
+        self.assertIsNotNone(agotado.finished_at)
+
+
+class PlanesConsultasTests(TestCase):
+    def test_compara_planes_y_revierte(self):
+        salida = StringIO()
+        call_command('planes_consultas', '--clientes', '2', '--cargas', '20', '--envios', '20',
+                     '--repeticiones', '1', stdout=salida)
+
+        self.assertIn('con índices', salida.getvalue())
+        self.assertIn('carga_cliente_fecha_idx', salida.getvalue())
+        # Los datos sembrados se descartan y los índices siguen en la base
+        self.assertFalse(Carga.objects.exists())
+        with connection.cursor() as cursor:
+            indices = connection.introspection.get_constraints(cursor, Carga._meta.db_table)
+        self.assertIn('carga_estado_fecha_idx', indices)
+
+
+class SerializacionUnidadesTests(TestCase):
+    def test_compara_y_revierte(self):
+        salida, errores = StringIO(), StringIO()
+        call_command('serializacion_unidades', '--unidades', '30', '--pagina', '20',
+                     '--repeticiones', '1', stdout=salida, stderr=errores)
+
+        self.assertIn('representar_unidad', salida.getvalue())
+        self.assertEqual(errores.getvalue(), '')
+        self.assertFalse(Carga.objects.exists())
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+
+        self.cliente = Cliente.objects.create(nombre='Distribuidora Andina', nit='C-001')
+        self.proveedor = Proveedor.objects.create(nombre='Químicos del Valle', nit='P-001')
+        self.producto = Producto.objects.create(sku='TMB-200', nombre='Tambor plástico')
+        self.carga = Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision='REM-7788')
+        CargaItem.objects.create(carga=self.carga, producto=self.producto, cantidad=2)
+        self.otra = Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision='OTRA-1')
+
+    def _ids(self, url):
+        resp = self.client_api.get(url)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return [fila['id'] for fila in resp.data['results']]
+
+    def test_busca_cargas_por_prefijo_sin_acentos(self):
+        self.assertEqual(self._ids('/api/cargas/?search=rem-77'), [self.carga.id])
+        self.assertEqual(self._ids('/api/cargas/?search=tambor'), [self.carga.id])
+        self.assertEqual(self._ids('/api/cargas/?search=quimicos otra'), [self.otra.id])
+        self.assertEqual(self._ids('/api/cargas/?search=inexistente'), [])
+
+    def test_mantiene_el_indice_al_cambiar_nombres(self):
+        self.producto.nombre = 'Bidón metálico'
+        self.producto.save()
+        self.assertEqual(self._ids('/api/cargas/?search=bidon'), [self.carga.id])
+        self.assertEqual(self._ids('/api/cargas/?search=tambor'), [])
+
+        self.carga.delete()
+        self.assertEqual(self._ids('/api/cargas/?search=rem-7788'), [])
+
+    def test_busca_envios_por_relevancia(self):
+        envio = Envio.objects.create(
+            cliente=self.cliente, conductor='Juan Pérez', placa_vehiculo='XYZ987', origen='Bogotá'
+        )
+        Envio.objects.create(cliente=self.cliente, conductor='Ana Ruiz', placa_vehiculo='JUA111', origen='Cali')
+        self.assertEqual(self._ids('/api/envios/?search=perez'), [envio.id])
+        self.assertEqual(self._ids(f'/api/envios/?search={envio.numero_guia}'), [envio.id])
+        # "juan" aparece como palabra en el primero y como prefijo de placa en el segundo
+        self.assertEqual(len(self._ids('/api/envios/?search=jua')), 2)
+
+        self.cliente.nombre = 'Logística Sur'
+        self.cliente.save()
+        self.assertEqual(len(self._ids('/api/envios/?search=logistica')), 2)
+
+    def test_limite_se_aplica_despues_de_los_filtros(self):
+        propio = Envio.objects.create(
+            cliente=self.cliente, conductor='Juan Pérez', placa_vehiculo='XYZ987', origen='Bogotá'
+        )
+        otro_cliente = Cliente.objects.create(nombre='Otro Cliente', nit='C-002')
+        for placa in ('AAA111', 'BBB222'):
+            Envio.objects.create(cliente=otro_cliente, conductor='Juan Gómez', placa_vehiculo=placa, origen='Cali')
+        usuario_cliente = Usuario.objects.create_user(
+            username='cliente', password='pass123', rol='cliente', nombre='Cli', apellido='Ente', cliente=self.cliente
+        )
+        self.client_api.force_authenticate(user=usuario_cliente)
+
+        # Los envíos del otro cliente quedan primero en el orden global pero no ocupan el cupo
+        with override_settings(BUSQUEDA_MAX_RESULTADOS=2):
+            self.assertEqual(self._ids('/api/envios/?search=juan'), [propio.id])
+            self.assertEqual(self._ids(f'/api/envios/?search=juan&estado={propio.estado}'), [propio.id])
+
+
+class CamposDinamicosTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+
+        self.cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        self.proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        self.cliente.proveedores.add(self.proveedor)
+        producto = Producto.objects.create(sku='SKU1', nombre='Tambor')
+        self.carga = Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision='REM-1')
+        CargaItem.objects.create(carga=self.carga, producto=producto, cantidad=2)
+
+    def _get(self, url):
+        resp = self.client_api.get(url)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.data
+
+    def test_fields_recorta_salida_y_consulta(self):
+        with CaptureQueriesContext(connection) as consultas:
+            data = self._get('/api/cargas/?fields=id,remision')
+        self.assertEqual(data['results'], [{'id': self.carga.id, 'remision': 'REM-1'}])
+        # Sin items ni nombres: una sola consulta, sin joins ni columnas de más
+        self.assertEqual(len(consultas), 1)
+        sql = consultas[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('observaciones', sql)
+
+    def test_fields_anidados(self):
+        data = self._get(f'/api/cargas/{self.carga.id}/?fields=id,cliente_nombre,items.cantidad')
+        self.assertEqual(data, {'id': self.carga.id, 'cliente_nombre': 'Cliente A', 'items': [{'cantidad': 2}]})
+
+    def test_expand_vacio_omite_anidados(self):
+        with self.assertNumQueries(1):
+            data = self._get(f'/api/cargas/{self.carga.id}/?expand=')
+        self.assertNotIn('items', data)
+        self.assertEqual(data['proveedor_nombre'], 'Prov X')
+
+        # Conteo del paginador y la página, sin proveedores
+        with self.assertNumQueries(2):
+            data = self._get('/api/partners/clientes/?expand=')
+        self.assertNotIn('proveedores', data['results'][0])
+
+    def test_sin_parametros_respuesta_completa(self):
+        otro = Cliente.objects.create(nombre='Cliente B', nit='C-002')
+        otro.proveedores.add(self.proveedor)
+        # Los proveedores de todos los clientes en una consulta (prefetch)
+        with self.assertNumQueries(3):
+            data = self._get('/api/partners/clientes/')
+        self.assertEqual(data['results'][0]['proveedores'][0]['nombre'], 'Prov X')
+
+        data = self._get(f'/api/cargas/{self.carga.id}/')
+        self.assertEqual(data['items'][0]['producto']['sku'], 'SKU1')
+
+    def test_envio_detalle_sin_items(self):
+        envio = Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+        with self.assertNumQueries(1):
+            data = self._get(f'/api/envios/{envio.id}/?fields=id,numero_guia,estado')
+        self.assertEqual(set(data), {'id', 'numero_guia', 'estado'})
@@ -0,0 +1,219 @@
+# core/trabajos.py
+"""
+Cola local de trabajos para generar documentos PDF fuera del request.
+
+Las vistas encolan con `encolar_trabajo` y responden 202 con el id del
+trabajo; el comando `procesar_trabajos` los toma de la tabla, genera el PDF
+y lo guarda en MEDIA_ROOT. No requiere brokers externos.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import TrabajoDocumento
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_proceso')
+
+
+def solicita_asincrono(request):
+    """True si el cliente pidió el documento en segundo plano (?asincrono=1)"""
+    return request.query_params.get('asincrono', '').lower() in ('1', 'true', 'si', 'sí')
+
+
+def _clave(tipo, objeto_id, parametros, huella):
+    raw = json.dumps([tipo, objeto_id, parametros, huella], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _huella(tipo, objeto_id):
+    """Versión actual de los datos del documento (core/documentos.py); None si el objeto no existe"""
+    from .documentos import huella_carga, huella_envio, huella_etiquetas
+
+    if tipo in ('consolidado', 'etiquetas'):
+        from cargas.models import Carga
+        objeto = Carga.objects.select_related('cliente', 'proveedor').filter(pk=objeto_id).first()
+        huella = huella_etiquetas if tipo == 'etiquetas' else huella_carga
+    else:
+        from envios.models import Envio
+        objeto = Envio.objects.select_related('cliente').filter(pk=objeto_id).first()
+        huella = huella_envio
+    return huella(objeto) if objeto is not None else None
+
+
+def encolar_trabajo(tipo, objeto_id, parametros=None, usuario=None):
+    """
+    Crea un trabajo o reutiliza uno equivalente: uno que siga en cola/proceso,
+    o uno completado dentro de TRABAJOS_CACHE_TTL. La clave incluye la huella
+    de los datos del documento (items, unidades, nombres impresos), así que
+    cualquier cambio desde entonces genera un trabajo nuevo; updated_at no
+    basta porque los UPDATE con F() y los cambios en items no lo tocan.
+    Solo se reutilizan trabajos del mismo solicitante: los demás usuarios no
+    ven trabajos ajenos en /api/trabajos/.
+    """
+    parametros = {k: v for k, v in (parametros or {}).items() if v not in (None, '')}
+    clave = _clave(tipo, objeto_id, parametros, _huella(tipo, objeto_id))
+    solicitante = usuario if usuario and usuario.is_authenticated else None
+
+    ventana = timezone.now() - timedelta(seconds=settings.TRABAJOS_CACHE_TTL)
+    existente = (
+        TrabajoDocumento.objects
+        .filter(clave=clave, solicitado_por=solicitante)
+        .filter(Q(estado__in=ESTADOS_ACTIVOS) | Q(estado='completado', finished_at__gte=ventana))
+        .order_by('-created_at')
+        .first()
+    )
+    if existente is not None:
+        return existente
+
+    return TrabajoDocumento.objects.create(
+        tipo=tipo,
+        objeto_id=objeto_id,
+        parametros=parametros,
+        clave=clave,
+        solicitado_por=solicitante,
+    )
+
+
+def respuesta_trabajo(trabajo, request):
+    """Respuesta 202 estándar para un documento solicitado en segundo plano"""
+    from .serializers import TrabajoDocumentoSerializer
+    serializer = TrabajoDocumentoSerializer(trabajo, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+# Generadores por tipo: cada uno retorna (archivo binario en posición 0, nombre de archivo)
+
+def _generar_consolidado(trabajo):
+    from cargas.models import Carga
+    from cargas.pdf_utils import generate_consolidado_pdf, nombre_archivo_consolidado
+
+    carga = Carga.objects.select_related('cliente', 'proveedor').get(pk=trabajo.objeto_id)
+    return generate_consolidado_pdf(carga), nombre_archivo_consolidado(carga)
+
+
+def _generar_etiquetas(trabajo):
+    from cargas.models import Carga
+    from cargas.etiquetas import EtiquetasRenderer
+
+    carga = Carga.objects.select_related('cliente').get(pk=trabajo.objeto_id)
+    params = trabajo.parametros
+    renderer = EtiquetasRenderer(carga, item_id=params.get('item_id'))
+    desde, hasta = params.get('pagina_desde'), params.get('pagina_hasta')
+
+    tmp = tempfile.TemporaryFile()
+    renderer.render(tmp, desde, hasta)
+    tmp.seek(0)
+    return tmp, renderer.filename(desde, hasta)
+
+
+def _generar_acta_entrega(trabajo):
+    from envios.models import Envio
+    from envios.pdf_generators import generate_acta_entrega_pdf
+
+    envio = Envio.objects.select_related('cliente').get(pk=trabajo.objeto_id)
+    return generate_acta_entrega_pdf(envio), f"acta_entrega_{envio.numero_guia}.pdf"
+
+
+def _generar_cuenta_cobro(trabajo):
+    from envios.models import Envio
+    from envios.pdf_generators import generate_cuenta_cobro_pdf
+
+    envio = Envio.objects.select_related('cliente').get(pk=trabajo.objeto_id)
+    return generate_cuenta_cobro_pdf(envio), f"cuenta_cobro_{envio.numero_guia}.pdf"
+
+
+GENERADORES = {
+    'consolidado': _generar_consolidado,
+    'etiquetas': _generar_etiquetas,
+    'acta_entrega': _generar_acta_entrega,
+    'cuenta_cobro': _generar_cuenta_cobro,
+}
+
+
+def tomar_siguiente_trabajo():
+    """
+    Marca como 'en_proceso' el trabajo pendiente más antiguo y lo retorna.
+    El UPDATE condicional evita que dos workers tomen el mismo trabajo.
+    """
+    while True:
+        candidato = (
+            TrabajoDocumento.objects
+            .filter(estado='pendiente')
+            .order_by('created_at')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if candidato is None:
+            return None
+
+        tomado = TrabajoDocumento.objects.filter(id=candidato, estado='pendiente').update(
+            estado='en_proceso',
+            started_at=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if tomado:
+            return TrabajoDocumento.objects.get(id=candidato)
+
+
+def procesar_trabajo(trabajo):
+    """Genera el documento de un trabajo ya tomado y guarda el resultado"""
+    try:
+        archivo, nombre = GENERADORES[trabajo.tipo](trabajo)
+        with archivo:
+            trabajo.archivo.save(nombre, File(archivo), save=False)
+        trabajo.nombre_archivo = nombre
+        trabajo.estado = 'completado'
+        trabajo.error = ''
+    except Exception as e:
+        logger.exception("Error procesando trabajo %s", trabajo.id)
+        trabajo.estado = 'fallido'
+        trabajo.error = str(e)
+
+    trabajo.finished_at = timezone.now()
+    trabajo.save(update_fields=['archivo', 'nombre_archivo', 'estado', 'error', 'finished_at'])
+    return trabajo
+
+
+def recuperar_trabajos_colgados():
+    """
+    Devuelve a la cola los trabajos 'en_proceso' de un worker que murió; los que
+    ya agotaron TRABAJOS_MAX_INTENTOS se marcan 'fallido'.
+    Retorna (devueltos a la cola, marcados como fallidos).
+    """
+    ahora = timezone.now()
+    colgados = TrabajoDocumento.objects.filter(
+        estado='en_proceso', started_at__lt=ahora - timedelta(seconds=settings.TRABAJOS_TIMEOUT)
+    )
+    agotados = colgados.filter(intentos__gte=settings.TRABAJOS_MAX_INTENTOS).update(
+        estado='fallido',
+        error=f'El trabajo no terminó tras {settings.TRABAJOS_MAX_INTENTOS} intentos',
+        finished_at=ahora,
+    )
+    devueltos = colgados.filter(intentos__lt=settings.TRABAJOS_MAX_INTENTOS).update(estado='pendiente')
+    return devueltos, agotados
+
+
+def limpiar_trabajos(dias):
+    """Elimina trabajos terminados (y sus archivos) con más de `dias` de antigüedad"""
+    limite = timezone.now() - timedelta(days=dias)
+    viejos = TrabajoDocumento.objects.filter(
+        estado__in=['completado', 'fallido'], finished_at__lt=limite
+    )
+    eliminados = 0
+    for trabajo in viejos.iterator():
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+        trabajo.delete()
+        eliminados += 1
+    return eliminados
@@ -0,0 +1,7 @@
+from rest_framework.routers import DefaultRouter
+from .views import TrabajoDocumentoViewSet
+
+router = DefaultRouter()
+router.register(r'trabajos', TrabajoDocumentoViewSet, basename='trabajo')
+
+urlpatterns = router.urls
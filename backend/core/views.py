@@ -1,3 +1,42 @@
-from django.shortcuts import render
+from django.http import FileResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-# Create your views here.
+from .models import TrabajoDocumento
+from .serializers import TrabajoDocumentoSerializer
+
+
+class TrabajoDocumentoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta y descarga de documentos generados en segundo plano.
+    Cada usuario ve sus propios trabajos; el admin ve todos.
+    """
+    queryset = TrabajoDocumento.objects.all().order_by('-created_at')
+    serializer_class = TrabajoDocumentoSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.rol != 'admin':
+            queryset = queryset.filter(solicitado_por=self.request.user)
+
+        estado = self.request.query_params.get('estado')
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        """GET /api/trabajos/<id>/descargar/"""
+        trabajo = self.get_object()
+        if trabajo.estado != 'completado' or not trabajo.archivo:
+            return Response(
+                {'detail': f'El documento aún no está disponible. Estado: {trabajo.estado}'},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            trabajo.archivo.open('rb'),
+            as_attachment=True,
+            filename=trabajo.nombre_archivo,
+            content_type='application/pdf'
+        )
@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import ResumenCargaDiario, ResumenEnvioDiario
 
-# Register your models here.
+
+@admin.register(ResumenCargaDiario)
+class ResumenCargaDiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'cliente', 'proveedor', 'estado', 'cargas', 'items']
+    list_filter = ['estado', 'fecha']
+
+
+@admin.register(ResumenEnvioDiario)
+class ResumenEnvioDiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'cliente', 'estado', 'envios', 'valor_total']
+    list_filter = ['estado', 'fecha']
@@ -0,0 +1,125 @@
+# dashboard/cache.py
+"""
+Caché de respuestas del dashboard sobre el framework de caché de Django.
+
+La clave incluye acción, rol, alcance (cliente propio o todos), parámetros
+de la consulta y un número de versión. Cuando cambian cargas, envíos o
+partners se incrementa la versión del cliente afectado y la global, de modo
+que solo quedan obsoletas las respuestas que podían incluir esos datos.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+PREFIJO = 'dashboard'
+VERSION_GLOBAL = f'{PREFIJO}:version:global'
+# Incluida en todas las claves: invalidar_todo() descarta también las de cada cliente
+VERSION_TODO = f'{PREFIJO}:version:todo'
+ACCIONES_CACHEADAS = []
+
+
+def _clave_version_cliente(cliente_id):
+    return f'{PREFIJO}:version:cliente:{cliente_id}'
+
+
+def _version(clave):
+    # Si la versión no existe (o fue expulsada) se inicia con el reloj para no reutilizar números viejos
+    cache.add(clave, int(time.time() * 1000), None)
+    return cache.get(clave)
+
+
+def _incrementar(clave, inicial=1, timeout=None):
+    if not cache.add(clave, inicial, timeout):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # La clave expiró entre add() e incr()
+            cache.set(clave, inicial, timeout)
+
+
+def _invalidar(cliente_id=None, todo=False):
+    inicial = int(time.time() * 1000)
+    _incrementar(VERSION_GLOBAL, inicial)
+    if cliente_id:
+        _incrementar(_clave_version_cliente(cliente_id), inicial)
+    if todo:
+        _incrementar(VERSION_TODO, inicial)
+
+
+def invalidar(cliente_id=None, todo=False):
+    """
+    Marca como obsoletas las respuestas globales y, si se indica, las del
+    cliente (o todas con todo=True). Se repite al confirmar la transacción
+    para no dejar en caché lo que otra petición leyó antes del commit.
+    """
+    _invalidar(cliente_id, todo)
+    transaction.on_commit(lambda: _invalidar(cliente_id, todo))
+
+
+def invalidar_todo():
+    invalidar(todo=True)
+
+
+def _alcance(user):
+    if user.rol == 'cliente' and user.cliente_id:
+        return f'c{user.cliente_id}', _clave_version_cliente(user.cliente_id)
+    return 'all', VERSION_GLOBAL
+
+
+def clave_respuesta(accion, request):
+    alcance, clave_version = _alcance(request.user)
+    params = '&'.join(f'{k}={v}' for k, v in sorted(request.GET.items()))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    version = f'{_version(VERSION_TODO)}.{_version(clave_version)}'
+    return f'{PREFIJO}:{accion}:{request.user.rol}:{alcance}:{version}:{digest}'
+
+
+def _registrar(accion, resultado):
+    _incrementar(f'{PREFIJO}:stats:{accion}:{resultado}')
+
+
+def estadisticas():
+    """Aciertos y fallos por acción desde que arrancó la caché"""
+    acciones = {}
+    for accion in ACCIONES_CACHEADAS:
+        hits = cache.get(f'{PREFIJO}:stats:{accion}:hit', 0)
+        misses = cache.get(f'{PREFIJO}:stats:{accion}:miss', 0)
+        acciones[accion] = {'hits': hits, 'misses': misses}
+
+    hits = sum(a['hits'] for a in acciones.values())
+    misses = sum(a['misses'] for a in acciones.values())
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        'ttl': settings.DASHBOARD_CACHE_TTL,
+        'backend': settings.CACHES['default']['BACKEND'],
+        'acciones': acciones,
+    }
+
+
+def cache_dashboard(view_func):
+    """Decorador para acciones de DashboardViewSet: cachea las respuestas 200"""
+    accion = view_func.__name__
+    ACCIONES_CACHEADAS.append(accion)
+
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        clave = clave_respuesta(accion, request)
+        data = cache.get(clave)
+        if data is not None:
+            _registrar(accion, 'hit')
+            return Response(data)
+
+        _registrar(accion, 'miss')
+        response = view_func(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(clave, response.data, settings.DASHBOARD_CACHE_TTL)
+        return response
+
+    return wrapper
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.resumen import reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero los resúmenes diarios de cargas y envíos del dashboard'
+
+    def handle(self, *args, **options):
+        filas_cargas, filas_envios = reconstruir_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumen reconstruido: {filas_cargas} filas de cargas, {filas_envios} filas de envíos'
+        ))
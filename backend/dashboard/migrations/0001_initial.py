@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('partners', '0004_alter_proveedor_nit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCargaDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=20)),
+                ('cargas', models.IntegerField(default=0)),
+                ('items', models.BigIntegerField(default=0)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='partners.cliente')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='partners.proveedor')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes diarios de cargas',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['cliente', 'fecha'], name='resumen_carga_cli_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'cliente', 'proveedor', 'estado'), name='unique_resumen_carga_dia')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenEnvioDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(max_length=20)),
+                ('envios', models.IntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='partners.cliente')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes diarios de envíos',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['cliente', 'fecha'], name='resumen_envio_cli_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'cliente', 'estado'), name='unique_resumen_envio_dia')],
+            },
+        ),
+    ]
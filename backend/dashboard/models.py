@@ -1,3 +1,59 @@
 from django.db import models
 
-# Create your models here.
+from partners.models import Cliente, Proveedor
+
+
+class ResumenCargaDiario(models.Model):
+    """
+    Acumulado diario de cargas por cliente, proveedor y estado.
+    Se mantiene con las señales de dashboard.signals y se puede
+    reconstruir con el comando `reconstruir_resumen`.
+    """
+    fecha = models.DateField()
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name='+')
+    estado = models.CharField(max_length=20)
+    cargas = models.IntegerField(default=0)
+    # Suma de CargaItem.cantidad de esas cargas
+    items = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['fecha']
+        verbose_name_plural = 'Resúmenes diarios de cargas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'cliente', 'proveedor', 'estado'],
+                name='unique_resumen_carga_dia'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['cliente', 'fecha'], name='resumen_carga_cli_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} C{self.cliente_id} P{self.proveedor_id} {self.estado}: {self.cargas}"
+
+
+class ResumenEnvioDiario(models.Model):
+    """Acumulado diario de envíos por cliente y estado"""
+    fecha = models.DateField()
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    estado = models.CharField(max_length=20)
+    envios = models.IntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['fecha']
+        verbose_name_plural = 'Resúmenes diarios de envíos'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'cliente', 'estado'],
+                name='unique_resumen_envio_dia'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['cliente', 'fecha'], name='resumen_envio_cli_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} C{self.cliente_id} {self.estado}: {self.envios}"
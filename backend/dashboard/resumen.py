@@ -0,0 +1,124 @@
+# dashboard/resumen.py
+"""
+Mantenimiento de los resúmenes diarios del dashboard.
+
+Las señales aplican deltas (+/-) sobre la fila del día, cliente, proveedor y
+estado correspondiente; `reconstruir_resumenes` recalcula todo desde cero.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from cargas.models import Carga, CargaItem
+from envios.models import Envio
+from .cache import invalidar_todo
+from .models import ResumenCargaDiario, ResumenEnvioDiario
+
+
+def fecha_resumen(created_at):
+    """Día (zona horaria local) en que se contabiliza un registro"""
+    return timezone.localdate(created_at)
+
+
+def _aplicar_delta(modelo, claves, deltas):
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+
+    actualizados = modelo.objects.filter(**claves).update(
+        **{campo: F(campo) + valor for campo, valor in deltas.items()}
+    )
+    if actualizados:
+        return
+
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **deltas)
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**claves).update(
+            **{campo: F(campo) + valor for campo, valor in deltas.items()}
+        )
+
+
+def delta_carga(fecha, cliente_id, proveedor_id, estado, cargas=0, items=0):
+    _aplicar_delta(
+        ResumenCargaDiario,
+        {'fecha': fecha, 'cliente_id': cliente_id, 'proveedor_id': proveedor_id, 'estado': estado},
+        {'cargas': cargas, 'items': items},
+    )
+
+
+def delta_envio(fecha, cliente_id, estado, envios=0, valor_total=0):
+    _aplicar_delta(
+        ResumenEnvioDiario,
+        {'fecha': fecha, 'cliente_id': cliente_id, 'estado': estado},
+        {'envios': envios, 'valor_total': Decimal(str(valor_total or 0))},
+    )
+
+
+def clave_carga(carga):
+    """(fecha, cliente_id, proveedor_id, estado) de una carga"""
+    return (fecha_resumen(carga.created_at), carga.cliente_id, carga.proveedor_id, carga.estado)
+
+
+def clave_envio(envio):
+    """(fecha, cliente_id, estado) de un envío"""
+    return (fecha_resumen(envio.created_at), envio.cliente_id, envio.estado)
+
+
+@transaction.atomic
+def reconstruir_resumenes():
+    """Recalcula los resúmenes completos con tres consultas agrupadas"""
+    ResumenCargaDiario.objects.all().delete()
+    ResumenEnvioDiario.objects.all().delete()
+
+    cargas = {}
+    filas = (
+        Carga.objects.order_by()
+        .annotate(fecha=TruncDate('created_at'))
+        .values('fecha', 'cliente_id', 'proveedor_id', 'estado')
+        .annotate(total=Count('id'))
+    )
+    for f in filas:
+        clave = (f['fecha'], f['cliente_id'], f['proveedor_id'], f['estado'])
+        cargas[clave] = [f['total'], 0]
+
+    filas = (
+        CargaItem.objects.order_by()
+        .annotate(fecha=TruncDate('carga__created_at'))
+        .values('fecha', 'carga__cliente_id', 'carga__proveedor_id', 'carga__estado')
+        .annotate(total=Sum('cantidad'))
+    )
+    for f in filas:
+        clave = (f['fecha'], f['carga__cliente_id'], f['carga__proveedor_id'], f['carga__estado'])
+        cargas.setdefault(clave, [0, 0])[1] = f['total'] or 0
+
+    ResumenCargaDiario.objects.bulk_create([
+        ResumenCargaDiario(
+            fecha=fecha, cliente_id=cliente_id, proveedor_id=proveedor_id, estado=estado,
+            cargas=total, items=items
+        )
+        for (fecha, cliente_id, proveedor_id, estado), (total, items) in cargas.items()
+    ], batch_size=1000)
+
+    filas = (
+        Envio.objects.order_by()
+        .annotate(fecha=TruncDate('created_at'))
+        .values('fecha', 'cliente_id', 'estado')
+        .annotate(total=Count('id'), valor=Sum('valor_total'))
+    )
+    ResumenEnvioDiario.objects.bulk_create([
+        ResumenEnvioDiario(
+            fecha=f['fecha'], cliente_id=f['cliente_id'], estado=f['estado'],
+            envios=f['total'], valor_total=f['valor'] or 0
+        )
+        for f in filas
+    ], batch_size=1000)
+
+    # Todas las respuestas cacheadas del dashboard dependen de los resúmenes
+    invalidar_todo()
+    return len(cargas), ResumenEnvioDiario.objects.count()
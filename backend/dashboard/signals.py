@@ -0,0 +1,182 @@
+# dashboard/signals.py
+"""Actualización incremental de los resúmenes diarios e invalidación de la caché del dashboard"""
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from cargas.models import Carga, CargaItem
+from cargas.signals import items_carga_creados
+from envios.models import Envio
+from envios.signals import valor_total_actualizado
+from partners.models import Cliente, Proveedor
+from .cache import invalidar, invalidar_todo
+from .resumen import delta_carga, delta_envio, clave_carga, clave_envio, fecha_resumen
+
+CAMPOS_CARGA = {'cliente', 'proveedor', 'estado'}
+CAMPOS_ENVIO = {'cliente', 'estado', 'valor_total'}
+
+
+def _afecta(update_fields, campos):
+    return update_fields is None or bool(campos & set(update_fields))
+
+
+def _decimal(valor):
+    # valor_total puede venir como float/int asignado directamente en la instancia
+    return Decimal(str(valor or 0))
+
+
+# Cargas
+
+@receiver(pre_save, sender=Carga)
+def carga_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._resumen_anterior = None
+    if instance.pk and _afecta(update_fields, CAMPOS_CARGA):
+        anterior = Carga.objects.filter(pk=instance.pk).values(
+            'created_at', 'cliente_id', 'proveedor_id', 'estado'
+        ).first()
+        if anterior is not None:
+            instance._resumen_anterior = (
+                fecha_resumen(anterior['created_at']), anterior['cliente_id'],
+                anterior['proveedor_id'], anterior['estado']
+            )
+
+
+@receiver(post_save, sender=Carga)
+def carga_post_save(sender, instance, created, **kwargs):
+    if created:
+        delta_carga(*clave_carga(instance), cargas=1)
+        return
+
+    anterior = getattr(instance, '_resumen_anterior', None)
+    nueva = clave_carga(instance)
+    if anterior is None or anterior == nueva:
+        return
+
+    # Cambió estado/cliente/proveedor: mover la carga y sus items a la nueva fila
+    items = instance.items.aggregate(total=Sum('cantidad'))['total'] or 0
+    delta_carga(*anterior, cargas=-1, items=-items)
+    delta_carga(*nueva, cargas=1, items=items)
+
+
+@receiver(post_delete, sender=Carga)
+def carga_post_delete(sender, instance, **kwargs):
+    # Los items se descuentan en sus propios post_delete (se borran antes por cascada)
+    delta_carga(*clave_carga(instance), cargas=-1)
+
+
+@receiver(pre_save, sender=CargaItem)
+def carga_item_pre_save(sender, instance, **kwargs):
+    instance._resumen_anterior = None
+    if instance.pk:
+        instance._resumen_anterior = CargaItem.objects.filter(pk=instance.pk).values(
+            'carga_id', 'cantidad'
+        ).first()
+
+
+@receiver(post_save, sender=CargaItem)
+def carga_item_post_save(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_resumen_anterior', None)
+    if created or anterior is None:
+        delta_carga(*clave_carga(instance.carga), items=instance.cantidad)
+        return
+
+    if anterior['carga_id'] != instance.carga_id:
+        delta_carga(*clave_carga(Carga.objects.get(pk=anterior['carga_id'])), items=-anterior['cantidad'])
+        delta_carga(*clave_carga(instance.carga), items=instance.cantidad)
+    else:
+        delta_carga(*clave_carga(instance.carga), items=instance.cantidad - anterior['cantidad'])
+
+
+@receiver(post_delete, sender=CargaItem)
+def carga_item_post_delete(sender, instance, **kwargs):
+    carga = Carga.objects.filter(pk=instance.carga_id).first()
+    if carga is not None:
+        delta_carga(*clave_carga(carga), items=-instance.cantidad)
+
+
+@receiver(items_carga_creados)
+def carga_items_bulk(sender, carga, items, **kwargs):
+    delta_carga(*clave_carga(carga), items=sum(item.cantidad for item in items))
+
+
+# Envíos
+
+@receiver(pre_save, sender=Envio)
+def envio_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._resumen_anterior = None
+    if instance.pk and _afecta(update_fields, CAMPOS_ENVIO):
+        instance._resumen_anterior = Envio.objects.filter(pk=instance.pk).values(
+            'created_at', 'cliente_id', 'estado', 'valor_total'
+        ).first()
+
+
+@receiver(post_save, sender=Envio)
+def envio_post_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        delta_envio(*clave_envio(instance), envios=1, valor_total=instance.valor_total)
+        return
+
+    anterior = getattr(instance, '_resumen_anterior', None)
+    if anterior is None:
+        return
+
+    # Si el guardado no escribió valor_total, el de la instancia puede estar viejo
+    if update_fields is None or 'valor_total' in update_fields:
+        valor = _decimal(instance.valor_total)
+    else:
+        valor = anterior['valor_total']
+    clave_anterior = (fecha_resumen(anterior['created_at']), anterior['cliente_id'], anterior['estado'])
+    nueva = clave_envio(instance)
+    if clave_anterior == nueva:
+        delta_envio(*nueva, valor_total=valor - anterior['valor_total'])
+    else:
+        delta_envio(*clave_anterior, envios=-1, valor_total=-anterior['valor_total'])
+        delta_envio(*nueva, envios=1, valor_total=valor)
+
+
+@receiver(post_delete, sender=Envio)
+def envio_post_delete(sender, instance, **kwargs):
+    delta_envio(*clave_envio(instance), envios=-1, valor_total=-_decimal(instance.valor_total))
+
+
+@receiver(valor_total_actualizado)
+def envio_valor_total_delta(sender, envio, delta, **kwargs):
+    delta_envio(*clave_envio(envio), valor_total=delta)
+    invalidar(envio.cliente_id)
+
+
+# Caché de respuestas
+
+@receiver(post_save, sender=Carga)
+@receiver(post_delete, sender=Carga)
+@receiver(post_save, sender=Envio)
+@receiver(post_delete, sender=Envio)
+def invalidar_cache_cliente(sender, instance, **kwargs):
+    invalidar(instance.cliente_id)
+
+
+@receiver(post_save, sender=CargaItem)
+@receiver(post_delete, sender=CargaItem)
+def invalidar_cache_item(sender, instance, **kwargs):
+    cliente_id = Carga.objects.filter(pk=instance.carga_id).values_list('cliente_id', flat=True).first()
+    invalidar(cliente_id)
+
+
+@receiver(items_carga_creados)
+def invalidar_cache_items_bulk(sender, carga, **kwargs):
+    invalidar(carga.cliente_id)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_cache_partner_cliente(sender, instance, **kwargs):
+    invalidar(instance.id)
+
+
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+def invalidar_cache_proveedor(sender, instance, **kwargs):
+    # Los proveedores aparecen en los filtros de cualquier cliente
+    invalidar_todo()
@@ -1,3 +1,179 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APIClient
+
+from accounts.models import Usuario
+from partners.models import Cliente, Proveedor
+from cargas.models import Carga, CargaItem, Producto
+from envios.models import Envio
+from .models import ResumenCargaDiario, ResumenEnvioDiario
+
+
+class DatosGraficosTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+
+        self.cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        self.proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        hace_dos_dias = timezone.now() - timedelta(days=2)
+        for i in range(3):
+            carga = Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision=f'REM-{i}')
+            if i == 0:
+                Carga.objects.filter(pk=carga.pk).update(created_at=hace_dos_dias)
+        Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+        # El cambio de fecha con update() no pasa por las señales: reconstruir el resumen
+        call_command('reconstruir_resumen', stdout=StringIO())
+
+    def test_serie_diaria_una_consulta_por_modelo(self):
+        with self.assertNumQueries(2):
+            resp = self.client_api.get('/api/dashboard/datos_graficos/?time_filter=week')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['granularidad'], 'dia')
+        self.assertEqual(len(resp.data['dates']), 8)
+        self.assertEqual(resp.data['cargas'][-1], 2)
+        self.assertEqual(resp.data['cargas'][-3], 1)
+        self.assertEqual(sum(resp.data['envios']), 1)
+
+    def test_serie_anual_por_mes(self):
+        resp = self.client_api.get('/api/dashboard/datos_graficos/?time_filter=year')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['granularidad'], 'mes')
+        self.assertEqual(len(resp.data['dates']), 12)
+        self.assertEqual(resp.data['cargas'][-1] + resp.data['cargas'][-2], 3)
+
+    def test_granularidad_invalida(self):
+        resp = self.client_api.get('/api/dashboard/datos_graficos/?granularidad=hora')
+        self.assertEqual(resp.status_code, 400)
+
+
+class ResumenDiarioTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+        self.cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        self.proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        self.producto = Producto.objects.create(sku='SKU1', nombre='Tambor')
+
+    def _resumen(self):
+        cargas = list(ResumenCargaDiario.objects.filter(cargas__gt=0).values_list('estado', 'cargas', 'items'))
+        envios = list(ResumenEnvioDiario.objects.filter(envios__gt=0).values_list('estado', 'envios', 'valor_total'))
+        return cargas, envios
+
+    def test_senales_mantienen_resumen_igual_a_reconstruccion(self):
+        resp = self.client_api.post('/api/cargas/', data={
+            'cliente': self.cliente.id,
+            'proveedor': self.proveedor.id,
+            'remision': 'REM-1',
+            'items_data': [{'producto_id': self.producto.id, 'cantidad': 4}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        carga = Carga.objects.get(id=resp.data['id'])
+        CargaItem.objects.create(carga=carga, producto=self.producto, cantidad=2)
+
+        envio = Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+        envio.valor_total = 150
+        envio.estado = 'pendiente'
+        envio.save()
+
+        incremental = self._resumen()
+        self.assertEqual(incremental[0], [('etiquetada', 1, 6)])
+        self.assertEqual(incremental[1][0][:2], ('pendiente', 1))
+
+        call_command('reconstruir_resumen', stdout=StringIO())
+        self.assertEqual(self._resumen(), incremental)
+
+        stats = self.client_api.get('/api/dashboard/estadisticas_generales/').data
+        self.assertEqual(stats['total_cargas'], 1)
+        self.assertEqual(stats['envios_por_estado'], {'pendiente': 1})
+
+        top = self.client_api.get('/api/dashboard/top_proveedores/').data['top_proveedores']
+        self.assertEqual(top[0]['total_items'], 6)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        self.cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        self.otro_cliente = Cliente.objects.create(nombre='Cliente B', nit='C-002')
+        self.proveedor = Proveedor.objects.create(nombre='Prov X', nit='P-001')
+        self.usuario_cliente = Usuario.objects.create_user(
+            username='cli', password='pass123', rol='cliente', nombre='Cli', apellido='User',
+            cliente=self.cliente
+        )
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(user=self.admin)
+        self.url = '/api/dashboard/estadisticas_generales/?time_filter=month'
+
+    def test_respuesta_cacheada_e_invalidada(self):
+        self.assertEqual(self.client_api.get(self.url).data['total_cargas'], 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client_api.get(self.url).data['total_cargas'], 0)
+
+        Carga.objects.create(cliente=self.cliente, proveedor=self.proveedor, remision='REM-1')
+        self.assertEqual(self.client_api.get(self.url).data['total_cargas'], 1)
+
+        stats = self.client_api.get('/api/dashboard/cache_stats/').data
+        self.assertEqual(stats['acciones']['estadisticas_generales'], {'hits': 1, 'misses': 2})
+
+    def test_invalidacion_por_cliente(self):
+        api_cliente = APIClient()
+        api_cliente.force_authenticate(user=self.usuario_cliente)
+        api_cliente.get(self.url)
+
+        # Un cambio de otro cliente no descarta la respuesta del cliente A
+        Envio.objects.create(cliente=self.otro_cliente, conductor='C', placa_vehiculo='P', origen='O')
+        with self.assertNumQueries(0):
+            self.assertEqual(api_cliente.get(self.url).data['total_envios'], 0)
+
+        Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+        self.assertEqual(api_cliente.get(self.url).data['total_envios'], 1)
+
+    def test_stats_solo_admin(self):
+        api_cliente = APIClient()
+        api_cliente.force_authenticate(user=self.usuario_cliente)
+        self.assertEqual(api_cliente.get('/api/dashboard/cache_stats/').status_code, 403)
+
+
+class DashboardAsincronoTests(TransactionTestCase):
+    """El adaptador async ejecuta la acción del viewset en el pool de hilos"""
+
+    def test_adaptador_responde_igual_que_el_viewset(self):
+        from asgiref.sync import async_to_sync
+        from rest_framework_simplejwt.tokens import AccessToken
+        from core.asincrono import adaptar_viewset
+        from .views import DashboardViewSet
+
+        cache.clear()
+        admin = Usuario.objects.create_user(
+            username='admin', password='pass123', rol='admin', nombre='Admin', apellido='User'
+        )
+        cliente = Cliente.objects.create(nombre='Cliente A', nit='C-001')
+        Envio.objects.create(cliente=cliente, conductor='C', placa_vehiculo='P', origen='O')
+
+        client_api = APIClient()
+        client_api.force_authenticate(user=admin)
+        esperado = client_api.get('/api/dashboard/estadisticas_generales/').data
+        cache.clear()
+
+        vista = adaptar_viewset(DashboardViewSet, 'estadisticas_generales')
+        request = AsyncRequestFactory().get(
+            '/api/dashboard/estadisticas_generales/', headers={'Authorization': f'Bearer {AccessToken.for_user(admin)}'}
+        )
+        response = async_to_sync(vista)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, esperado)
@@ -1,10 +1,21 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from core.asincrono import adaptar_viewset
+from .cache import ACCIONES_CACHEADAS
 from .views import DashboardViewSet
 
 router = DefaultRouter()
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
-urlpatterns = [
+urlpatterns = []
+if settings.VISTAS_ASINCRONAS:
+    # Las agregaciones corren en el pool de hilos y no bloquean el resto de vistas síncronas
+    urlpatterns += [
+        path(f'dashboard/{accion}/', adaptar_viewset(DashboardViewSet, accion))
+        for accion in ACCIONES_CACHEADAS
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
\ No newline at end of file
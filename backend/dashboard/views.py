@@ -3,13 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Count, Sum, Q, F, Value
-from django.db.models.functions import Coalesce
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek, TruncMonth
 from django.utils import timezone
 from datetime import timedelta, datetime
 from dateutil.relativedelta import relativedelta
 from cargas.models import Carga, CargaItem
 from envios.models import Envio, EnvioItem
 from partners.models import Cliente, Proveedor
+from accounts.permissions import IsAdminRole
+from .cache import cache_dashboard, estadisticas
+from .models import ResumenCargaDiario, ResumenEnvioDiario
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,18 +48,17 @@ class DashboardViewSet(viewsets.ViewSet):
         return filters
     
     def _aplicar_filtros_tiempo(self, queryset, time_filter):
-        """Aplica filtros de tiempo al queryset"""
-        now = timezone.now()
+        """Aplica filtros de tiempo sobre la fecha de los resúmenes diarios"""
+        hoy = timezone.localdate()
         
         if time_filter == 'today':
-            return queryset.filter(created_at__date=now.date())
+            return queryset.filter(fecha=hoy)
         elif time_filter == 'week':
-            start_date = now - timedelta(days=now.weekday())
-            return queryset.filter(created_at__date__gte=start_date.date())
+            return queryset.filter(fecha__gte=hoy - timedelta(days=hoy.weekday()))
         elif time_filter == 'month':
-            return queryset.filter(created_at__month=now.month, created_at__year=now.year)
+            return queryset.filter(fecha__month=hoy.month, fecha__year=hoy.year)
         elif time_filter == 'year':
-            return queryset.filter(created_at__year=now.year)
+            return queryset.filter(fecha__year=hoy.year)
         elif time_filter == 'all_time':
             return queryset
         return queryset
@@ -69,7 +71,13 @@ class DashboardViewSet(viewsets.ViewSet):
             filters &= Q(proveedor_id=proveedor_id)
         return queryset.filter(filters)
     
+    def _totales_por_estado(self, queryset, campo):
+        """{estado: total} sumando la columna del resumen"""
+        filas = queryset.order_by().values_list('estado').annotate(total=Sum(campo))
+        return {estado: total for estado, total in filas if total}
+    
     @action(detail=False, methods=['get'])
+    @cache_dashboard
     def estadisticas_generales(self, request):
         user = request.user
         time_filter = request.GET.get('time_filter', 'all_time')
@@ -78,23 +86,26 @@ class DashboardViewSet(viewsets.ViewSet):
         
         user_filters = self._get_user_filters(user)
         
-        # Estadísticas de cargas
-        cargas_qs = Carga.objects.filter(user_filters)
+        # Estadísticas de cargas (desde el resumen diario)
+        cargas_qs = ResumenCargaDiario.objects.filter(user_filters)
         cargas_qs = self._aplicar_filtros_tiempo(cargas_qs, time_filter)
         cargas_qs = self._aplicar_filtros_cliente_proveedor(cargas_qs, user_filters, cliente_id, proveedor_id)
         
-        # Estadísticas de envíos
-        envios_qs = Envio.objects.filter(user_filters)
+        # Estadísticas de envíos (desde el resumen diario)
+        envios_qs = ResumenEnvioDiario.objects.filter(user_filters)
         envios_qs = self._aplicar_filtros_tiempo(envios_qs, time_filter)
         if cliente_id:
             envios_qs = envios_qs.filter(cliente_id=cliente_id)
         
+        cargas_por_estado = self._totales_por_estado(cargas_qs, 'cargas')
+        envios_por_estado = self._totales_por_estado(envios_qs, 'envios')
+        
         # Para usuarios cliente, no mostrar estadísticas de total clientes/proveedores
         stats = {
-            'total_cargas': cargas_qs.count(),
-            'total_envios': envios_qs.count(),
-            'cargas_por_estado': dict(cargas_qs.values_list('estado').annotate(count=Count('id'))),
-            'envios_por_estado': dict(envios_qs.values_list('estado').annotate(count=Count('id'))),
+            'total_cargas': sum(cargas_por_estado.values()),
+            'total_envios': sum(envios_por_estado.values()),
+            'cargas_por_estado': cargas_por_estado,
+            'envios_por_estado': envios_por_estado,
         }
         
         # Solo agregar total_clientes y total_proveedores si no es cliente
@@ -107,6 +118,7 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(stats)
     
     @action(detail=False, methods=['get'])
+    @cache_dashboard
     def top_clientes(self, request):
         user = request.user
         time_filter = request.GET.get('time_filter', 'all_time')
@@ -122,12 +134,13 @@ class DashboardViewSet(viewsets.ViewSet):
         user_filters = self._get_user_filters(user)
         
         # Top clientes por número de cargas (solo para admin/operador)
-        cargas_qs = Carga.objects.filter(user_filters)
+        cargas_qs = ResumenCargaDiario.objects.filter(user_filters)
         cargas_qs = self._aplicar_filtros_tiempo(cargas_qs, time_filter)
         
         top_clientes_cargas = (
             cargas_qs.values('cliente_id', 'cliente__nombre')
-            .annotate(total_cargas=Count('id'), total_items=Sum('items__cantidad'))
+            .annotate(total_cargas=Sum('cargas'), total_items=Sum('items'))
+            .filter(total_cargas__gt=0)
             .order_by('-total_cargas')[:limit]
         )
         
@@ -142,12 +155,13 @@ class DashboardViewSet(viewsets.ViewSet):
             })
         
         # Top clientes por número de envíos (solo para admin/operador)
-        envios_qs = Envio.objects.filter(user_filters)
+        envios_qs = ResumenEnvioDiario.objects.filter(user_filters)
         envios_qs = self._aplicar_filtros_tiempo(envios_qs, time_filter)
         
         top_clientes_envios = (
             envios_qs.values('cliente_id', 'cliente__nombre')
-            .annotate(total_envios=Count('id'), valor_total=Sum('valor_total'))
+            .annotate(total_envios=Sum('envios'), valor_total_envios=Sum('valor_total'))
+            .filter(total_envios__gt=0)
             .order_by('-total_envios')[:limit]
         )
         
@@ -158,7 +172,7 @@ class DashboardViewSet(viewsets.ViewSet):
                 'cliente_id': cliente['cliente_id'],
                 'cliente_nombre': cliente['cliente__nombre'],
                 'total_envios': cliente['total_envios'],
-                'valor_total': cliente['valor_total'] or 0
+                'valor_total': cliente['valor_total_envios'] or 0
             })
         
         return Response({
@@ -167,6 +181,7 @@ class DashboardViewSet(viewsets.ViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @cache_dashboard
     def top_proveedores(self, request):
         user = request.user
         time_filter = request.GET.get('time_filter', 'all_time')
@@ -178,8 +193,8 @@ class DashboardViewSet(viewsets.ViewSet):
                 'top_proveedores': []
             })
         
-        # Consulta base de cargas
-        cargas_qs = Carga.objects.all()
+        # Consulta base sobre el resumen diario de cargas
+        cargas_qs = ResumenCargaDiario.objects.all()
         
         # Aplicar filtros de tiempo
         cargas_qs = self._aplicar_filtros_tiempo(cargas_qs, time_filter)
@@ -195,9 +210,10 @@ class DashboardViewSet(viewsets.ViewSet):
                 'proveedor__nombre'
             )
             .annotate(
-                total_cargas=Count('id'),
-                total_items=Sum('items__cantidad')
+                total_cargas=Sum('cargas'),
+                total_items=Sum('items')
             )
+            .filter(total_cargas__gt=0)
             .order_by('-total_cargas')[:limit]
         )
         
@@ -215,61 +231,94 @@ class DashboardViewSet(viewsets.ViewSet):
             'top_proveedores': result
         })
     
+    # Granularidades soportadas por datos_graficos: función de truncado y paso entre buckets
+    GRANULARIDADES = {
+        'dia': (TruncDay, relativedelta(days=1), '%Y-%m-%d'),
+        'semana': (TruncWeek, relativedelta(weeks=1), '%Y-%m-%d'),
+        'mes': (TruncMonth, relativedelta(months=1), '%Y-%m'),
+    }
+    
+    def _inicio_bucket(self, fecha, granularidad):
+        """Inicio (medianoche local) del bucket que contiene la fecha"""
+        fecha = fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+        if granularidad == 'semana':
+            return fecha - timedelta(days=fecha.weekday())
+        if granularidad == 'mes':
+            return fecha.replace(day=1)
+        return fecha
+    
+    def _conteo_por_bucket(self, queryset, granularidad, campo):
+        """Un solo GROUP BY sobre el resumen diario: {fecha_inicio_bucket: total}"""
+        trunc = self.GRANULARIDADES[granularidad][0]
+        filas = (
+            queryset.order_by()
+            .annotate(bucket=trunc('fecha'))
+            .values('bucket')
+            .annotate(total=Sum(campo))
+        )
+        return {f['bucket']: f['total'] for f in filas}
+    
     @action(detail=False, methods=['get'])
+    @cache_dashboard
     def datos_graficos(self, request):
         user = request.user
         time_filter = request.GET.get('time_filter', 'month')
         cliente_id = request.GET.get('cliente_id')
         proveedor_id = request.GET.get('proveedor_id')
         
-        user_filters = self._get_user_filters(user)
-        
-        # Datos para gráfico de evolución temporal
-        now = timezone.now()
+        # Rango y granularidad por defecto según el filtro de tiempo
+        now = timezone.localtime()
         if time_filter == 'month':
-            days = 30
-            date_format = '%Y-%m-%d'
+            inicio = now - timedelta(days=30)
+            granularidad = 'dia'
         elif time_filter == 'year':
-            days = 365
-            date_format = '%Y-%m'
+            inicio = now - relativedelta(months=11)
+            granularidad = 'mes'
         else:
-            days = 7
-            date_format = '%Y-%m-%d'
+            inicio = now - timedelta(days=7)
+            granularidad = 'dia'
+        
+        granularidad = request.GET.get('granularidad', granularidad)
+        if granularidad not in self.GRANULARIDADES:
+            return Response(
+                {'error': f"granularidad inválida. Opciones: {', '.join(self.GRANULARIDADES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        _, paso, date_format = self.GRANULARIDADES[granularidad]
+        inicio = self._inicio_bucket(inicio, granularidad)
+        
+        user_filters = self._get_user_filters(user)
+        
+        # Cargas y envíos agrupados por bucket (una consulta por resumen)
+        cargas_qs = ResumenCargaDiario.objects.filter(fecha__gte=inicio.date())
+        cargas_qs = self._aplicar_filtros_cliente_proveedor(cargas_qs, user_filters, cliente_id, proveedor_id)
+        envios_qs = ResumenEnvioDiario.objects.filter(user_filters, fecha__gte=inicio.date())
+        if cliente_id:
+            envios_qs = envios_qs.filter(cliente_id=cliente_id)
+        
+        cargas_por_bucket = self._conteo_por_bucket(cargas_qs, granularidad, 'cargas')
+        envios_por_bucket = self._conteo_por_bucket(envios_qs, granularidad, 'envios')
         
+        # Rellenar en Python los buckets sin registros
         dates = []
         cargas_data = []
         envios_data = []
-        
-        for i in range(days, -1, -1):
-            current_date = now - timedelta(days=i)
-            if time_filter == 'year':
-                date_str = current_date.strftime('%Y-%m')
-            else:
-                date_str = current_date.strftime('%Y-%m-%d')
-            
-            dates.append(date_str)
-            
-            # Cargas por fecha
-            cargas_count = Carga.objects.filter(
-                user_filters,
-                created_at__date=current_date.date()
-            ).count()
-            cargas_data.append(cargas_count)
-            
-            # Envíos por fecha
-            envios_count = Envio.objects.filter(
-                user_filters,
-                created_at__date=current_date.date()
-            ).count()
-            envios_data.append(envios_count)
+        bucket = inicio.date()
+        while bucket <= now.date():
+            dates.append(bucket.strftime(date_format))
+            cargas_data.append(cargas_por_bucket.get(bucket, 0))
+            envios_data.append(envios_por_bucket.get(bucket, 0))
+            bucket += paso
         
         return Response({
             'dates': dates,
             'cargas': cargas_data,
-            'envios': envios_data
+            'envios': envios_data,
+            'granularidad': granularidad
         })
     
     @action(detail=False, methods=['get'])
+    @cache_dashboard
     def opciones_filtros(self, request):
         user = request.user
         
@@ -300,3 +349,8 @@ class DashboardViewSet(viewsets.ViewSet):
                 {'value': 'all_time', 'label': 'Todo el tiempo'}
             ]
         })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminRole])
+    def cache_stats(self, request):
+        """Aciertos/fallos de la caché de respuestas del dashboard"""
+        return Response(estadisticas())
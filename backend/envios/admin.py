@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import Envio, EnvioItem
+from .models import Envio, EnvioItem, SincronizacionDispositivo
 
 @admin.register(Envio)
 class EnvioAdmin(admin.ModelAdmin):
@@ -15,4 +15,8 @@ class EnvioAdmin(admin.ModelAdmin):
 class EnvioItemAdmin(admin.ModelAdmin):
     list_display = ['envio', 'unidad', 'valor_unitario', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['unidad__codigo_barra', 'envio__numero_guia']
\ No newline at end of file
+    search_fields = ['unidad__codigo_barra', 'envio__numero_guia']
+@admin.register(SincronizacionDispositivo)
+class SincronizacionDispositivoAdmin(admin.ModelAdmin):
+    list_display = ['dispositivo', 'usuario', 'ultima_secuencia', 'updated_at']
+    search_fields = ['dispositivo']
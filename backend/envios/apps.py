@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class EnviosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'envios'
-    verbose_name = 'Gestión de Envíos'
\ No newline at end of file
+    verbose_name = 'Gestión de Envíos'
+
+    def ready(self):
+        from . import eventos  # noqa: F401
\ No newline at end of file
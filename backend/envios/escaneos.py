@@ -0,0 +1,188 @@
+# envios/escaneos.py
+"""
+Registro de escaneos de entrega en lote y sincronización offline.
+
+Los conductores envían ráfagas de códigos desde el lector; en lugar de una
+petición y cinco o seis consultas por código, el lote se resuelve con una
+consulta para los items, otra para los ya escaneados, un bulk_create y un
+recuento de los escaneos del envío.
+
+Sin señal, el dispositivo guarda un log append-only de escaneos numerados
+(dispositivo, secuencia) y lo sube al reconectar. `sincronizar_log` aplica
+solo las entradas posteriores a la última secuencia confirmada y responde
+con el estado de los envíos que cambiaron desde la sincronización anterior.
+
+servidor_ts no es un cursor exacto: se toma dentro de la transacción, y otra
+transacción pudo registrar un escaneo con fecha anterior que se confirma
+después. Cada sincronización relee desde `desde` menos
+ESCANEOS_SYNC_MARGEN segundos; un envío repetido solo vuelve a enviar su
+estado actual.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Envio, EnvioItem, EscaneoEntrega, SincronizacionDispositivo
+
+ESCANEADO = 'escaneado'
+YA_ESCANEADO = 'ya_escaneado'
+NO_PERTENECE = 'no_pertenece'
+ENVIO_NO_ENCONTRADO = 'envio_no_encontrado'
+ENVIO_CERRADO = 'envio_cerrado'
+
+ESTADOS_ESCANEABLES = ('pendiente', 'en_transito')
+
+
+def progreso_envio(envio):
+    """Progreso de verificación desde los contadores del envío"""
+    total = envio.items_total
+    escaneados = envio.items_escaneados_count
+    return {
+        'items_totales': total,
+        'items_escaneados': escaneados,
+        'items_pendientes': total - escaneados,
+        'porcentaje': envio.porcentaje_verificacion(),
+    }
+
+
+def registrar_escaneos(envio, escaneos, escaneado_por=''):
+    """
+    Registra una lista de escaneos [{'codigo_barra', 'fecha'}] para el envío.
+    Retorna (resultados por código en el orden recibido, progreso). Si con el
+    lote quedan todos los items verificados se completa la entrega.
+    """
+    codigos = list(dict.fromkeys(e['codigo_barra'] for e in escaneos))
+    items = dict(
+        EnvioItem.objects.filter(envio=envio, unidad__codigo_barra__in=codigos)
+        .values_list('unidad__codigo_barra', 'id')
+    )
+    ya_escaneados = set(
+        EscaneoEntrega.objects.filter(envio=envio, item_id__in=items.values())
+        .values_list('item_id', flat=True)
+    )
+
+    resultados = []
+    nuevos = {}
+    for escaneo in escaneos:
+        codigo = escaneo['codigo_barra']
+        item_id = items.get(codigo)
+        if item_id is None:
+            resultado = NO_PERTENECE
+        elif item_id in ya_escaneados or item_id in nuevos:
+            resultado = YA_ESCANEADO
+        else:
+            resultado = ESCANEADO
+            nuevos[item_id] = EscaneoEntrega(
+                envio=envio,
+                item_id=item_id,
+                escaneado_por=escaneado_por,
+                fecha_dispositivo=escaneo.get('fecha'),
+            )
+        resultados.append({'codigo_barra': codigo, 'resultado': resultado})
+
+    if nuevos:
+        # Otro lote concurrente pudo registrar el mismo item: la restricción única lo descarta
+        EscaneoEntrega.objects.bulk_create(nuevos.values(), ignore_conflicts=True)
+        # Con ignore_conflicts no se sabe cuántos entraron: recontar en un UPDATE
+        envio.recalcular_contadores(campos=('items_escaneados_count',))
+
+    progreso = progreso_envio(envio)
+    progreso['completado'] = False
+    if nuevos and progreso['items_totales'] and progreso['items_pendientes'] == 0:
+        envio.completar_entrega()
+        progreso['completado'] = True
+
+    return resultados, progreso
+
+
+def delta_envios(envios, desde=None):
+    """
+    Estado compacto de los envíos del queryset que cambiaron después de
+    `desde` (guardados o con escaneos nuevos). Sin `desde` los retorna todos.
+    """
+    envios = envios.order_by()
+    if desde is not None:
+        cambiados = envios.filter(
+            Q(updated_at__gt=desde) | Q(escaneoentrega__fecha_escaneo__gt=desde)
+        ).values('id')
+        envios = Envio.objects.filter(id__in=cambiados).order_by()
+
+    filas = envios.values_list('id', 'estado', 'items_total', 'items_escaneados_count', 'updated_at')
+    return [
+        {'id': id, 'estado': estado, 'items_totales': total, 'items_escaneados': escaneados, 'updated_at': updated_at}
+        for id, estado, total, escaneados, updated_at in filas
+    ]
+
+
+def sincronizar_log(usuario, dispositivo, entradas, envios_visibles, envios_seguidos=(), desde=None):
+    """
+    Aplica el log offline de un dispositivo. Debe llamarse dentro de
+    transaction.atomic.
+
+    entradas: [{'secuencia', 'envio', 'codigo_barra', 'fecha'}]
+    envios_visibles: queryset de envíos que el usuario puede escanear
+    envios_seguidos: ids de envíos cuyo estado quiere el dispositivo
+
+    Retorna dict con ultima_secuencia (hasta dónde puede truncar el log),
+    rechazados (solo las entradas con error), envios (delta) y servidor_ts
+    (cursor para la siguiente sincronización).
+    """
+    sync, _ = SincronizacionDispositivo.objects.get_or_create(usuario=usuario, dispositivo=dispositivo)
+    # Bloquear el registro: dos subidas simultáneas del mismo dispositivo se serializan
+    sync = SincronizacionDispositivo.objects.select_for_update().get(pk=sync.pk)
+
+    pendientes = {}
+    for entrada in entradas:
+        if entrada['secuencia'] > sync.ultima_secuencia:
+            pendientes.setdefault(entrada['secuencia'], entrada)
+
+    rechazados = []
+    tocados = set()
+    por_envio = {}
+    for entrada in sorted(pendientes.values(), key=lambda e: e['secuencia']):
+        por_envio.setdefault(entrada['envio'], []).append(entrada)
+
+    envios = envios_visibles.in_bulk(list(por_envio))
+    escaneado_por = f"{usuario.nombre} {usuario.apellido}".strip()
+    for envio_id, lote in por_envio.items():
+        envio = envios.get(envio_id)
+        if envio is None or envio.estado not in ESTADOS_ESCANEABLES:
+            motivo = ENVIO_NO_ENCONTRADO if envio is None else ENVIO_CERRADO
+            rechazados.extend(
+                {'secuencia': e['secuencia'], 'codigo_barra': e['codigo_barra'], 'motivo': motivo}
+                for e in lote
+            )
+            continue
+
+        tocados.add(envio_id)
+        resultados, _ = registrar_escaneos(envio, lote, escaneado_por)
+        rechazados.extend(
+            {'secuencia': e['secuencia'], 'codigo_barra': e['codigo_barra'], 'motivo': r['resultado']}
+            for e, r in zip(lote, resultados) if r['resultado'] == NO_PERTENECE
+        )
+
+    if pendientes:
+        sync.ultima_secuencia = max(pendientes)
+    sync.save()
+    # Después de aplicar el log: los cambios de esta subida no vuelven en la siguiente
+    servidor_ts = timezone.now()
+
+    # Los envíos tocados en esta subida siempre se reportan; los seguidos solo si cambiaron
+    envios_delta = []
+    if tocados:
+        envios_delta += delta_envios(Envio.objects.filter(id__in=tocados))
+    seguidos = set(envios_seguidos) - tocados
+    if seguidos:
+        if desde is not None:
+            desde -= timedelta(seconds=settings.ESCANEOS_SYNC_MARGEN)
+        envios_delta += delta_envios(envios_visibles.filter(id__in=seguidos), desde)
+
+    return {
+        'dispositivo': dispositivo,
+        'ultima_secuencia': sync.ultima_secuencia,
+        'rechazados': sorted(rechazados, key=lambda r: r['secuencia']),
+        'envios': envios_delta,
+        'servidor_ts': servidor_ts,
+    }
@@ -0,0 +1,108 @@
+# envios/eventos.py
+"""
+Progreso de verificación en tiempo real (Server-Sent Events).
+
+Las pantallas de verificación se suscriben a /api/envios/<id>/eventos/ en
+lugar de consultar estado-verificacion después de cada escaneo. Cuando
+cambian los contadores de escaneo o el estado del envío, el servidor envía
+el mismo cuerpo que estado-verificacion a todos los suscriptores.
+
+El difusor vive en memoria del proceso (sin Redis): cada suscriptor es una
+asyncio.Queue en el loop del servidor ASGI, y las señales, que corren en los
+hilos de las vistas síncronas, le entregan el evento con call_soon_threadsafe.
+Con varios procesos cada uno notifica solo a sus propios suscriptores.
+"""
+import asyncio
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Envio
+from .signals import contadores_actualizados
+
+# Eventos sin leer por suscriptor; si el cliente no consume se descartan los más viejos
+MAX_EVENTOS_EN_COLA = 50
+
+
+class Difusor:
+    """Suscriptores por envío y publicación segura entre hilos"""
+
+    def __init__(self):
+        self._suscriptores = {}
+        self._ultimo = {}
+        self._lock = threading.Lock()
+
+    def suscribir(self, envio_id):
+        """Registra una cola en el loop actual; debe llamarse desde código async"""
+        cola = asyncio.Queue(maxsize=MAX_EVENTOS_EN_COLA)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._suscriptores.setdefault(envio_id, set()).add((loop, cola))
+        return cola
+
+    def cancelar(self, envio_id, cola):
+        with self._lock:
+            suscriptores = self._suscriptores.get(envio_id, set())
+            suscriptores.difference_update({s for s in suscriptores if s[1] is cola})
+            if not suscriptores:
+                self._suscriptores.pop(envio_id, None)
+                self._ultimo.pop(envio_id, None)
+
+    def tiene_suscriptores(self, envio_id):
+        return envio_id in self._suscriptores
+
+    def publicar(self, envio_id, evento):
+        """Entrega el evento a los suscriptores del envío si cambió desde el último"""
+        with self._lock:
+            if self._ultimo.get(envio_id) == evento:
+                return
+            self._ultimo[envio_id] = evento
+            suscriptores = list(self._suscriptores.get(envio_id, ()))
+        for loop, cola in suscriptores:
+            try:
+                loop.call_soon_threadsafe(_encolar, cola, evento)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                self.cancelar(envio_id, cola)
+
+
+def _encolar(cola, evento):
+    if cola.full():
+        cola.get_nowait()
+    cola.put_nowait(evento)
+
+
+difusor = Difusor()
+
+
+def estado_envio(envio_id):
+    """Cuerpo del evento: el mismo de estado-verificacion (una sola consulta)"""
+    from .serializers import EstadoVerificacionSerializer
+
+    envio = Envio.objects.filter(pk=envio_id).first()
+    return EstadoVerificacionSerializer(envio).data if envio else None
+
+
+def notificar_envio(envio_id):
+    """Publica el estado del envío al confirmar la transacción, si alguien escucha"""
+    if not difusor.tiene_suscriptores(envio_id):
+        return
+
+    def emitir():
+        evento = estado_envio(envio_id)
+        if evento is not None:
+            difusor.publicar(envio_id, dict(evento))
+
+    transaction.on_commit(emitir)
+
+
+@receiver(post_save, sender=Envio)
+def envio_guardado(sender, instance, **kwargs):
+    notificar_envio(instance.pk)
+
+
+@receiver(contadores_actualizados)
+def envio_contadores(sender, envio, **kwargs):
+    notificar_envio(envio.pk)
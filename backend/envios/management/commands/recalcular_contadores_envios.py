@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from envios.models import Envio
+
+
+class Command(BaseCommand):
+    help = 'Corrige los contadores de items y escaneos de los envíos que no coinciden con las tablas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--envio', type=int, action='append', help='Limitar a estos envíos (repetible)')
+
+    def handle(self, *args, **options):
+        reales = Envio.contadores_reales()
+        envios = Envio.objects.all()
+        if options['envio']:
+            envios = envios.filter(id__in=options['envio'])
+
+        desfasados = envios.annotate(
+            real_total=reales['items_total'],
+            real_escaneados=reales['items_escaneados_count'],
+        ).filter(
+            ~Q(items_total=F('real_total')) | ~Q(items_escaneados_count=F('real_escaneados'))
+        ).values_list('id', flat=True)
+
+        corregidos = Envio.objects.filter(id__in=list(desfasados)).update(**reales)
+        self.stdout.write(self.style.SUCCESS(f'Contadores corregidos en {corregidos} envíos'))
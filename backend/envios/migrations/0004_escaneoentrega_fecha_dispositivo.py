@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0003_alter_envioitem_valor_unitario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escaneoentrega',
+            name='fecha_dispositivo',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0004_escaneoentrega_fecha_dispositivo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacionDispositivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dispositivo', models.CharField(max_length=64, unique=True)),
+                ('ultima_secuencia', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sincronización de Dispositivo',
+                'verbose_name_plural': 'Sincronizaciones de Dispositivos',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _conteo(modelo):
+    return Coalesce(
+        Subquery(
+            modelo.objects.filter(envio=OuterRef('pk')).order_by()
+            .values('envio').annotate(n=Count('id')).values('n')
+        ),
+        Value(0),
+    )
+
+
+def poblar_contadores(apps, schema_editor):
+    Envio = apps.get_model('envios', 'Envio')
+    EnvioItem = apps.get_model('envios', 'EnvioItem')
+    EscaneoEntrega = apps.get_model('envios', 'EscaneoEntrega')
+    Envio.objects.update(
+        items_total=_conteo(EnvioItem),
+        items_escaneados_count=_conteo(EscaneoEntrega),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0005_sincronizaciondispositivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envio',
+            name='items_escaneados_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='envio',
+            name='items_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
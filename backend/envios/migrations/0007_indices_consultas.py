@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0006_envio_contadores'),
+        ('partners', '0004_alter_proveedor_nit'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['cliente', 'estado', '-created_at', '-id'], name='envio_cliente_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['cliente', '-created_at', '-id'], name='envio_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['estado', '-created_at', '-id'], name='envio_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['-created_at', '-id'], name='envio_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0007_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sincronizaciondispositivo',
+            name='dispositivo',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='sincronizaciondispositivo',
+            constraint=models.UniqueConstraint(fields=('usuario', 'dispositivo'), name='unique_sincronizacion_usuario_dispositivo'),
+        ),
+    ]
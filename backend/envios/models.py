@@ -1,10 +1,28 @@
+from decimal import Decimal
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from partners.models import Cliente
+from cargas.codigos import invalidar_unidades
 from cargas.models import Unidad
+from .signals import contadores_actualizados, valor_total_actualizado
 import random
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+
+# Contadores de Envio que solo se escriben con UPDATE atómicos
+CONTADORES_ENVIO = ('items_total', 'items_escaneados_count')
+# Campos que un guardado completo solo escribe si cambiaron sobre la instancia:
+# los mantienen UPDATE atómicos (contadores, sumar_valor_total) y una instancia
+# vieja no debe pisarlos con lo que leyó
+CAMPOS_ATOMICOS_ENVIO = CONTADORES_ENVIO + ('valor_total',)
+
+
+def _decimal(valor):
+    # valor_unitario puede llegar como float desde los serializers
+    return Decimal(str(valor)) if valor is not None else Decimal('0')
+
 
 # Primero definimos EnvioItem antes de Envio
 class EnvioItem(models.Model):
@@ -26,16 +44,44 @@ class EnvioItem(models.Model):
     def __str__(self):
         return f"{self.unidad.codigo_barra} - ${self.valor_unitario}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valor ya contabilizado en Envio.valor_total, para calcular el delta al guardar
+        instance._valor_guardado = instance.__dict__.get('valor_unitario')
+        return instance
+    
     def save(self, *args, **kwargs):
+        if self._state.adding:
+            anterior = None
+        elif '_valor_guardado' in self.__dict__:
+            anterior = self._valor_guardado
+        else:
+            anterior = EnvioItem.objects.filter(pk=self.pk).values_list('valor_unitario', flat=True).first()
+        
+        creado = self._state.adding
         super().save(*args, **kwargs)
+        if creado and self.envio_id:
+            self.envio.ajustar_contadores(items=1)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'valor_unitario' not in update_fields:
+            return
+        self._valor_guardado = self.valor_unitario
         
-        if hasattr(self, 'envio'):
-            self.envio.actualizar_valor_total()
+        delta = _decimal(self.valor_unitario) - _decimal(anterior)
+        if delta and self.envio_id:
+            self.envio.sumar_valor_total(delta)
     
     def delete(self, *args, **kwargs):
         envio = self.envio
-        super().delete(*args, **kwargs)
-        envio.actualizar_valor_total()
+        valor = _decimal(self.valor_unitario)
+        escaneado = EscaneoEntrega.objects.filter(item_id=self.pk).exists()
+        resultado = super().delete(*args, **kwargs)
+        if valor:
+            envio.sumar_valor_total(-valor)
+        envio.ajustar_contadores(items=-1, escaneados=-1 if escaneado else 0)
+        return resultado
 
 class Envio(models.Model):
     ESTADOS_ENVIO = (
@@ -65,20 +111,66 @@ class Envio(models.Model):
         blank=True
     )
     fecha_entrega_verificada = models.DateTimeField(null=True, blank=True)
+    # Contadores desnormalizados para el progreso de verificación
+    # (se reparan con el comando `recalcular_contadores_envios`)
+    items_total = models.PositiveIntegerField(default=0, editable=False)
+    items_escaneados_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Envios'
+        indexes = [
+            # Listados filtrados por cliente/estado y paginación keyset (-created_at, -id)
+            models.Index(fields=['cliente', 'estado', '-created_at', '-id'], name='envio_cliente_estado_fecha_idx'),
+            models.Index(fields=['cliente', '-created_at', '-id'], name='envio_cliente_fecha_idx'),
+            models.Index(fields=['estado', '-created_at', '-id'], name='envio_estado_fecha_idx'),
+            models.Index(fields=['-created_at', '-id'], name='envio_fecha_idx'),
+        ]
         
     def __str__(self):
         return f"{self.numero_guia} - {self.cliente.nombre}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores leídos de la fila, para saber si un guardado completo los cambió
+        instance._atomicos_guardados = {}
+        instance._marcar_guardados(CAMPOS_ATOMICOS_ENVIO)
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._marcar_guardados(fields or CAMPOS_ATOMICOS_ENVIO)
+    
+    def _marcar_guardados(self, campos):
+        """Registra los campos atómicos indicados como iguales a la fila"""
+        guardados = self.__dict__.setdefault('_atomicos_guardados', {})
+        for campo in campos:
+            if campo in CAMPOS_ATOMICOS_ENVIO and campo in self.__dict__:
+                guardados[campo] = self.__dict__[campo]
+    
+    def _atomico_cambiado(self, campo):
+        guardados = self.__dict__.get('_atomicos_guardados', {})
+        return campo in guardados and self.__dict__.get(campo) != guardados[campo]
+    
     def save(self, *args, **kwargs):
         if not self.numero_guia:
             self.numero_guia = self.generar_numero_guia()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Un guardado completo con una instancia vieja no debe pisar los
+            # contadores ni el valor total que otra petición sumó con F():
+            # solo se escriben los que se asignaron sobre esta instancia
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in diferidos
+                and (f.name not in CAMPOS_ATOMICOS_ENVIO or self._atomico_cambiado(f.name))
+            ]
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._marcar_guardados(CAMPOS_ATOMICOS_ENVIO if update_fields is None else update_fields)
     
     def generar_numero_guia(self):
         """Genera número de guía con 3 iniciales del cliente + 6 dígitos random"""
@@ -93,33 +185,95 @@ class Envio(models.Model):
                 return numero_guia
     
     def actualizar_valor_total(self):
-        """Actualiza el valor total sumando todos los items"""
-        # OPCIÓN 2: Iterar y sumar
-        items_list = list(self.items.all())
-        calculated_total = sum(float(item.valor_unitario) for item in items_list if item.valor_unitario is not None)
-        
-        # Usar el valor calculado
-        self.valor_total = calculated_total
+        """
+        Recalcula el valor total desde los items con una consulta agregada.
+        Para cambios en bloque (bulk_create, borrado por queryset); los items
+        guardados uno a uno usan sumar_valor_total.
+        """
+        total = self.items.aggregate(total=Sum('valor_unitario'))['total']
+        self.valor_total = total if total is not None else Decimal('0')
         
         # Guardar solo el campo valor_total
         self.save(update_fields=['valor_total'])
+    
+    def sumar_valor_total(self, delta):
+        """Suma `delta` al valor total con un UPDATE sobre la fila, sin recorrer los items"""
+        delta = _decimal(delta)
+        Envio.objects.filter(pk=self.pk).update(valor_total=F('valor_total') + delta)
+        self.valor_total = _decimal(self.valor_total) + delta
+        self._marcar_guardados(['valor_total'])
+        # El UPDATE no pasa por save(): avisar a los resúmenes del dashboard
+        valor_total_actualizado.send(sender=Envio, envio=self, delta=delta)
         
+    def ajustar_contadores(self, items=0, escaneados=0):
+        """
+        Suma a los contadores con un UPDATE atómico y relee los valores de la fila.
+        Sumar sobre la instancia no basta: otra petición pudo cambiarlos desde que
+        se cargó, y con dos escaneos simultáneos de los últimos items ninguno vería
+        el envío completo. También mueve updated_at: la sincronización offline
+        reporta los envíos cambiados por esa fecha (escaneos.delta_envios).
+        """
+        cambios = {}
+        if items:
+            cambios['items_total'] = F('items_total') + items
+        if escaneados:
+            cambios['items_escaneados_count'] = F('items_escaneados_count') + escaneados
+        if cambios:
+            Envio.objects.filter(pk=self.pk).update(**cambios, updated_at=timezone.now())
+            self.refresh_from_db(fields=CONTADORES_ENVIO + ('updated_at',))
+            contadores_actualizados.send(sender=Envio, envio=self)
+    
+    @staticmethod
+    def contadores_reales():
+        """Expresiones con el valor real de cada contador (para update/annotate)"""
+        def conteo(queryset):
+            return Coalesce(
+                Subquery(
+                    queryset.filter(envio=OuterRef('pk')).order_by()
+                    .values('envio').annotate(n=Count('id')).values('n')
+                ),
+                Value(0)
+            )
+        return {
+            'items_total': conteo(EnvioItem.objects.all()),
+            'items_escaneados_count': conteo(EscaneoEntrega.objects.all()),
+        }
+    
+    def recalcular_contadores(self, campos=CONTADORES_ENVIO):
+        """Recalcula los contadores indicados desde las tablas (tras cambios en bloque)"""
+        reales = Envio.contadores_reales()
+        Envio.objects.filter(pk=self.pk).update(
+            **{campo: reales[campo] for campo in campos}, updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=CONTADORES_ENVIO + ('updated_at',))
+        contadores_actualizados.send(sender=Envio, envio=self)
+    
     def porcentaje_verificacion(self):
         """Calcula el porcentaje de unidades escaneadas sobre el total"""
-        total_items = self.items.count()
-        if total_items == 0:
+        if self.items_total == 0:
             return 100
-        escaneados = self.items_escaneados.count()
-        return (escaneados / total_items) * 100
+        return (self.items_escaneados_count / self.items_total) * 100
     
     def todos_items_verificados(self):
         """Verifica si todos los items del envío han sido escaneados"""
-        return self.items.count() == self.items_escaneados.count()
+        return self.items_escaneados_count >= self.items_total
+    
+    def completar_entrega(self):
+        """Marca el envío como entregado y pasa sus unidades a despachada"""
+        self.estado = 'entregado'
+        self.fecha_entrega_verificada = timezone.now()
+        self.save()
+        
+        unidades_ids = self.items.values_list('unidad_id', flat=True)
+        Unidad.objects.filter(id__in=unidades_ids).update(estado='despachada')
+        invalidar_unidades(ids=unidades_ids)
 
 class EscaneoEntrega(models.Model):
     envio = models.ForeignKey(Envio, on_delete=models.CASCADE)
     item = models.ForeignKey(EnvioItem, on_delete=models.CASCADE)
     fecha_escaneo = models.DateTimeField(auto_now_add=True)
+    # Hora reportada por el dispositivo (escaneos enviados en lote)
+    fecha_dispositivo = models.DateTimeField(null=True, blank=True)
     escaneado_por = models.CharField(max_length=100, blank=True)
     
     class Meta:
@@ -129,37 +283,40 @@ class EscaneoEntrega(models.Model):
         
     def __str__(self):
         return f"Escaneo {self.item.unidad.codigo_barra} - {self.fecha_escaneo}"
+    
+    def save(self, *args, **kwargs):
+        creado = self._state.adding
+        super().save(*args, **kwargs)
+        if creado:
+            self.envio.ajustar_contadores(escaneados=1)
+    
+    def delete(self, *args, **kwargs):
+        envio = self.envio
+        resultado = super().delete(*args, **kwargs)
+        envio.ajustar_contadores(escaneados=-1)
+        return resultado
 
-# Señales y métodos auxiliares
-@receiver(post_save, sender=EnvioItem)
-def actualizar_valor_total_despues_guardar(sender, instance, **kwargs):
-    """Actualiza el valor total después de guardar un item"""
-    if kwargs.get('created', False) or 'valor_unitario' in instance.get_dirty_fields():
-        instance.envio.actualizar_valor_total()
-
-# backend/envios/models.py - Señal post_save
-
-@receiver(post_save, sender=EnvioItem)
-def actualizar_valor_total_despues_guardar(sender, instance, **kwargs):
-    """Actualiza el valor total después de guardar un item"""
-    if kwargs.get('created', False) or 'valor_unitario' in instance.get_dirty_fields():
-        instance.envio.actualizar_valor_total()
 
-# Método auxiliar para detectar campos modificados
-def get_dirty_fields(self):
+class SincronizacionDispositivo(models.Model):
     """
-    Retorna un diccionario con los campos que han cambiado desde la última vez
-    que se guardó el objeto.
+    Última secuencia del log de escaneos offline aplicada por cada dispositivo.
+    Las entradas con secuencia menor o igual ya se procesaron y se ignoran.
+    El id del dispositivo lo envía el cliente: el registro es por usuario y
+    dispositivo para que nadie avance la secuencia de un dispositivo ajeno.
     """
-    if not self.pk:
-        return {}
-    
-    old = type(self).objects.get(pk=self.pk)
-    dirty = {}
-    for field in self._meta.fields:
-        if getattr(self, field.name) != getattr(old, field.name):
-            dirty[field.name] = getattr(old, field.name)
-    return dirty
-
-# Agregar el método a EnvioItem
-EnvioItem.add_to_class('get_dirty_fields', get_dirty_fields)
\ No newline at end of file
+    dispositivo = models.CharField(max_length=64)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    ultima_secuencia = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Sincronización de Dispositivo'
+        verbose_name_plural = 'Sincronizaciones de Dispositivos'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'dispositivo'], name='unique_sincronizacion_usuario_dispositivo'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dispositivo} #{self.ultima_secuencia}"
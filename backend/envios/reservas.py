@@ -0,0 +1,67 @@
+# envios/reservas.py
+"""
+Reserva de unidades para envíos sin doble asignación.
+
+Dos operadores escaneando en el mismo muelle pueden intentar reservar la
+misma unidad. Las filas se bloquean con SELECT ... FOR UPDATE (en bases que
+lo soportan) y el cambio a 'reservada' es un UPDATE condicional sobre
+estado='disponible', así que solo una transacción gana. Las unidades que se
+perdieron se reportan con ReservaConflicto (HTTP 409) y la transacción del
+llamador se revierte.
+"""
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from cargas.codigos import invalidar_unidades
+from cargas.models import Unidad
+
+
+class ReservaConflicto(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'reserva_conflicto'
+
+    def __init__(self, codigos):
+        self.codigos = sorted(codigos)
+        super().__init__({
+            'error': 'Algunas unidades ya fueron reservadas por otra operación',
+            'codigos_en_conflicto': self.codigos,
+        })
+
+
+def reservar_unidades(unidades):
+    """
+    Pasa a 'reservada' las unidades {unidad_id: codigo_barra}. Debe llamarse
+    dentro de transaction.atomic. Si alguna ya no está disponible no se
+    modifica ninguna y se lanza ReservaConflicto con sus códigos.
+    """
+    if not unidades:
+        return
+
+    # Al obtener el bloqueo, la condición de estado se reevalúa sobre la fila ya confirmada
+    disponibles = set(
+        Unidad.objects.select_for_update(of=('self',))
+        .filter(id__in=list(unidades), estado='disponible')
+        .values_list('id', flat=True)
+    )
+    perdidas = [codigo for unidad_id, codigo in unidades.items() if unidad_id not in disponibles]
+    if perdidas:
+        raise ReservaConflicto(perdidas)
+
+    actualizadas = Unidad.objects.filter(id__in=disponibles, estado='disponible').update(estado='reservada')
+    invalidar_unidades(codigos=unidades.values())
+    if actualizadas != len(disponibles):
+        # Solo posible en bases sin bloqueo de filas: no se sabe cuál se perdió
+        raise ReservaConflicto(unidades.values())
+
+
+def tomar_unidades_disponibles(queryset, cantidad):
+    """
+    Primeras `cantidad` unidades disponibles del queryset. Salta las filas
+    bloqueadas por otra transacción para que selecciones manuales en paralelo
+    tomen unidades distintas en lugar de esperarse entre sí.
+    """
+    return list(
+        queryset.filter(estado='disponible')
+        .select_for_update(skip_locked=True, of=('self',))
+        .order_by('id')[:cantidad]
+    )
@@ -1,13 +1,26 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.core.validators import MinValueValidator
 from .models import Envio, EnvioItem
+from .reservas import reservar_unidades, tomar_unidades_disponibles
+from cargas.codigos import invalidar_unidades, resolver_codigo
 from cargas.models import Unidad
 from cargas.serializers import UnidadSerializer
 from partners.models import Cliente
+from core.campos import CamposDinamicosMixin
 
 
-class EnvioItemSerializer(serializers.ModelSerializer):
+# Relaciones que recorre EnvioItemSerializer (producto y unidad_detalle)
+RELACIONES_ITEM = ('unidad__carga_item__producto', 'unidad__carga_item__carga__cliente')
+
+
+def items_detalle():
+    """Prefetch de los items con todo lo que serializa el detalle del envío"""
+    return Prefetch('items', queryset=EnvioItem.objects.select_related(*RELACIONES_ITEM))
+
+
+class EnvioItemSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     codigo_barra = serializers.CharField(source='unidad.codigo_barra', read_only=True)
     producto_nombre = serializers.CharField(source='unidad.carga_item.producto.nombre', read_only=True)
     producto_sku = serializers.CharField(source='unidad.carga_item.producto.sku', read_only=True)
@@ -20,6 +33,7 @@ class EnvioItemSerializer(serializers.ModelSerializer):
             'producto_sku', 'valor_unitario', 'unidad_detalle', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+        expandibles = ('unidad_detalle',)
     
     def validate(self, attrs):
         """Validación para usuarios cliente al crear/actualizar items"""
@@ -35,8 +49,34 @@ class EnvioItemSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class EnvioSerializer(serializers.ModelSerializer):
-    items = EnvioItemSerializer(many=True, read_only=True)
+class EnvioDetalleItemSerializer(EnvioItemSerializer):
+    """Items dentro del detalle de un envío: agrega unidad_codigo, que usa el frontend"""
+    unidad_codigo = serializers.CharField(source='unidad.codigo_barra', read_only=True)
+
+    class Meta(EnvioItemSerializer.Meta):
+        fields = EnvioItemSerializer.Meta.fields + ['unidad_codigo']
+
+
+class EnvioListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Listado de envíos: datos del envío con el resumen de items (contadores y
+    valor total), sin los items. Una página se serializa con una sola consulta.
+    """
+    cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
+    items_escaneados = serializers.IntegerField(source='items_escaneados_count', read_only=True)
+    
+    class Meta:
+        model = Envio
+        fields = [
+            'id', 'numero_guia', 'cliente', 'cliente_nombre', 'conductor',
+            'placa_vehiculo', 'origen', 'valor_total', 'estado', 'items_total',
+            'items_escaneados', 'fecha_entrega_verificada', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class EnvioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    items = EnvioDetalleItemSerializer(many=True, read_only=True)
     cliente_nombre = serializers.CharField(source='cliente.nombre', read_only=True)
     items_data = serializers.ListField(
         child=serializers.DictField(),
@@ -61,22 +101,21 @@ class EnvioSerializer(serializers.ModelSerializer):
             'items_data', 'manual_items', 'created_at', 'updated_at', 'items_agrupados'
         ]
         read_only_fields = ['numero_guia', 'valor_total', 'created_at', 'updated_at']
+        # Anidados que ?expand= puede omitir y lo que lee items_agrupados (core/campos.py)
+        expandibles = ('items', 'items_agrupados')
+        relaciones = {'items_agrupados': ('items',)}
 
     def get_items_agrupados(self, obj):
-        items = obj.items.select_related(
-            'unidad__carga_item__producto',
-            'unidad__carga_item__carga'
-        )
-        
+        # Sobre los items ya cargados (prefetch), sin otra consulta por envío
         # Agrupar por producto y ID de carga (Remesa)
         grupos = {}
-        for item in items:
-            carga_id = item.unidad.carga_item.carga.id
-            clave = f"{item.unidad.carga_item.producto.id}-{carga_id}"
+        for item in obj.items.all():
+            carga_item = item.unidad.carga_item
+            clave = f"{carga_item.producto_id}-{carga_item.carga_id}"
             if clave not in grupos:
                 grupos[clave] = {
-                    'producto': item.unidad.carga_item.producto.nombre,
-                    'remesa': carga_id,
+                    'producto': carga_item.producto.nombre,
+                    'remesa': carga_item.carga_id,
                     'cantidad': 0,
                     'valor_unitario': item.valor_unitario,
                     'items_ids': []
@@ -87,34 +126,11 @@ class EnvioSerializer(serializers.ModelSerializer):
         return list(grupos.values())
     
     def to_representation(self, instance):
-        """Sobrescribir para incluir unidad_codigo en la representación"""
-        representation = super().to_representation(instance)
-        
-        # Incluir unidad_codigo en cada item para el frontend
-        if 'items' in representation:
-            for item in representation['items']:
-                # Caso 1: 'unidad' es un diccionario completo
-                if item.get('unidad') and isinstance(item['unidad'], dict) and 'codigo_barra' in item['unidad']:
-                    item['unidad_codigo'] = item['unidad']['codigo_barra']
-                
-                # Caso 2: Tenemos 'unidad_detalle' con la información completa
-                elif 'unidad_detalle' in item and item['unidad_detalle'] and isinstance(item['unidad_detalle'], dict):
-                    item['unidad_codigo'] = item['unidad_detalle'].get('codigo_barra', '')
-                
-                # Caso 3: 'unidad' es solo un ID (entero) - obtener código de barras desde la base de datos
-                elif item.get('unidad') and isinstance(item['unidad'], int):
-                    # Opción: Obtener el código de barras desde la base de datos
-                    # Pero esto podría ser costoso en términos de rendimiento
-                    try:
-                        from cargas.models import Unidad
-                        unidad = Unidad.objects.get(id=item['unidad'])
-                        item['unidad_codigo'] = unidad.codigo_barra
-                    except Unidad.DoesNotExist:
-                        item['unidad_codigo'] = ''
-                else:
-                    item['unidad_codigo'] = ''
-        
-            return representation
+        """Detalle con items: los carga en una consulta si el queryset no los trajo"""
+        con_items = 'items' in self.fields or 'items_agrupados' in self.fields
+        if con_items and 'items' not in getattr(instance, '_prefetched_objects_cache', {}):
+            prefetch_related_objects([instance], items_detalle())
+        return super().to_representation(instance)
     
     def validate_cliente(self, value):
         """Valida que el cliente esté activo y sea el asignado al usuario"""
@@ -168,24 +184,19 @@ class EnvioSerializer(serializers.ModelSerializer):
             else:
                 item['valor_unitario'] = None
         
-        # Validación adicional para usuarios cliente
+        # Validación adicional para usuarios cliente (una sola consulta)
         if request and request.user.rol == 'cliente':
-            for item in value:
-                codigo_barra = item['unidad_codigo']
-                try:
-                    unidad = Unidad.objects.select_related(
-                        'carga_item__carga__cliente'
-                    ).get(codigo_barra=codigo_barra)
-                    
-                    # Verificar que la unidad pertenece al cliente del usuario
-                    if unidad.carga_item.carga.cliente != request.user.cliente:
-                        raise serializers.ValidationError(
-                            f"La unidad {codigo_barra} no pertenece a su cliente"
-                        )
-                        
-                except Unidad.DoesNotExist:
-                    # Esta validación ya se hace en el método _crear_items
-                    pass
+            codigos = [item['unidad_codigo'] for item in value]
+            ajenas = (
+                Unidad.objects.filter(codigo_barra__in=codigos)
+                .exclude(carga_item__carga__cliente=request.user.cliente)
+                .values_list('codigo_barra', flat=True)
+            )
+            # Los códigos inexistentes se reportan en _crear_items
+            if ajenas:
+                raise serializers.ValidationError(
+                    [f"La unidad {codigo} no pertenece a su cliente" for codigo in sorted(ajenas)]
+                )
         
         return value
     
@@ -224,9 +235,11 @@ class EnvioSerializer(serializers.ModelSerializer):
             
             # Eliminar items existentes
             instance.items.all().delete()
+            instance.recalcular_contadores()
             
             # Liberar unidades anteriores
             Unidad.objects.filter(id__in=unidades_actuales).update(estado='disponible')
+            invalidar_unidades(ids=unidades_actuales)
             
             # Crear nuevos items si los hay (escaneados)
             if items_data:
@@ -250,68 +263,89 @@ class EnvioSerializer(serializers.ModelSerializer):
 # backend/envios/serializers.py - Método _crear_items
 
     def _crear_items(self, envio, items_data):
-        """Método helper para crear o actualizar items del envío"""
+        """
+        Crea o actualiza en bloque los items escaneados del envío: una consulta
+        (con bloqueo) para todas las unidades, otra para los items existentes y
+        bulk_create/bulk_update al final. Los errores se reportan todos juntos
+        por código de barras.
+        """
+        valores = {}
+        duplicados = set()
+        for item_data in items_data:
+            codigo_barra = item_data.get('unidad_codigo')
+            if codigo_barra in valores:
+                duplicados.add(codigo_barra)
+            valores[codigo_barra] = item_data['valor_unitario']
+
+        unidades = {
+            unidad['codigo_barra']: unidad
+            for unidad in Unidad.objects.select_for_update(of=('self',))
+            .filter(codigo_barra__in=valores)
+            .values('id', 'codigo_barra', 'estado', 'carga_item__carga__cliente_id')
+        }
+        existentes = {
+            item.unidad_id: item
+            for item in EnvioItem.objects.filter(
+                envio=envio, unidad_id__in=[u['id'] for u in unidades.values()]
+            )
+        }
+
+        errores = {}
         items_a_crear = []
         items_a_actualizar = []
-        unidades_ids = []
-        unidades_nuevas_ids = []
+        unidades_nuevas = {}
 
-        for item_data in items_data:
-            codigo_barra = item_data.get('unidad_codigo')
-            valor_unitario = item_data['valor_unitario']
-
-            try:
-                unidad = Unidad.objects.select_related(
-                    'carga_item__carga__cliente'
-                ).get(codigo_barra=codigo_barra)
-            except Unidad.DoesNotExist:
-                raise serializers.ValidationError(f"Unidad con código {codigo_barra} no existe")
-
-            # Verificar si la unidad ya está en el envío
-            try:
-                item_existente = EnvioItem.objects.get(envio=envio, unidad=unidad)
-                # Actualizar item existente
+        for codigo_barra, valor_unitario in valores.items():
+            unidad = unidades.get(codigo_barra)
+            if unidad is None:
+                errores[codigo_barra] = f"Unidad con código {codigo_barra} no existe"
+                continue
+
+            # Unidad ya incluida en el envío: solo se actualiza el valor
+            item_existente = existentes.get(unidad['id'])
+            if item_existente is not None:
                 item_existente.valor_unitario = valor_unitario
                 items_a_actualizar.append(item_existente)
-            except EnvioItem.DoesNotExist:
-                # Validaciones para nuevos items
-                if unidad.carga_item.carga.cliente_id != envio.cliente_id:
-                    raise serializers.ValidationError(
-                        f"La unidad {unidad.codigo_barra} no pertenece al cliente {envio.cliente.nombre}"
-                    )
-
-                if unidad.id in unidades_ids:
-                    raise serializers.ValidationError(f"Unidad {unidad.codigo_barra} duplicada en el envío")
-
-                if unidad.estado != 'disponible' and unidad.id not in unidades_ids:
-                    raise serializers.ValidationError(
-                        f"La unidad {unidad.codigo_barra} no está disponible. Estado actual: {unidad.estado}"
-                    )
-
-                unidades_nuevas_ids.append(unidad.id)
+                continue
+
+            if unidad['carga_item__carga__cliente_id'] != envio.cliente_id:
+                errores[codigo_barra] = (
+                    f"La unidad {codigo_barra} no pertenece al cliente {envio.cliente.nombre}"
+                )
+            elif codigo_barra in duplicados:
+                errores[codigo_barra] = f"Unidad {codigo_barra} duplicada en el envío"
+            elif unidad['estado'] != 'disponible':
+                errores[codigo_barra] = (
+                    f"La unidad {codigo_barra} no está disponible. Estado actual: {unidad['estado']}"
+                )
+            else:
+                unidades_nuevas[unidad['id']] = codigo_barra
                 items_a_crear.append(EnvioItem(
                     envio=envio,
-                    unidad=unidad,
+                    unidad_id=unidad['id'],
                     valor_unitario=valor_unitario
                 ))
 
-            unidades_ids.append(unidad.id)
+        if errores:
+            raise serializers.ValidationError({'items_data': errores})
 
         # Actualizar items existentes
-        for item in items_a_actualizar:
-            item.save()
+        if items_a_actualizar:
+            EnvioItem.objects.bulk_update(items_a_actualizar, ['valor_unitario'], batch_size=500)
 
         # Crear nuevos items
         if items_a_crear:
-            EnvioItem.objects.bulk_create(items_a_crear)
-            Unidad.objects.filter(id__in=unidades_nuevas_ids).update(estado='reservada')
-            
-            # Forzar actualización de valor total ya que bulk_create no dispara señales
+            reservar_unidades(unidades_nuevas)
+            EnvioItem.objects.bulk_create(items_a_crear, batch_size=500)
+            envio.ajustar_contadores(items=len(items_a_crear))
+
+        if items_a_crear or items_a_actualizar:
+            # Forzar actualización de valor total ya que bulk_create/bulk_update no disparan señales
             envio.actualizar_valor_total()
-            
-            if envio.estado == 'borrador':
-                envio.estado = 'pendiente'
-                envio.save(update_fields=['estado'])
+
+        if items_a_crear and envio.estado == 'borrador':
+            envio.estado = 'pendiente'
+            envio.save(update_fields=['estado'])
 
     def _procesar_items_manuales(self, envio, manual_items):
         """
@@ -321,7 +355,7 @@ class EnvioSerializer(serializers.ModelSerializer):
         from django.db.models import Q
         
         items_a_crear = []
-        unidades_a_reservar_ids = []
+        unidades_a_reservar = {}
         
         for manual_item in manual_items:
             carga_id = manual_item.get('carga_id')
@@ -335,13 +369,13 @@ class EnvioSerializer(serializers.ModelSerializer):
                 continue
                 
             # Buscar unidades disponibles para esta carga y producto
-            unidades_disponibles = Unidad.objects.filter(
-                carga_item__carga_id=carga_id,
-                carga_item__producto_id=producto_id,
-                estado='disponible'
-            ).order_by('id')[:cantidad]
-            
-            unidades_list = list(unidades_disponibles)
+            unidades_list = tomar_unidades_disponibles(
+                Unidad.objects.filter(
+                    carga_item__carga_id=carga_id,
+                    carga_item__producto_id=producto_id
+                ).exclude(id__in=list(unidades_a_reservar)),
+                cantidad
+            )
             
             if len(unidades_list) < cantidad:
                 raise serializers.ValidationError(
@@ -355,11 +389,12 @@ class EnvioSerializer(serializers.ModelSerializer):
                     unidad=unidad,
                     valor_unitario=valor_unitario
                 ))
-                unidades_a_reservar_ids.append(unidad.id)
+                unidades_a_reservar[unidad.id] = unidad.codigo_barra
         
         if items_a_crear:
+            reservar_unidades(unidades_a_reservar)
             EnvioItem.objects.bulk_create(items_a_crear)
-            Unidad.objects.filter(id__in=unidades_a_reservar_ids).update(estado='reservada')
+            envio.ajustar_contadores(items=len(items_a_crear))
             
             # Forzar actualización de valor total ya que bulk_create no dispara señales
             envio.actualizar_valor_total()
@@ -381,21 +416,14 @@ class AgregarItemSerializer(serializers.Serializer):
         """Valida que el código de barras exista y pertenezca al cliente del usuario"""
         request = self.context.get('request')
         
-        if not Unidad.objects.filter(codigo_barra=value).exists():
+        unidad = resolver_codigo(value)
+        if unidad is None:
             raise serializers.ValidationError("Código de barras no encontrado")
         
         if request and request.user.rol == 'cliente':
             # Verificar que la unidad pertenece al cliente del usuario
-            try:
-                unidad = Unidad.objects.select_related(
-                    'carga_item__carga__cliente'
-                ).get(codigo_barra=value)
-                
-                if unidad.carga_item.carga.cliente != request.user.cliente:
-                    raise serializers.ValidationError("La unidad no pertenece a su cliente")
-                    
-            except Unidad.DoesNotExist:
-                pass  # Ya se validó que existe
+            if unidad['cliente_id'] != request.user.cliente_id:
+                raise serializers.ValidationError("La unidad no pertenece a su cliente")
         
         return value
     
@@ -466,6 +494,9 @@ class EscaneoMasivoSerializer(serializers.Serializer):
             'carga_item__carga__cliente'
         ).filter(codigo_barra__in=codigos)
         
+        # Reservar todas antes de crear envíos: si otro operador ganó alguna, se revierte todo
+        reservar_unidades({unidad.id: unidad.codigo_barra for unidad in unidades})
+        
         # Agrupar unidades por cliente_id
         unidades_por_cliente = {}
         for unidad in unidades:
@@ -488,7 +519,6 @@ class EscaneoMasivoSerializer(serializers.Serializer):
             
             # Crear los EnvioItem y vincular las unidades
             items_a_crear = []
-            ids_unidades_a_reservar = []
             
             for unidad in lista_unidades:
                 # Determinar valor unitario (puedes cambiar esta lógica)
@@ -499,13 +529,11 @@ class EscaneoMasivoSerializer(serializers.Serializer):
                     unidad=unidad,
                     valor_unitario=valor_unitario
                 ))
-                ids_unidades_a_reservar.append(unidad.id)
                 
             # Crear todos los items de este envio de una vez
             if items_a_crear:
                 EnvioItem.objects.bulk_create(items_a_crear)
-                # Actualizar estado de todas las unidades de este envio a 'reservada'
-                Unidad.objects.filter(id__in=ids_unidades_a_reservar).update(estado='reservada')
+                envio.ajustar_contadores(items=len(items_a_crear))
                 
                 # Actualizar estado del envio
                 envio.estado = 'pendiente'
@@ -519,10 +547,42 @@ class EscaneoEntregaSerializer(serializers.Serializer):
     
     def validate_codigo_barra(self, value):
         """Valida que el código de barras exista y pertenezca a un envío"""
-        if not Unidad.objects.filter(codigo_barra=value).exists():
+        if resolver_codigo(value) is None:
             raise serializers.ValidationError("Código de barras no encontrado")
         return value
 
+class EscaneoLoteItemSerializer(serializers.Serializer):
+    codigo_barra = serializers.CharField(max_length=64)
+    fecha = serializers.DateTimeField(required=False, allow_null=True, help_text="Hora del escaneo en el dispositivo")
+
+
+class EscaneoLoteSerializer(serializers.Serializer):
+    """Lote de escaneos de entrega enviados de una vez por el lector del conductor"""
+    escaneos = EscaneoLoteItemSerializer(many=True, allow_empty=False, max_length=1000)
+    escaneado_por = serializers.CharField(max_length=100, required=False, allow_blank=True, default="")
+
+
+class EntradaLogEscaneoSerializer(serializers.Serializer):
+    secuencia = serializers.IntegerField(min_value=1)
+    envio = serializers.IntegerField()
+    codigo_barra = serializers.CharField(max_length=64)
+    fecha = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class SincronizacionEscaneosSerializer(serializers.Serializer):
+    """Log de escaneos hechos sin conexión por un dispositivo"""
+    dispositivo = serializers.CharField(max_length=64)
+    escaneos = EntradaLogEscaneoSerializer(many=True, required=False, default=list, max_length=5000)
+    envios = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list,
+        help_text="Envíos cuyo estado sigue el dispositivo"
+    )
+    desde = serializers.DateTimeField(
+        required=False, allow_null=True,
+        help_text="servidor_ts de la sincronización anterior"
+    )
+
+
 class EstadoVerificacionSerializer(serializers.ModelSerializer):
     porcentaje_verificacion = serializers.SerializerMethodField()
     items_totales = serializers.SerializerMethodField()
@@ -537,14 +597,15 @@ class EstadoVerificacionSerializer(serializers.ModelSerializer):
             'fecha_entrega_verificada'
         ]
     
+    # Todo sale de los contadores del envío: sin consultas adicionales
     def get_porcentaje_verificacion(self, obj):
         return obj.porcentaje_verificacion()
     
     def get_items_totales(self, obj):
-        return obj.items.count()
+        return obj.items_total
     
     def get_items_escaneados(self, obj):
-        return obj.items_escaneados.count()
+        return obj.items_escaneados_count
     
     def get_items_pendientes(self, obj):
-        return obj.items.count() - obj.items_escaneados.count()
\ No newline at end of file
+        return obj.items_total - obj.items_escaneados_count
\ No newline at end of file
@@ -0,0 +1,10 @@
+# envios/signals.py
+from django.dispatch import Signal
+
+# Envio.sumar_valor_total actualiza valor_total con un UPDATE que no dispara post_save.
+# Argumentos: envio, delta (Decimal sumado a valor_total)
+valor_total_actualizado = Signal()
+
+# Envio.ajustar_contadores / recalcular_contadores cambian el progreso de verificación
+# con UPDATE, sin post_save. Argumentos: envio (con los contadores ya actualizados)
+contadores_actualizados = Signal()
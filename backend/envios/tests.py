@@ -1,11 +1,17 @@
 # envios/tests.py
 
+import json
+import os
+import shutil
+from io import StringIO
+import tempfile
 from decimal import Decimal
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from .models import Envio, EnvioItem
+from .models import Envio, EnvioItem, EscaneoEntrega
 from .serializers import EnvioSerializer
 from accounts.models import Usuario
 from partners.models import Cliente, Proveedor
@@ -247,6 +253,77 @@ class BusinessLogicSimpleTests(TestCase):
         envio.refresh_from_db()
         self.assertEqual(envio.valor_total, 0)
 
+    def test_valor_total_incremental(self):
+        """Cada item cuesta las mismas consultas sin importar cuántos tenga el envío"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from dashboard.models import ResumenEnvioDiario
+
+        unidades = [
+            Unidad.objects.create(carga_item=self.carga_item, codigo_barra=f"INC{i}") for i in range(5)
+        ]
+        envio = Envio.objects.create(cliente=self.cliente, conductor="T", placa_vehiculo="T", origen="T")
+
+        consultas = []
+        for unidad in unidades:
+            with CaptureQueriesContext(connection) as ctx:
+                EnvioItem.objects.create(envio=envio, unidad=unidad, valor_unitario=0.1)
+            consultas.append(len(ctx))
+        self.assertEqual(len(set(consultas[1:])), 1)
+
+        item = envio.items.first()
+        item.valor_unitario = Decimal('2.10')
+        item.save()
+
+        envio.refresh_from_db()
+        self.assertEqual(envio.valor_total, Decimal('2.50'))
+        resumen = ResumenEnvioDiario.objects.get(cliente=self.cliente)
+        self.assertEqual(resumen.valor_total, Decimal('2.50'))
+
+    def test_guardado_completo_viejo_no_pisa_valor_total(self):
+        """Otro operador agrega un item mientras esta instancia quedó vieja"""
+        from dashboard.models import ResumenEnvioDiario
+
+        unidad = Unidad.objects.create(carga_item=self.carga_item, codigo_barra="VIEJO1")
+        envio = Envio.objects.create(cliente=self.cliente, conductor="T", placa_vehiculo="T", origen="T")
+        vieja = Envio.objects.get(pk=envio.pk)
+        EnvioItem.objects.create(envio=envio, unidad=unidad, valor_unitario=Decimal('30.00'))
+
+        vieja.estado = 'pendiente'
+        vieja.save()
+
+        envio.refresh_from_db()
+        self.assertEqual((envio.estado, envio.valor_total), ('pendiente', Decimal('30.00')))
+        resumen = ResumenEnvioDiario.objects.get(cliente=self.cliente, estado='pendiente')
+        self.assertEqual((resumen.envios, resumen.valor_total), (1, Decimal('30.00')))
+
+    def test_guardado_completo_escribe_valor_total_asignado(self):
+        """Un valor total asignado a mano sí se guarda con save() sin update_fields"""
+        from dashboard.models import ResumenEnvioDiario
+
+        unidad = Unidad.objects.create(carga_item=self.carga_item, codigo_barra="MANUAL1")
+        envio = Envio.objects.create(cliente=self.cliente, conductor="T", placa_vehiculo="T", origen="T")
+        EnvioItem.objects.create(envio=envio, unidad=unidad, valor_unitario=Decimal('30.00'))
+
+        envio = Envio.objects.get(pk=envio.pk)
+        envio.valor_total = Decimal('45.00')
+        envio.save()
+
+        envio.refresh_from_db()
+        self.assertEqual(envio.valor_total, Decimal('45.00'))
+        resumen = ResumenEnvioDiario.objects.get(cliente=self.cliente, estado='borrador')
+        self.assertEqual(resumen.valor_total, Decimal('45.00'))
+
+        # Tras sumar con F() la instancia queda al día y un guardado posterior no la pisa
+        EnvioItem.objects.create(envio=envio, unidad=Unidad.objects.create(
+            carga_item=self.carga_item, codigo_barra="MANUAL2"), valor_unitario=Decimal('5.00'))
+        vieja = Envio.objects.get(pk=envio.pk)
+        envio.sumar_valor_total(Decimal('1.00'))
+        vieja.conductor = "Otro"
+        vieja.save()
+        envio.refresh_from_db()
+        self.assertEqual((envio.conductor, envio.valor_total), ("Otro", Decimal('51.00')))
+
 
 class ManualEnvioTests(APITestCase):
     """Tests para creación manual de envíos"""
@@ -336,4 +413,583 @@ class ManualEnvioTests(APITestCase):
         response = self.client.post('/api/envios/', data, format='json')
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('No hay suficientes unidades disponibles', str(response.data))
\ No newline at end of file
+        self.assertIn('No hay suficientes unidades disponibles', str(response.data))
+
+class CrearItemsBloqueTests(APITestCase):
+    """Tests de la reserva en bloque de items escaneados"""
+
+    def setUp(self):
+        self.admin_user = Usuario.objects.create_user(
+            username='admin_bloque', password='test123', nombre='Admin', apellido='Bloque', rol='admin'
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente Bloque", nit="901", is_active=True)
+        otro_cliente = Cliente.objects.create(nombre="Otro Cliente", nit="902", is_active=True)
+        proveedor = Proveedor.objects.create(nombre="Proveedor Bloque", nit="903")
+        producto = Producto.objects.create(sku="BLQ001", nombre="Producto Bloque")
+        carga = Carga.objects.create(cliente=self.cliente, proveedor=proveedor, remision="REM-BLQ")
+        carga_item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=30)
+        Unidad.objects.bulk_create([
+            Unidad(carga_item=carga_item, codigo_barra=f"BLQ{i}") for i in range(30)
+        ])
+        Unidad.objects.filter(codigo_barra='BLQ0').update(estado='despachada')
+        carga_ajena = Carga.objects.create(cliente=otro_cliente, proveedor=proveedor, remision="REM-AJ")
+        item_ajeno = CargaItem.objects.create(carga=carga_ajena, producto=producto, cantidad=1)
+        Unidad.objects.create(carga_item=item_ajeno, codigo_barra="AJENA1")
+        self.client.force_authenticate(user=self.admin_user)
+
+    def _crear(self, codigos):
+        return self.client.post('/api/envios/', {
+            'cliente': self.cliente.id,
+            'conductor': 'C',
+            'placa_vehiculo': 'P',
+            'origen': 'O',
+            'items_data': [{'unidad_codigo': c, 'valor_unitario': 10} for c in codigos],
+        }, format='json')
+
+    def test_consultas_no_crecen_con_los_items(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def reservar(codigos):
+            envio = Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+            with CaptureQueriesContext(connection) as ctx:
+                EnvioSerializer()._crear_items(
+                    envio, [{'unidad_codigo': c, 'valor_unitario': 10} for c in codigos]
+                )
+            return envio, len(ctx)
+
+        # La primera reserva del día además crea la fila del resumen del dashboard
+        reservar(['BLQ1'])
+        _, pocos = reservar([f"BLQ{i}" for i in range(2, 4)])
+        envio, muchos = reservar([f"BLQ{i}" for i in range(4, 30)])
+        self.assertEqual(muchos, pocos)
+
+        envio.refresh_from_db()
+        self.assertEqual(envio.items.count(), 26)
+        self.assertEqual(envio.valor_total, Decimal('260.00'))
+        self.assertEqual(envio.estado, 'pendiente')
+        self.assertEqual(Unidad.objects.filter(estado='reservada').count(), 29)
+
+    def test_errores_por_codigo(self):
+        response = self._crear(['BLQ1', 'BLQ0', 'NOEXISTE', 'AJENA1'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['items_data']), {'BLQ0', 'NOEXISTE', 'AJENA1'})
+        self.assertFalse(Unidad.objects.filter(estado='reservada').exists())
+
+
+class ReservaConcurrenteTests(APITestCase):
+    """Tests del servicio de reserva ante unidades tomadas por otra operación"""
+
+    def setUp(self):
+        self.admin_user = Usuario.objects.create_user(
+            username='admin_reserva', password='test123', nombre='Admin', apellido='Reserva', rol='admin'
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente Reserva", nit="911", is_active=True)
+        proveedor = Proveedor.objects.create(nombre="Proveedor Reserva", nit="912")
+        producto = Producto.objects.create(sku="RES001", nombre="Producto Reserva")
+        carga = Carga.objects.create(cliente=self.cliente, proveedor=proveedor, remision="REM-RES")
+        carga_item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=2)
+        self.u1 = Unidad.objects.create(carga_item=carga_item, codigo_barra="RES1")
+        self.u2 = Unidad.objects.create(carga_item=carga_item, codigo_barra="RES2")
+        self.envio = Envio.objects.create(cliente=self.cliente, conductor='C', placa_vehiculo='P', origen='O')
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_reporta_codigos_perdidos_sin_reservar_el_resto(self):
+        from .reservas import ReservaConflicto, reservar_unidades
+
+        Unidad.objects.filter(id=self.u2.id).update(estado='reservada')
+        with self.assertRaises(ReservaConflicto) as ctx:
+            reservar_unidades({self.u1.id: 'RES1', self.u2.id: 'RES2'})
+        self.assertEqual(ctx.exception.codigos, ['RES2'])
+        self.u1.refresh_from_db()
+        self.assertEqual(self.u1.estado, 'disponible')
+
+    def test_agregar_item_perdido_responde_409(self):
+        from unittest import mock
+        from .reservas import reservar_unidades
+
+        def otro_operador_gana(unidades):
+            Unidad.objects.filter(id__in=list(unidades)).update(estado='reservada')
+            reservar_unidades(unidades)
+
+        with mock.patch('envios.views.reservar_unidades', side_effect=otro_operador_gana):
+            response = self.client.post(
+                f'/api/envios/{self.envio.id}/agregar_item/',
+                {'codigo_barra': 'RES1', 'valor_unitario': '10.00'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['codigos_en_conflicto'], ['RES1'])
+        self.assertFalse(self.envio.items.exists())
+
+
+    def test_agregar_item_no_usa_estado_viejo_de_la_cache(self):
+        from cargas.codigos import resolver_codigo
+
+        # La caché del proceso guardó la unidad cuando estaba reservada; luego se liberó
+        Unidad.objects.filter(id=self.u1.id).update(estado='reservada')
+        self.assertEqual(resolver_codigo('RES1')['estado'], 'reservada')
+        Unidad.objects.filter(id=self.u1.id).update(estado='disponible')
+
+        response = self.client.post(
+            f'/api/envios/{self.envio.id}/agregar_item/',
+            {'codigo_barra': 'RES1', 'valor_unitario': '10.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.u1.refresh_from_db()
+        self.assertEqual(self.u1.estado, 'reservada')
+
+        # Una unidad que de verdad no está disponible la rechaza la reserva
+        Unidad.objects.filter(id=self.u2.id).update(estado='despachada')
+        response = self.client.post(
+            f'/api/envios/{self.envio.id}/agregar_item/',
+            {'codigo_barra': 'RES2', 'valor_unitario': '10.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.envio.items.count(), 1)
+
+
+class CargasPorClienteTests(APITestCase):
+    """Tests del resumen agrupado de cargas disponibles y su listado por cursor"""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user(
+            username='admin_cpc', password='test123', nombre='Admin', apellido='Cpc', rol='admin'
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente Cpc", nit="931", is_active=True)
+        proveedor = Proveedor.objects.create(nombre="Proveedor Cpc", nit="932")
+        productos = [Producto.objects.create(sku=f"CPC{i}", nombre=f"Producto {i}") for i in range(2)]
+        for c in range(2):
+            carga = Carga.objects.create(
+                cliente=self.cliente, proveedor=proveedor, remision=f"REM-CPC{c}", estado='etiquetada'
+            )
+            for producto in productos:
+                item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=3)
+                for u in range(3):
+                    Unidad.objects.create(
+                        carga_item=item, codigo_barra=f"CPC{c}{producto.sku}{u}",
+                        estado='reservada' if u == 0 else 'disponible'
+                    )
+        self.client.force_authenticate(user=admin)
+        self.url = '/api/envios/cargas-por-cliente/'
+
+    def test_resumen_agrupado_en_una_consulta(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'cliente_id': self.cliente.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in ctx.captured_queries if 'cargas_unidad' in q['sql']]), 1)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['total_disponibles'], 4)
+        self.assertEqual([p['disponibles'] for p in response.data[0]['productos']], [2, 2])
+
+        response = self.client.get(self.url, {'cliente_id': self.cliente.id, 'solo_resumen': 1})
+        self.assertNotIn('productos', response.data[0])
+        self.assertEqual(response.data[1]['proveedor'], 'Proveedor Cpc')
+
+    def test_unidades_paginadas_por_cursor(self):
+        url = f'{self.url}unidades/'
+        response = self.client.get(url, {'cliente_id': self.cliente.id, 'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        codigos = [u['codigo_barra'] for u in response.data['results']]
+        self.assertEqual(len(codigos), 5)
+
+        response = self.client.get(response.data['next'])
+        codigos += [u['codigo_barra'] for u in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(len(set(codigos)), 8)
+        self.assertTrue(all(not c.endswith('0') for c in codigos))
+
+
+class EscaneoLoteTests(APITestCase):
+    """Tests del escaneo de entrega en lote"""
+
+    def setUp(self):
+        self.conductor = Usuario.objects.create_user(
+            username='conductor_lote', password='test123', nombre='Con', apellido='Ductor', rol='conductor'
+        )
+        cliente = Cliente.objects.create(nombre="Cliente Lote", nit="921", is_active=True)
+        proveedor = Proveedor.objects.create(nombre="Proveedor Lote", nit="922")
+        producto = Producto.objects.create(sku="LOT001", nombre="Producto Lote")
+        carga = Carga.objects.create(cliente=cliente, proveedor=proveedor, remision="REM-LOT")
+        carga_item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=3)
+        self.envio = Envio.objects.create(
+            cliente=cliente, conductor='C', placa_vehiculo='P', origen='O', estado='en_transito'
+        )
+        for i in range(3):
+            unidad = Unidad.objects.create(carga_item=carga_item, codigo_barra=f"LOT{i}", estado='reservada')
+            EnvioItem.objects.create(envio=self.envio, unidad=unidad, valor_unitario=1)
+        self.url = f'/api/envios/{self.envio.id}/escanear-lote/'
+        self.client.force_authenticate(user=self.conductor)
+
+    def test_resultados_por_codigo_y_progreso(self):
+        response = self.client.post(self.url, {'escaneos': [
+            {'codigo_barra': 'LOT0', 'fecha': '2026-01-01T10:00:00Z'},
+            {'codigo_barra': 'LOT0'},
+            {'codigo_barra': 'OTRO'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [r['resultado'] for r in response.data['resultados']],
+            ['escaneado', 'ya_escaneado', 'no_pertenece']
+        )
+        self.assertEqual(response.data['items_escaneados'], 1)
+        self.assertFalse(response.data['completado'])
+        self.assertIsNotNone(EscaneoEntrega.objects.get().fecha_dispositivo)
+
+        response = self.client.post(self.url, {'escaneos': [
+            {'codigo_barra': f'LOT{i}'} for i in range(3)
+        ]}, format='json')
+        self.assertEqual(response.data['items_pendientes'], 0)
+        self.assertTrue(response.data['completado'])
+        self.envio.refresh_from_db()
+        self.assertEqual(self.envio.estado, 'entregado')
+        self.assertEqual(Unidad.objects.filter(estado='despachada').count(), 3)
+
+
+class SincronizacionOfflineTests(EscaneoLoteTests):
+    """Tests de la sincronización del log de escaneos offline"""
+
+    def _sync(self, escaneos, **extra):
+        return self.client.post('/api/envios/sincronizar-escaneos/', {
+            'dispositivo': 'PDA-01', 'escaneos': escaneos, **extra
+        }, format='json')
+
+    def test_log_idempotente_y_delta(self):
+        log = [
+            {'secuencia': 1, 'envio': self.envio.id, 'codigo_barra': 'LOT0', 'fecha': '2026-01-01T10:00:00Z'},
+            {'secuencia': 2, 'envio': self.envio.id, 'codigo_barra': 'NADA'},
+            {'secuencia': 3, 'envio': 999999, 'codigo_barra': 'LOT1'},
+        ]
+        response = self._sync(log)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['ultima_secuencia'], 3)
+        self.assertEqual(
+            [(r['secuencia'], r['motivo']) for r in response.data['rechazados']],
+            [(2, 'no_pertenece'), (3, 'envio_no_encontrado')]
+        )
+        self.assertEqual(response.data['envios'][0]['items_escaneados'], 1)
+        desde = response.data['servidor_ts']
+
+        # Reenviar el mismo log (p. ej. se perdió la respuesta) no aplica nada de nuevo
+        response = self._sync(log, envios=[self.envio.id], desde=desde.isoformat())
+        self.assertEqual(response.data['rechazados'], [])
+        self.assertEqual(EscaneoEntrega.objects.count(), 1)
+        # Sin cambios fuera de la ventana de relectura no hay delta
+        with override_settings(ESCANEOS_SYNC_MARGEN=0):
+            response = self._sync(log, envios=[self.envio.id], desde=desde.isoformat())
+        self.assertEqual(response.data['envios'], [])
+
+        # Solo las entradas nuevas; el delta incluye el envío completado
+        response = self._sync(log + [
+            {'secuencia': 4, 'envio': self.envio.id, 'codigo_barra': 'LOT1'},
+            {'secuencia': 5, 'envio': self.envio.id, 'codigo_barra': 'LOT2'},
+        ])
+        self.assertEqual(response.data['ultima_secuencia'], 5)
+        self.assertEqual(response.data['envios'][0]['estado'], 'entregado')
+
+
+    def test_delta_relee_la_ventana_y_ve_cambios_de_items(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        desde = self._sync([]).data['servidor_ts']
+        # Escaneo de otra transacción con fecha anterior al cursor, confirmado después
+        escaneo = EscaneoEntrega.objects.create(
+            envio=self.envio, item=EnvioItem.objects.get(unidad__codigo_barra='LOT0')
+        )
+        Envio.objects.filter(pk=self.envio.pk).update(updated_at=desde - timedelta(seconds=1))
+        EscaneoEntrega.objects.filter(pk=escaneo.pk).update(fecha_escaneo=desde - timedelta(seconds=1))
+        response = self._sync([], envios=[self.envio.id], desde=desde.isoformat())
+        self.assertEqual([e['items_escaneados'] for e in response.data['envios']], [1])
+
+        # Un item quitado por un operador (UPDATE de contadores) llega al dispositivo
+        desde = timezone.now() - timedelta(seconds=settings.ESCANEOS_SYNC_MARGEN + 1)
+        Envio.objects.filter(pk=self.envio.pk).update(updated_at=desde - timedelta(seconds=1))
+        EscaneoEntrega.objects.update(fecha_escaneo=desde - timedelta(seconds=1))
+        EnvioItem.objects.get(unidad__codigo_barra='LOT2').delete()
+        response = self._sync([], envios=[self.envio.id], desde=desde.isoformat())
+        self.assertEqual([e['items_totales'] for e in response.data['envios']], [2])
+
+    def test_otro_usuario_no_avanza_la_secuencia_del_dispositivo(self):
+        from .models import SincronizacionDispositivo
+
+        self._sync([{'secuencia': 1, 'envio': self.envio.id, 'codigo_barra': 'LOT0'}])
+
+        otro = Usuario.objects.create_user(
+            username='otro_conductor', password='test123', nombre='Otro', apellido='Conductor', rol='conductor'
+        )
+        self.client.force_authenticate(user=otro)
+        response = self._sync([{'secuencia': 50, 'envio': self.envio.id, 'codigo_barra': 'NADA'}])
+        self.assertEqual(response.data['ultima_secuencia'], 50)
+
+        # El dispositivo del primer conductor conserva su secuencia y sigue aplicando su log
+        propio = SincronizacionDispositivo.objects.get(usuario=self.conductor, dispositivo='PDA-01')
+        self.assertEqual(propio.ultima_secuencia, 1)
+        self.client.force_authenticate(user=self.conductor)
+        response = self._sync([{'secuencia': 2, 'envio': self.envio.id, 'codigo_barra': 'LOT1'}])
+        self.assertEqual(response.data['ultima_secuencia'], 2)
+        self.assertEqual(EscaneoEntrega.objects.count(), 2)
+
+
+class ContadoresEnvioTests(EscaneoLoteTests):
+    """Tests de los contadores de items y escaneos desnormalizados en Envio"""
+
+    def test_contadores_y_estado_verificacion(self):
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.envio.refresh_from_db()
+        self.assertEqual((self.envio.items_total, self.envio.items_escaneados_count), (3, 0))
+
+        self.client.post(self.url, {'escaneos': [{'codigo_barra': 'LOT0'}, {'codigo_barra': 'LOT1'}]}, format='json')
+        EnvioItem.objects.get(unidad__codigo_barra='LOT1').delete()
+        self.envio.refresh_from_db()
+        self.assertEqual((self.envio.items_total, self.envio.items_escaneados_count), (2, 1))
+
+        # Un guardado completo con la instancia vieja no pisa los contadores
+        Envio.objects.get(pk=self.envio.pk).save()
+        Envio.objects.filter(pk=self.envio.pk).update(items_total=0)
+        self.envio.save()
+        self.envio.refresh_from_db()
+        self.assertEqual(self.envio.items_total, 0)
+
+        call_command('recalcular_contadores_envios', stdout=StringIO())
+        self.envio.refresh_from_db()
+        self.assertEqual((self.envio.items_total, self.envio.items_escaneados_count), (2, 1))
+
+        url = f'/api/envios/{self.envio.id}/estado-verificacion/'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.data['items_pendientes'], 1)
+        self.assertEqual(response.data['porcentaje_verificacion'], 50)
+        self.assertEqual(len(ctx), 1)
+
+    def test_escaneos_simultaneos_completan_el_envio(self):
+        self.client.post(self.url, {'escaneos': [{'codigo_barra': 'LOT0'}]}, format='json')
+        # Dos peticiones que cargaron el envío antes de que la otra escaneara
+        primera = Envio.objects.get(pk=self.envio.pk)
+        segunda = Envio.objects.get(pk=self.envio.pk)
+
+        EscaneoEntrega.objects.create(envio=primera, item=EnvioItem.objects.get(unidad__codigo_barra='LOT1'))
+        EscaneoEntrega.objects.create(envio=segunda, item=EnvioItem.objects.get(unidad__codigo_barra='LOT2'))
+
+        self.assertFalse(primera.todos_items_verificados())
+        self.assertEqual(segunda.items_escaneados_count, 3)
+        self.assertTrue(segunda.todos_items_verificados())
+
+
+    async def test_estado_verificacion_asincrono(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncRequestFactory
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .views import estado_verificacion_asincrono
+
+        url = f'/api/envios/{self.envio.id}/estado-verificacion/'
+        esperado = await sync_to_async(self.client.get)(url)
+        request = AsyncRequestFactory().get(
+            url, headers={'Authorization': f'Bearer {AccessToken.for_user(self.conductor)}'}
+        )
+        response = await estado_verificacion_asincrono(request, pk=self.envio.id)
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(esperado.data)))
+
+
+class EventosEnvioTests(EscaneoLoteTests):
+    """Tests del push de progreso de verificación por SSE"""
+
+    def test_escaneo_publica_progreso_a_suscriptores(self):
+        import asyncio
+        from .eventos import difusor
+
+        async def suscribir():
+            return difusor.suscribir(self.envio.id)
+
+        loop = asyncio.new_event_loop()
+        cola = loop.run_until_complete(suscribir())
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.url, {'escaneos': [{'codigo_barra': 'LOT0'}]}, format='json')
+            loop.run_until_complete(asyncio.sleep(0))
+            evento = cola.get_nowait()
+            self.assertEqual(evento['items_escaneados'], 1)
+            self.assertEqual(evento['items_pendientes'], 2)
+
+            # Completar la entrega publica el cambio de estado (los eventos repetidos se omiten)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.url, {'escaneos': [{'codigo_barra': f'LOT{i}'} for i in range(3)]}, format='json')
+            loop.run_until_complete(asyncio.sleep(0))
+            eventos = [cola.get_nowait() for _ in range(cola.qsize())]
+            self.assertEqual(eventos[-1]['estado'], 'entregado')
+            self.assertEqual(len(eventos), len({tuple(sorted(e.items())) for e in eventos}))
+        finally:
+            difusor.cancelar(self.envio.id, cola)
+            loop.close()
+        self.assertFalse(difusor.tiene_suscriptores(self.envio.id))
+
+    def test_stream_requiere_ticket_de_un_solo_uso(self):
+        from asgiref.sync import async_to_sync
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        url = f'/api/envios/{self.envio.id}/eventos/'
+        ticket = self.client.post(f'/api/envios/{self.envio.id}/ticket-eventos/').data['ticket']
+        otro = Envio.objects.create(cliente=self.envio.cliente, conductor="T", placa_vehiculo="T", origen="T")
+        ticket_otro = self.client.post(f'/api/envios/{otro.id}/ticket-eventos/').data['ticket']
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url).status_code, 401)
+        # El JWT de acceso ya no se acepta en la URL
+        token = str(AccessToken.for_user(self.conductor))
+        self.assertEqual(self.client.get(url, {'token': token}).status_code, 401)
+        # El ticket queda ligado a su envío
+        self.assertEqual(self.client.get(url, {'ticket': ticket_otro}).status_code, 401)
+
+        response = self.client.get(url, {'ticket': ticket})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # Bajo WSGI el stream envía el estado actual y termina
+        async def leer():
+            return b''.join([parte async for parte in response.streaming_content])
+        contenido = async_to_sync(leer)().decode()
+        self.assertIn('event: estado', contenido)
+        self.assertIn('"items_totales": 3', contenido)
+
+        # Un ticket canjeado no abre otro stream
+        self.assertEqual(self.client.get(url, {'ticket': ticket}).status_code, 401)
+
+
+class DocumentoCacheTests(APITestCase):
+    """Tests de la caché de PDFs de envíos"""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajuste = override_settings(DOCUMENTOS_CACHE_DIR=self.directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin_user = Usuario.objects.create_user(
+            username='admin_docs', password='test123', nombre='Admin', apellido='Docs', rol='admin'
+        )
+        proveedor = Proveedor.objects.create(nombre="Proveedor", nit="123")
+        self.cliente = Cliente.objects.create(nombre="Cliente", nit="456", is_active=True)
+        producto = Producto.objects.create(sku="PROD001", nombre="Producto")
+        carga = Carga.objects.create(cliente=self.cliente, proveedor=proveedor, remision="REM001", estado='etiquetada')
+        carga_item = CargaItem.objects.create(carga=carga, producto=producto, cantidad=2)
+        self.unidad1 = Unidad.objects.create(carga_item=carga_item, codigo_barra="DOC001")
+        self.unidad2 = Unidad.objects.create(carga_item=carga_item, codigo_barra="DOC002")
+        self.envio = Envio.objects.create(cliente=self.cliente, conductor="Test", placa_vehiculo="TEST", origen="Test")
+        EnvioItem.objects.create(envio=self.envio, unidad=self.unidad1, valor_unitario=Decimal('100.00'))
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_acta_entrega_etag_e_invalidacion(self):
+        url = f'/api/envios/{self.envio.id}/acta-entrega/'
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        self.assertTrue(b''.join(resp.streaming_content).startswith(b'%PDF'))
+
+        # Mismo contenido: el cliente recibe 304
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        # Un nuevo item cambia la versión del documento
+        EnvioItem.objects.create(envio=self.envio, unidad=self.unidad2, valor_unitario=Decimal('50.00'))
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_recorta_sin_recorrer_el_directorio_en_cada_escritura(self):
+        from unittest import mock
+        from core.documentos import DocumentoCache
+
+        cache = DocumentoCache(max_bytes=250)
+        rutas = [cache.ruta('acta', 'envio', i, 'd') for i in range(3)]
+        with mock.patch('core.documentos.os.walk', wraps=os.walk) as walk:
+            cache.guardar(rutas[0], b'x' * 100)  # sin estimación: recuenta una vez
+            cache.guardar(rutas[1], b'x' * 100)
+            self.assertEqual(walk.call_count, 1)
+
+            cache.guardar(rutas[2], b'x' * 100)  # pasa del límite: recorta
+            self.assertEqual(walk.call_count, 2)
+        self.assertFalse(os.path.exists(rutas[0]))
+        self.assertTrue(os.path.exists(rutas[2]))
+
+        # Lo que libera una invalidación se descuenta de la estimación
+        cache.invalidar('envio', 2)
+        self.assertFalse(cache.necesita_recorte())
+
+
+class ConsultasEnvioTests(APITestCase):
+    """Cantidad de consultas del listado y el detalle: no crece con los items"""
+
+    def setUp(self):
+        self.admin_user = Usuario.objects.create_user(
+            username='admin_consultas', password='test123', nombre='Admin', apellido='Consultas', rol='admin'
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente", nit="456", is_active=True)
+        proveedor = Proveedor.objects.create(nombre="Proveedor", nit="123")
+        self.cargas = [
+            Carga.objects.create(cliente=self.cliente, proveedor=proveedor, remision=f"REM-Q{i}") for i in range(2)
+        ]
+        self.productos = [Producto.objects.create(sku=f"Q{i}", nombre=f"Producto {i}") for i in range(2)]
+        self.client.force_authenticate(user=self.admin_user)
+
+    def _crear_envio(self, items):
+        envio = Envio.objects.create(cliente=self.cliente, conductor="C", placa_vehiculo="P", origen="O")
+        for i in range(items):
+            carga_item = CargaItem.objects.create(
+                carga=self.cargas[i % 2], producto=self.productos[i % 2], cantidad=1
+            )
+            unidad = Unidad.objects.create(
+                carga_item=carga_item, codigo_barra=f"Q{envio.id}-{i}", estado='reservada'
+            )
+            EnvioItem.objects.create(envio=envio, unidad=unidad, valor_unitario=Decimal('10.00'))
+        return envio
+
+    def test_listado_resumen_en_una_consulta(self):
+        for _ in range(3):
+            self._crear_envio(items=4)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/envios/')
+        self.assertEqual(response.status_code, 200)
+
+        fila = response.data['results'][0]
+        self.assertNotIn('items', fila)
+        self.assertEqual(fila['items_total'], 4)
+        self.assertEqual(fila['items_escaneados'], 0)
+        self.assertEqual(Decimal(fila['valor_total']), Decimal('40.00'))
+
+        for _ in range(3):
+            self._crear_envio(items=6)
+        with self.assertNumQueries(1):
+            self.client.get('/api/envios/')
+
+    def test_detalle_con_items_y_agrupados(self):
+        envio = self._crear_envio(items=6)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/envios/{envio.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(response.data['items']), 6)
+        self.assertEqual(response.data['items'][0]['unidad_codigo'], f"Q{envio.id}-0")
+        self.assertEqual(response.data['items'][0]['unidad_detalle']['cliente_nombre'], "Cliente")
+        agrupados = sorted((g['remesa'], g['producto'], g['cantidad']) for g in response.data['items_agrupados'])
+        self.assertEqual(agrupados, [
+            (self.cargas[0].id, 'Producto 0', 3),
+            (self.cargas[1].id, 'Producto 1', 3),
+        ])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/envios/{envio.id}/items-pendientes/')
+        self.assertEqual(response.data['total_pendientes'], 6)
+        self.assertEqual(response.data['total_items'], 6)
+
+    def test_detalle_unidad_codigo_segun_fields(self):
+        envio = self._crear_envio(items=2)
+        response = self.client.get(f'/api/envios/{envio.id}/?fields=id,items.unidad_codigo')
+        self.assertEqual(response.data['items'][0], {'unidad_codigo': f"Q{envio.id}-0"})
+
+        # Si no se pide, no aparece
+        response = self.client.get(f'/api/envios/{envio.id}/?fields=id,items.id')
+        self.assertEqual(response.data['items'][0], {'id': envio.items.order_by('id').first().id})
@@ -1,8 +1,16 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import EnvioViewSet, EnvioItemViewSet
+from .views import EnvioViewSet, EnvioItemViewSet, eventos_envio, estado_verificacion_asincrono
 
 router = DefaultRouter()
 router.register(r'envios', EnvioViewSet, basename='envio')
 router.register(r'envios-items', EnvioItemViewSet, basename='envio-item')
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('envios/<int:pk>/eventos/', eventos_envio, name='envio-eventos'),
+]
+if settings.VISTAS_ASINCRONAS:
+    urlpatterns.append(path('envios/<int:pk>/estado-verificacion/', estado_verificacion_asincrono))
+
+urlpatterns += router.urls
@@ -1,9 +1,19 @@
 # Standard library imports
+import asyncio
+import json
 from re import search
 
+# Third party imports
+from asgiref.sync import sync_to_async
+
 # Django imports
-from django.db.models import Prefetch, Q
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 # Django REST Framework imports
@@ -14,17 +24,26 @@ from rest_framework.response import Response
 # Local imports
 from .models import Envio, EnvioItem, EscaneoEntrega
 from .permissions import IsAdminRole, PuedeVerEnvio, IsAdminOrConductor
-from .serializers import EnvioSerializer, AgregarItemSerializer, EnvioItemSerializer, EstadoVerificacionSerializer, EscaneoEntregaSerializer,EscaneoMasivoSerializer
+from .serializers import EnvioSerializer, EnvioListSerializer, RELACIONES_ITEM, items_detalle, AgregarItemSerializer, EnvioItemSerializer, EstadoVerificacionSerializer, EscaneoEntregaSerializer,EscaneoMasivoSerializer, EscaneoLoteSerializer, SincronizacionEscaneosSerializer
+from .reservas import ReservaConflicto, reservar_unidades
+from .escaneos import registrar_escaneos, sincronizar_log
+from .eventos import difusor, estado_envio
 from .pdf_generators import generate_acta_entrega_pdf, generate_cuenta_cobro_pdf
+from core.busqueda import buscar
+from core.campos import ConsultaPorCamposMixin
+from core.paginacion import CursorPorIdPagination, KeysetFechaPagination
+from core.asincrono import emitir_ticket, usuario_ticket, vista_asincrona
+from core.trabajos import solicita_asincrono, encolar_trabajo, respuesta_trabajo
+from core.documentos import respuesta_documento, huella_envio
+from cargas.codigos import resolver_codigo
 from cargas.models import Unidad, Carga
 from partners.models import Cliente
 
-class EnvioViewSet(viewsets.ModelViewSet):
-    queryset = Envio.objects.select_related('cliente').prefetch_related(
-        Prefetch('items', queryset=EnvioItem.objects.select_related('unidad'))
-    ).order_by('-created_at')  
+class EnvioViewSet(ConsultaPorCamposMixin, viewsets.ModelViewSet):
+    queryset = Envio.objects.select_related('cliente').prefetch_related(items_detalle()).order_by('-created_at')
     
     serializer_class = EnvioSerializer
+    pagination_class = KeysetFechaPagination
     
     def get_permissions(self):
         """
@@ -33,22 +52,30 @@ class EnvioViewSet(viewsets.ModelViewSet):
         - Create/Update/Delete: Solo admin
         - Acciones de verificación: Admin y conductor
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'ticket_eventos']:
             permission_classes = [PuedeVerEnvio]
         elif self.action == 'create':
             permission_classes = [IsAdminRole]
         elif self.action in ['update', 'partial_update']:
             permission_classes = [IsAdminOrConductor]
-        elif self.action in ['estado_verificacion', 'items_pendientes', 'escanear_item', 'forzar_completar_entrega']:
+        elif self.action in ['estado_verificacion', 'items_pendientes', 'escanear_item', 'escanear_lote', 'sincronizar_escaneos', 'forzar_completar_entrega']:
             # Permisos para acciones de verificación
             permission_classes = [IsAdminOrConductor]
         else:
             permission_classes = [IsAdminRole]
         return [permission() for permission in permission_classes]
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EnvioListSerializer
+        return super().get_serializer_class()
+    
     def get_queryset(self):
         """Filtra envíos por usuario, cliente, estado y búsqueda"""
         queryset = super().get_queryset()
+        # El listado no serializa items
+        if self.action == 'list':
+            queryset = queryset.prefetch_related(None)
         
         print(f"User: {self.request.user}")
         print(f"User rol: {self.request.user.rol}")
@@ -75,13 +102,10 @@ class EnvioViewSet(viewsets.ModelViewSet):
         if estado:
             queryset = queryset.filter(estado=estado)
         
+        # Índice de texto: guía, cliente, conductor y placa (ordenado por relevancia).
+        # Después de los demás filtros: el límite de resultados cuenta solo estos envíos
         if search:
-            queryset = queryset.filter(
-                Q(numero_guia__icontains=search) | 
-                Q(cliente__nombre__icontains=search) | 
-                Q(conductor__icontains=search) | 
-                Q(placa_vehiculo__icontains=search)
-            )
+            queryset = buscar(queryset, 'envio', search)
         
         # Para tests, desactivar paginación
         if getattr(self, 'swagger_fake_view', False) or self.request and self.request.method == 'GET' and 'test' in self.request.META.get('HTTP_USER_AGENT', ''):
@@ -131,47 +155,37 @@ class EnvioViewSet(viewsets.ModelViewSet):
             codigo_barra = serializer.validated_data['codigo_barra']
             valor_unitario = serializer.validated_data['valor_unitario']
             
-            try:
-                # Obtener unidad y validar que pertenece al cliente
-                unidad = Unidad.objects.select_related(
-                    'carga_item__carga__cliente'
-                ).get(codigo_barra=codigo_barra)
-                
-                if unidad.carga_item.carga.cliente_id != envio.cliente_id:
-                    return Response(
-                        {'error': 'La unidad no pertenece al cliente del envío'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                if unidad.estado != 'disponible':
-                    return Response(
-                        {'error': f'Unidad no disponible. Estado: {unidad.estado}'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Crear el item del envío
+            # Ya resuelta al validar el serializer: no vuelve a consultar la base
+            unidad = resolver_codigo(codigo_barra)
+            if unidad is None:
+                return Response(
+                    {'error': 'Código de barras no encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            if unidad['cliente_id'] != envio.cliente_id:
+                return Response(
+                    {'error': 'La unidad no pertenece al cliente del envío'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # La caché solo da el id y el cliente: su estado puede estar viejo.
+            # La disponibilidad la decide la reserva, que relee la fila bloqueada;
+            # si ya no está disponible se responde 409
+            with transaction.atomic():
+                reservar_unidades({unidad['id']: codigo_barra})
                 EnvioItem.objects.create(
                     envio=envio,
-                    unidad=unidad,
+                    unidad_id=unidad['id'],
                     valor_unitario=valor_unitario
                 )
                 
-                # Actualizar estado de la unidad
-                unidad.estado = 'reservada'
-                unidad.save()
-                
                 # Actualizar estado del envío si estaba en borrador
                 if envio.estado == 'borrador':
                     envio.estado = 'pendiente'
-                    envio.save()
-                
-                return Response({'success': 'Item agregado correctamente'})
-                
-            except Unidad.DoesNotExist:
-                return Response(
-                    {'error': 'Código de barras no encontrado'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+                    envio.save(update_fields=['estado', 'updated_at'])
+            
+            return Response({'success': 'Item agregado correctamente'})
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -193,7 +207,8 @@ class EnvioViewSet(viewsets.ModelViewSet):
             # Si no quedan items, volver a estado borrador
             if not envio.items.exists() and envio.estado != 'borrador':
                 envio.estado = 'borrador'
-                envio.save()
+                # valor_total ya se descontó en la base al eliminar el item
+                envio.save(update_fields=['estado', 'updated_at'])
             
             return Response({'success': 'Item removido correctamente'})
             
@@ -203,76 +218,129 @@ class EnvioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
-    @action(detail=False, methods=['get'], url_path='cargas-por-cliente')
-    def cargas_por_cliente(self, request):
-        """Obtiene las cargas disponibles para un cliente específico"""
+    def _cliente_activo(self, request):
+        """Cliente activo de ?cliente_id= o la respuesta de error a devolver"""
         cliente_id = request.query_params.get('cliente_id')
         
         if not cliente_id:
-            return Response(
+            return None, Response(
                 {'error': 'Se requiere cliente_id'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            cliente = Cliente.objects.get(id=cliente_id, is_active=True)
-        except Cliente.DoesNotExist:
-            return Response(
+        cliente = Cliente.objects.filter(id=cliente_id, is_active=True).only('id').first()
+        if cliente is None:
+            return None, Response(
                 {'error': 'Cliente no encontrado o inactivo'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return cliente, None
+    
+    def _unidades_disponibles(self, cliente, request):
+        """Unidades disponibles de las cargas listas del cliente (filtros carga_id/producto_id)"""
+        unidades = Unidad.objects.filter(
+            estado='disponible',
+            carga_item__carga__cliente=cliente,
+            carga_item__carga__estado__in=['etiquetada', 'almacenada'],
+        )
+        carga_id = request.query_params.get('carga_id')
+        if carga_id:
+            unidades = unidades.filter(carga_item__carga_id=carga_id)
+        producto_id = request.query_params.get('producto_id')
+        if producto_id:
+            unidades = unidades.filter(carga_item__producto_id=producto_id)
+        return unidades
+    
+    @action(detail=False, methods=['get'], url_path='cargas-por-cliente')
+    def cargas_por_cliente(self, request):
+        """
+        Cargas del cliente con unidades disponibles, agrupadas por carga y
+        producto con sus cantidades, en una sola consulta.
+        ?solo_resumen=1 omite el detalle por producto (selector de cargas).
+        ?carga_id= limita a una carga. Las unidades se listan aparte en
+        cargas-por-cliente/unidades/ (paginado por cursor).
+        """
+        cliente, error = self._cliente_activo(request)
+        if error:
+            return error
+        
+        solo_resumen = request.query_params.get('solo_resumen') in ('1', 'true', 'True')
+        campos = ['carga_item__carga_id', 'carga_item__carga__remision', 'carga_item__carga__proveedor__nombre']
+        if not solo_resumen:
+            campos += ['carga_item__producto_id', 'carga_item__producto__nombre', 'carga_item__producto__sku']
+        
+        # Ordenar solo por campos agrupados: otro campo se sumaría al GROUP BY
+        orden = campos[:1] if solo_resumen else [campos[0], 'carga_item__producto__nombre']
+        filas = (
+            self._unidades_disponibles(cliente, request)
+            .values(*campos)
+            .annotate(disponibles=Count('id'))
+            .order_by(*orden)
+        )
         
-        # Cargas del cliente con unidades disponibles - CORREGIDO
-        cargas = Carga.objects.filter(
-            cliente=cliente,
-            estado__in=['etiquetada', 'almacenada'],
-            items__unidades__estado='disponible'
-        ).distinct()
-        
-        # Verificar que realmente tienen unidades disponibles
-        resultados = []
-        for carga in cargas:
-            unidades_disponibles = Unidad.objects.filter(
-                carga_item__carga=carga,
-                estado='disponible'
-            )
-            
-            if unidades_disponibles.exists():  # Solo incluir si hay unidades disponibles
-                resultados.append({
-                    'carga_id': carga.id,
-                    'remision': carga.remision,
-                    'proveedor': carga.proveedor.nombre,
-                    'unidades_disponibles': [
-                        {
-                            'id': u.id,
-                            'codigo_barra': u.codigo_barra,
-                            'producto': u.carga_item.producto.nombre,
-                            'sku': u.carga_item.producto.sku,
-                            'producto_id': u.carga_item.producto.id
-                        }
-                        for u in unidades_disponibles.select_related('carga_item__producto')
-                    ]
+        cargas = {}
+        for fila in filas:
+            carga_id = fila['carga_item__carga_id']
+            carga = cargas.get(carga_id)
+            if carga is None:
+                carga = cargas[carga_id] = {
+                    'carga_id': carga_id,
+                    'remision': fila['carga_item__carga__remision'],
+                    'proveedor': fila['carga_item__carga__proveedor__nombre'],
+                    'total_disponibles': 0,
+                }
+                if not solo_resumen:
+                    carga['productos'] = []
+            carga['total_disponibles'] += fila['disponibles']
+            if not solo_resumen:
+                carga['productos'].append({
+                    'producto_id': fila['carga_item__producto_id'],
+                    'producto': fila['carga_item__producto__nombre'],
+                    'sku': fila['carga_item__producto__sku'],
+                    'disponibles': fila['disponibles'],
                 })
         
-        return Response(resultados)
+        return Response(list(cargas.values()))
+    
+    @action(detail=False, methods=['get'], url_path='cargas-por-cliente/unidades')
+    def cargas_por_cliente_unidades(self, request):
+        """
+        Unidades disponibles del cliente, paginadas por cursor sobre id.
+        Acepta los filtros carga_id y producto_id; page_size hasta 1000.
+        """
+        cliente, error = self._cliente_activo(request)
+        if error:
+            return error
+        
+        unidades = self._unidades_disponibles(cliente, request).annotate(
+            carga_id=F('carga_item__carga_id'),
+            producto_id=F('carga_item__producto_id'),
+            producto=F('carga_item__producto__nombre'),
+            sku=F('carga_item__producto__sku'),
+        ).values('id', 'codigo_barra', 'carga_id', 'producto_id', 'producto', 'sku')
+        
+        paginador = CursorPorIdPagination()
+        pagina = paginador.paginate_queryset(unidades, request, view=self)
+        return paginador.get_paginated_response(pagina)
     
     @action(detail=True, methods=['get'], url_path='acta-entrega')
     def acta_entrega(self, request, pk=None):
         """
         Genera un acta de entrega en PDF para el envío especificado
+        Con ?asincrono=1 se encola y responde 202 con el trabajo a descargar luego.
         """
         try:
             envio = self.get_object()
-            print(f"Generando acta para envío: {envio.numero_guia}")
             
-            pdf_buffer = generate_acta_entrega_pdf(envio)
+            if solicita_asincrono(request):
+                return respuesta_trabajo(encolar_trabajo('acta_entrega', envio.id, usuario=request.user), request)
             
-            response = HttpResponse(
-                pdf_buffer.getvalue(), 
-                content_type='application/pdf'
+            # Se sirve desde la caché de documentos si el envío no cambió
+            return respuesta_documento(
+                request, 'acta_entrega', 'envio', envio, huella_envio(envio),
+                lambda: generate_acta_entrega_pdf(envio),
+                f"acta_entrega_{envio.numero_guia}.pdf"
             )
-            response['Content-Disposition'] = f'attachment; filename="acta_entrega_{envio.numero_guia}.pdf"'
-            return response
             
         except Exception as e:
             print(f"Error en acta_entrega: {str(e)}")
@@ -291,19 +359,20 @@ class EnvioViewSet(viewsets.ModelViewSet):
     def cuenta_cobro(self, request, pk=None):
         """
         Genera una cuenta de cobro en PDF para el envío especificado
+        Con ?asincrono=1 se encola y responde 202 con el trabajo a descargar luego.
         """
         try:
             envio = self.get_object()
-            print(f"Generando cuenta de cobro para envío: {envio.numero_guia}")
             
-            pdf_buffer = generate_cuenta_cobro_pdf(envio)
+            if solicita_asincrono(request):
+                return respuesta_trabajo(encolar_trabajo('cuenta_cobro', envio.id, usuario=request.user), request)
             
-            response = HttpResponse(
-                pdf_buffer.getvalue(), 
-                content_type='application/pdf'
+            # Se sirve desde la caché de documentos si el envío no cambió
+            return respuesta_documento(
+                request, 'cuenta_cobro', 'envio', envio, huella_envio(envio),
+                lambda: generate_cuenta_cobro_pdf(envio),
+                f"cuenta_cobro_{envio.numero_guia}.pdf"
             )
-            response['Content-Disposition'] = f'attachment; filename="cuenta_cobro_{envio.numero_guia}.pdf"'
-            return response
             
         except Exception as e:
             print(f"Error en cuenta_cobro: {str(e)}")
@@ -320,7 +389,9 @@ class EnvioViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], url_path='estado-verificacion')
     def estado_verificacion(self, request, pk=None):
-        envio = self.get_object()
+        # Los contadores viven en el envío: basta leer su fila, sin items
+        envio = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, envio)
         serializer = EstadoVerificacionSerializer(envio)
         return Response(serializer.data)
     
@@ -364,13 +435,7 @@ class EnvioViewSet(viewsets.ModelViewSet):
                 
                 # Verificar si todos los items han sido escaneados
                 if envio.todos_items_verificados():
-                    envio.estado = 'entregado'
-                    envio.fecha_entrega_verificada = timezone.now()
-                    envio.save()
-                    
-                    # Liberar unidades (cambiar estado a despachada)
-                    unidades_ids = envio.items.values_list('unidad_id', flat=True)
-                    Unidad.objects.filter(id__in=unidades_ids).update(estado='despachada')
+                    envio.completar_entrega()
                     
                     return Response({
                         'success': '¡Entrega completada! Todos los items verificados',
@@ -391,6 +456,58 @@ class EnvioViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], url_path='escanear-lote')
+    def escanear_lote(self, request, pk=None):
+        """
+        Escanea varios items en una sola petición.
+        Body: {"escaneos": [{"codigo_barra": "...", "fecha": "..."}], "escaneado_por": "..."}
+        """
+        # Sin el prefetch de items del queryset base: el lote no los necesita
+        envio = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, envio)
+        
+        if envio.estado not in ['pendiente', 'en_transito']:
+            return Response(
+                {'error': 'Solo se pueden escanear items de envíos pendientes o en tránsito'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = EscaneoLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            resultados, progreso = registrar_escaneos(
+                envio,
+                serializer.validated_data['escaneos'],
+                serializer.validated_data.get('escaneado_por', '')
+            )
+        
+        return Response({'resultados': resultados, **progreso})
+    
+    @action(detail=False, methods=['post'], url_path='sincronizar-escaneos')
+    def sincronizar_escaneos(self, request):
+        """
+        Sube el log de escaneos hechos sin conexión y retorna el delta de estado.
+        Body: {"dispositivo": "...", "escaneos": [{"secuencia", "envio", "codigo_barra", "fecha"}],
+               "envios": [ids seguidos], "desde": "<servidor_ts anterior>"}
+        Reenviar el mismo log es seguro: se ignoran las secuencias ya aplicadas.
+        """
+        serializer = SincronizacionEscaneosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        
+        with transaction.atomic():
+            resultado = sincronizar_log(
+                request.user,
+                datos['dispositivo'],
+                datos['escaneos'],
+                self.get_queryset().prefetch_related(None).order_by(),
+                envios_seguidos=datos['envios'],
+                desde=datos.get('desde'),
+            )
+        
+        return Response(resultado)
+    
     @action(detail=True, methods=['post'], url_path='forzar-completar-entrega')
     def forzar_completar_entrega(self, request, pk=None):
         """Forza la finalización de la entrega (para casos excepcionales)"""
@@ -402,38 +519,40 @@ class EnvioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Cambiar estado a entregado
-        envio.estado = 'entregado'
-        envio.fecha_entrega_verificada = timezone.now()
-        envio.save()
-        
-        # Liberar unidades
-        unidades_ids = envio.items.values_list('unidad_id', flat=True)
-        Unidad.objects.filter(id__in=unidades_ids).update(estado='despachada')
+        # Cambiar estado a entregado y liberar unidades
+        envio.completar_entrega()
         
         return Response({
             'success': 'Entrega completada manualmente',
             'completado': True
         })
     
+    @action(detail=True, methods=['post'], url_path='ticket-eventos')
+    def ticket_eventos(self, request, pk=None):
+        """Ticket de un solo uso para abrir el stream de eventos del envío"""
+        envio = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        return Response({
+            'ticket': emitir_ticket(request.user, f'envio:{envio.pk}'),
+            'expira_en': settings.TICKET_STREAM_TTL,
+        })
+    
     @action(detail=True, methods=['get'], url_path='items-pendientes')
     def items_pendientes(self, request, pk=None):
         """Obtiene la lista de items pendientes de escanear"""
-        envio = self.get_object()
+        envio = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, envio)
         
         # Obtener items ya escaneados
         items_escaneados = envio.items_escaneados.values_list('id', flat=True)
         
         # Obtener items pendientes
-        items_pendientes = envio.items.exclude(id__in=items_escaneados).select_related(
-            'unidad', 'unidad__carga_item__producto'
-        )
+        items_pendientes = envio.items.exclude(id__in=items_escaneados).select_related(*RELACIONES_ITEM)
         
         serializer = EnvioItemSerializer(items_pendientes, many=True)
         return Response({
             'pendientes': serializer.data,
-            'total_pendientes': items_pendientes.count(),
-            'total_items': envio.items.count()
+            'total_pendientes': len(serializer.data),
+            'total_items': envio.items_total
         })
         
     @action(detail=False, methods=['post'], url_path='escaneo-masivo')
@@ -460,6 +579,9 @@ class EnvioViewSet(viewsets.ModelViewSet):
                         'message': f'Proceso completado. Se crearon {len(resultado["envios_creados"])} envíos.',
                         'envios_creados_ids': resultado['envios_creados']
                     }, status=status.HTTP_201_CREATED)
+                
+                except ReservaConflicto as e:
+                    return Response(e.detail, status=e.status_code)
                         
                 except Exception as e:
                     print(f"DEBUG: Error in serializer.save(): {str(e)}")
@@ -484,9 +606,7 @@ class EnvioViewSet(viewsets.ModelViewSet):
         
 
 class EnvioItemViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = EnvioItem.objects.select_related(
-        'envio', 'unidad', 'unidad__carga_item__producto'
-    ).all()
+    queryset = EnvioItem.objects.select_related('envio', *RELACIONES_ITEM).all()
     
     serializer_class = EnvioItemSerializer
     permission_classes = [IsAdminRole]
@@ -499,3 +619,71 @@ class EnvioItemViewSet(viewsets.ReadOnlyModelViewSet):
             queryset = queryset.filter(envio_id=envio_id)
         
         return queryset
+
+
+async def _envio_visible(usuario, envio_id):
+    """Mismas reglas que PuedeVerEnvio y el filtro por cliente del viewset"""
+    envios = Envio.objects.filter(pk=envio_id)
+    if usuario.rol == 'cliente' and usuario.cliente_id:
+        envios = envios.filter(cliente_id=usuario.cliente_id)
+    elif usuario.rol not in ['admin', 'operador', 'conductor']:
+        return False
+    return await envios.aexists()
+
+
+def _evento_sse(datos):
+    return f"event: estado\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def eventos_envio(request, pk):
+    """
+    Stream SSE con el progreso de verificación del envío.
+    Envía el estado actual al conectar y luego cada cambio; un comentario
+    cada EVENTOS_HEARTBEAT segundos mantiene viva la conexión en proxies.
+    """
+    # EventSource no permite enviar cabeceras: se autentica con el ticket de
+    # un solo uso de ticket-eventos, nunca con el JWT en la URL
+    usuario = await usuario_ticket(request, f'envio:{pk}')
+    if usuario is None:
+        return JsonResponse({'detail': 'Credenciales de autenticación no válidas'}, status=401)
+    if not await _envio_visible(usuario, pk):
+        return JsonResponse({'detail': 'No encontrado'}, status=404)
+
+    # Bajo WSGI no hay loop que mantenga el stream abierto: se envía el estado
+    # actual y el frontend reconecta con un ticket nuevo (un sondeo lento)
+    en_vivo = isinstance(request, ASGIRequest)
+
+    async def flujo():
+        cola = difusor.suscribir(pk) if en_vivo else None
+        try:
+            yield f"retry: {settings.EVENTOS_RECONEXION_MS}\n\n"
+            # Estado inicial después de suscribirse: no se pierden cambios intermedios
+            yield _evento_sse(await sync_to_async(estado_envio)(pk))
+            while cola is not None:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=settings.EVENTOS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _evento_sse(evento)
+        finally:
+            if cola is not None:
+                difusor.cancelar(pk, cola)
+
+    response = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el stream en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@vista_asincrona(roles=['admin', 'conductor'])
+async def estado_verificacion_asincrono(request, pk):
+    """
+    estado-verificacion para el modo ASGI: una lectura de la fila del envío
+    con el ORM async (los contadores ya están en el envío).
+    """
+    envio = await Envio.objects.filter(pk=pk).afirst()
+    if envio is None:
+        return JsonResponse({'detail': 'No encontrado.'}, status=404)
+    return JsonResponse(EstadoVerificacionSerializer(envio).data)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('partners', '0004_alter_proveedor_nit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='proveedor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -10,6 +10,8 @@ class Proveedor(models.Model):
     direccion = models.CharField(blank=True, null=True, max_length=50)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Los PDFs muestran el nombre: se usa en la huella de los documentos (core/documentos.py)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['id']
@@ -28,6 +30,8 @@ class Cliente(models.Model):
     proveedores = models.ManyToManyField(Proveedor, related_name='clientes', blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Los PDFs muestran el nombre: se usa en la huella de los documentos (core/documentos.py)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['id']
@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from .models import Cliente, Proveedor
+from core.campos import CamposDinamicosMixin
 
-class ProveedorSerializer(serializers.ModelSerializer):
+class ProveedorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Proveedor
         fields = ['id','nombre','nit','email','telefono','direccion','ciudad','is_active','created_at']
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     proveedores = ProveedorSerializer(many=True, read_only=True)
     proveedores_ids = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -22,6 +23,8 @@ class ClienteSerializer(serializers.ModelSerializer):
             'id', 'nombre', 'nit', 'email', 'telefono', 'direccion', 'ciudad',
             'is_active', 'proveedores', 'proveedores_ids', 'created_at',
         ]
+        # Anidado que ?expand= puede omitir (core/campos.py)
+        expandibles = ('proveedores',)
 
 
     def create(self, validated_data):
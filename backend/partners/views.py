@@ -3,6 +3,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from .models import Cliente, Proveedor
 from .serializers import ClienteSerializer, ProveedorSerializer
 from .permissions import IsAdminOrReadOnlyForAuthenticated, IsAdminOrOperadorForCreate
+from core.campos import ConsultaPorCamposMixin
 
 class ProveedorViewSet(viewsets.ModelViewSet):
     queryset = Proveedor.objects.all().order_by('id')
@@ -26,8 +27,8 @@ class ProveedorViewSet(viewsets.ModelViewSet):
         return qs
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
-    queryset = Cliente.objects.all().order_by('id')
+class ClienteViewSet(ConsultaPorCamposMixin, viewsets.ModelViewSet):
+    queryset = Cliente.objects.prefetch_related('proveedores').order_by('id')
     serializer_class = ClienteSerializer
     permission_classes = [IsAdminOrOperadorForCreate]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
@@ -1,5 +1,6 @@
 // src/api/cargas.js
 import api from "./axios";
+import { esperarDocumento } from "./trabajos";
 
 export async function listCargas(params = {}) {
   const { 
@@ -88,63 +89,49 @@ export async function listUnidades(params = {}) {
   return res.data;
 }
 
-export async function descargarEtiquetasPorItem(cargaId, itemId) {
+// Las cargas grandes no se generan en el request: el servidor responde 202 con
+// un trabajo y el PDF se descarga cuando termina
+async function obtenerPdfEtiquetas(cargaId, params, mensaje404) {
   try {
     const response = await api.get(`/api/cargas/${cargaId}/etiquetas/`, {
-      params: { item_id: itemId },
+      params,
       responseType: "blob",
     });
-    
+
     // Verificar si la respuesta es un blob válido (PDF)
     if (response.data instanceof Blob && response.data.type === 'application/pdf') {
       return response.data;
-    } else {
-      // Si no es un PDF, podría ser un error JSON
-      const errorText = await response.data.text();
-      try {
-        const errorData = JSON.parse(errorText);
-        throw new Error(errorData.detail || errorData.error || 'Error al generar etiquetas');
-      } catch {
-        throw new Error('Respuesta inválida del servidor');
-      }
     }
+
+    // Si no es un PDF, es un trabajo encolado o un error JSON
+    const errorText = await response.data.text();
+    let data;
+    try {
+      data = JSON.parse(errorText);
+    } catch {
+      throw new Error('Respuesta inválida del servidor');
+    }
+    if (response.status === 202) {
+      return await esperarDocumento(data);
+    }
+    throw new Error(data.detail || data.error || 'Error al generar etiquetas');
   } catch (error) {
     if (error.response?.status === 403) {
       throw new Error('No tiene permisos para imprimir etiquetas de esta carga');
     }
     if (error.response?.status === 404) {
-      throw new Error('Carga o item no encontrado');
+      throw new Error(mensaje404);
     }
     throw error;
   }
 }
 
+export async function descargarEtiquetasPorItem(cargaId, itemId) {
+  return obtenerPdfEtiquetas(cargaId, { item_id: itemId }, 'Carga o item no encontrado');
+}
+
 export async function descargarEtiquetasDeCarga(cargaId) {
-  try {
-    const response = await api.get(`/api/cargas/${cargaId}/etiquetas/`, {
-      responseType: "blob",
-    });
-    
-    if (response.data instanceof Blob && response.data.type === 'application/pdf') {
-      return response.data;
-    } else {
-      const errorText = await response.data.text();
-      try {
-        const errorData = JSON.parse(errorText);
-        throw new Error(errorData.detail || errorData.error || 'Error al generar etiquetas');
-      } catch {
-        throw new Error('Respuesta inválida del servidor');
-      }
-    }
-  } catch (error) {
-    if (error.response?.status === 403) {
-      throw new Error('No tiene permisos para imprimir etiquetas de esta carga');
-    }
-    if (error.response?.status === 404) {
-      throw new Error('Carga no encontrada');
-    }
-    throw error;
-  }
+  return obtenerPdfEtiquetas(cargaId, {}, 'Carga no encontrada');
 }
 
 export function descargarBlobComoPDF(blob, filename) {
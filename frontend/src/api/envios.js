@@ -46,10 +46,21 @@ export const removerItemEnvio = async (envioId, itemId) => {
   return response.data;
 };
 
-export const getCargasPorCliente = async (clienteId) => {
-  const response = await api.get(
-    `/api/envios/cargas-por-cliente/?cliente_id=${clienteId}`
-  );
+// params: { solo_resumen: 1 } para el selector, { carga_id } para el detalle por producto
+export const getCargasPorCliente = async (clienteId, params = {}) => {
+  const response = await api.get("/api/envios/cargas-por-cliente/", {
+    params: { cliente_id: clienteId, ...params },
+  });
+  return response.data;
+};
+
+// Unidades disponibles paginadas por cursor: pasar `next` de la respuesta anterior
+export const getUnidadesDisponiblesCliente = async (clienteId, params = {}, next = null) => {
+  const response = next
+    ? await api.get(next)
+    : await api.get("/api/envios/cargas-por-cliente/unidades/", {
+        params: { cliente_id: clienteId, ...params },
+      });
   return response.data;
 };
 
@@ -301,11 +312,100 @@ export const escanearItemEntrega = async (
   return response.data;
 };
 
+// escaneos: [{ codigo_barra, fecha }] (fecha ISO del dispositivo, opcional)
+export const escanearLoteEntrega = async (
+  envioId,
+  escaneos,
+  escaneadoPor = ""
+) => {
+  const response = await api.post(`/api/envios/${envioId}/escanear-lote/`, {
+    escaneos,
+    escaneado_por: escaneadoPor || "Sistema",
+  });
+  return response.data;
+};
+
+// payload: { dispositivo, escaneos: [{ secuencia, envio, codigo_barra, fecha }], envios, desde }
+// La respuesta trae ultima_secuencia (hasta dónde se puede truncar el log local) y servidor_ts
+export const sincronizarEscaneos = async (payload) => {
+  const response = await api.post("/api/envios/sincronizar-escaneos/", payload);
+  return response.data;
+};
+
 export const obtenerEstadoVerificacion = async (envioId) => {
   const response = await api.get(`/api/envios/${envioId}/estado-verificacion/`);
   return response.data;
 };
 
+// Ticket de un solo uso (vence en ~60 s) para abrir el stream de eventos del envío
+export const obtenerTicketEventos = async (envioId) => {
+  const response = await api.post(`/api/envios/${envioId}/ticket-eventos/`);
+  return response.data.ticket;
+};
+
+// Progreso de verificación en tiempo real (SSE). EventSource no envía cabeceras:
+// la URL lleva un ticket de un solo uso, así que cada conexión pide uno nuevo.
+// El servidor solo avisa los escaneos atendidos por su propio proceso, por eso
+// onRefrescar se llama cuando el stream se corta o pasa `silencioMs` sin eventos:
+// la pantalla debe releer el estado. Retorna la función para cerrar la suscripción.
+export const suscribirEventosEnvio = (
+  envioId,
+  onEstado,
+  { onRefrescar, silencioMs = 30000, reconexionMs = 5000 } = {}
+) => {
+  let fuente = null;
+  let cerrado = false;
+  let vigilancia = null;
+  let reintento = null;
+
+  const vigilar = () => {
+    clearTimeout(vigilancia);
+    vigilancia = setTimeout(() => {
+      onRefrescar?.();
+      vigilar();
+    }, silencioMs);
+  };
+
+  const reconectar = () => {
+    fuente?.close();
+    fuente = null;
+    if (cerrado) return;
+    onRefrescar?.();
+    clearTimeout(reintento);
+    reintento = setTimeout(conectar, reconexionMs);
+  };
+
+  const conectar = async () => {
+    if (cerrado) return;
+    let ticket;
+    try {
+      ticket = await obtenerTicketEventos(envioId);
+    } catch (err) {
+      console.error("Error al obtener el ticket de eventos:", err.message);
+      reconectar();
+      return;
+    }
+    if (cerrado) return;
+    const url = `${import.meta.env.VITE_API_URL}/api/envios/${envioId}/eventos/?ticket=${encodeURIComponent(ticket)}`;
+    fuente = new EventSource(url);
+    fuente.addEventListener("estado", (evento) => {
+      vigilar();
+      onEstado(JSON.parse(evento.data));
+    });
+    // El ticket ya se canjeó: no dejar que EventSource reconecte con la misma URL
+    fuente.onerror = reconectar;
+  };
+
+  vigilar();
+  conectar();
+  return () => {
+    cerrado = true;
+    clearTimeout(vigilancia);
+    clearTimeout(reintento);
+    fuente?.close();
+  };
+};
+
 export const obtenerItemsPendientes = async (envioId) => {
   const response = await api.get(`/api/envios/${envioId}/items-pendientes/`);
   return response.data;
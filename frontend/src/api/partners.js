@@ -63,6 +63,8 @@ export async function deleteProvider(id) {
 
 /**
  * Clientes
+ *
+ * fields (opcional): campos a devolver, p.ej. "id,nombre" para selectores
  */
 export async function listClients(params = {}) {
   const {
@@ -72,6 +74,7 @@ export async function listClients(params = {}) {
     is_active = "",
     proveedores = "",
     ordering = "id",
+    fields = "",
   } = params;
   const res = await api.get("/api/partners/clientes/", {
     params: {
@@ -81,6 +84,7 @@ export async function listClients(params = {}) {
       is_active: is_active !== "" ? is_active : undefined,
       proveedores: proveedores || undefined,
       ordering,
+      fields: fields || undefined,
     },
   });
   return res.data;
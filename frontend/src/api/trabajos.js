@@ -0,0 +1,23 @@
+// src/api/trabajos.js
+import api from "./axios";
+
+const INTERVALO_MS = 2000;
+
+export async function getTrabajo(id) {
+  const res = await api.get(`/api/trabajos/${id}/`);
+  return res.data;
+}
+
+// Espera a que termine un documento encolado (respuesta 202) y retorna el PDF como blob
+export async function esperarDocumento(trabajo, { intervalo = INTERVALO_MS } = {}) {
+  let actual = trabajo;
+  while (actual.estado === "pendiente" || actual.estado === "en_proceso") {
+    await new Promise((resolve) => setTimeout(resolve, intervalo));
+    actual = await getTrabajo(actual.id);
+  }
+  if (actual.estado !== "completado") {
+    throw new Error(actual.error || "No se pudo generar el documento");
+  }
+  const res = await api.get(`/api/trabajos/${actual.id}/descargar/`, { responseType: "blob" });
+  return res.data;
+}
@@ -38,6 +38,12 @@ export async function deleteUser(id) {
   return res.data;
 }
 
+// Cierra todas las sesiones del usuario (revoca sus tokens)
+export async function revokeUserTokens(id) {
+  const res = await api.post(`/api/auth/usuarios/${id}/revocar-tokens/`);
+  return res.data;
+}
+
 // NUEVA FUNCIÓN: Obtener lista de clientes
 export async function listClientes(params = {}) {
   const { search = "", is_active = true } = params;
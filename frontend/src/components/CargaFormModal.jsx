@@ -90,7 +90,7 @@ export default function CargaFormModal({
       setLoadingOptions(true);
       try {
         const cData = await (listClients
-          ? listClients({ page: 1 })
+          ? listClients({ page: 1, fields: "id,nombre" })
           : Promise.resolve({ results: [] }));
         const clientsList = cData?.results || cData || [];
         if (!mounted) return;
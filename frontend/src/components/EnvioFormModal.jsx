@@ -91,6 +91,7 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
           page: 1,
           search: "",
           is_active: true,
+          fields: "id,nombre,nit",
         });
         const clients = data.results || data;
         setClientOptions(
@@ -518,7 +519,7 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
     if (!form.cliente) return;
     setLoadingCargas(true);
     try {
-      const data = await getCargasPorCliente(form.cliente);
+      const data = await getCargasPorCliente(form.cliente, { solo_resumen: 1 });
       setCargasDisponibles(data);
     } catch (err) {
       console.error("Error al cargar cargas:", err);
@@ -533,6 +534,21 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
     }
   }, [modoManual, form.cliente]);
 
+  // El detalle por producto se pide solo para la carga elegida
+  const seleccionarCarga = async (carga) => {
+    if (!carga) {
+      setCargaSeleccionada(null);
+      return;
+    }
+    setCargaSeleccionada({ ...carga, productos: [] });
+    try {
+      const [detalle] = await getCargasPorCliente(form.cliente, { carga_id: carga.carga_id });
+      setCargaSeleccionada({ ...carga, productos: detalle?.productos || [] });
+    } catch (err) {
+      console.error("Error al cargar productos de la carga:", err);
+    }
+  };
+
   const handleManualQtyChange = (cargaId, productoId, qty, valor_unitario, productoNombre) => {
     const numQty = parseInt(qty) || 0;
     
@@ -820,10 +836,10 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
                   isLoading={loadingCargas}
                   options={cargasDisponibles.map(c => ({ 
                     value: c.carga_id, 
-                    label: `Remisión: ${c.remision} - ${c.proveedor}`,
+                    label: `Remisión: ${c.remision} - ${c.proveedor} (${c.total_disponibles} disponibles)`,
                     data: c
                   }))}
-                  onChange={(selected) => setCargaSeleccionada(selected ? selected.data : null)}
+                  onChange={(selected) => seleccionarCarga(selected ? selected.data : null)}
                   placeholder="Buscar carga para seleccionar productos..."
                   className="text-sm shadow-sm"
                   styles={{
@@ -848,16 +864,8 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
                         </tr>
                       </thead>
                       <tbody className="divide-y divide-gray-100">
-                        {/* Agrupar unidades por producto */}
-                        {Object.values(
-                          cargaSeleccionada.unidades_disponibles.reduce((acc, u) => {
-                            if (!acc[u.producto_id]) {
-                              acc[u.producto_id] = { ...u, cant_disp: 0 };
-                            }
-                            acc[u.producto_id].cant_disp += 1;
-                            return acc;
-                          }, {})
-                        ).map((prod) => {
+                        {/* Disponibles por producto (agrupados en el backend) */}
+                        {cargaSeleccionada.productos.map((prod) => {
                           const itemManual = form.manual_items.find(
                             mi => mi.carga_id === cargaSeleccionada.carga_id && mi.producto_id === prod.producto_id
                           );
@@ -870,14 +878,14 @@ export default function EnvioFormModal({ open, onClose, onSubmit, editing }) {
                               </td>
                               <td className="px-4 py-3 text-center">
                                 <span className="inline-flex items-center px-2 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800">
-                                  {prod.cant_disp}
+                                  {prod.disponibles}
                                 </span>
                               </td>
                               <td className="px-4 py-3 text-center">
                                 <input
                                   type="number"
                                   min="0"
-                                  max={prod.cant_disp}
+                                  max={prod.disponibles}
                                   value={itemManual?.cantidad || ""}
                                   onChange={(e) => handleManualQtyChange(
                                     cargaSeleccionada.carga_id, 
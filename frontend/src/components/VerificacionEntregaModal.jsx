@@ -1,6 +1,7 @@
 import { useState, useEffect, useRef } from "react";
 import Modal from "./Modal";
 import api from "../api/axios";
+import { suscribirEventosEnvio } from "../api/envios";
 import {
   RiQrScanLine,
   RiCheckboxCircleLine,
@@ -46,6 +47,11 @@ const VerificacionEntregaModal = ({
 
   const inputRef = useRef(null);
   const mensajeTimeoutRef = useRef(null);
+  const pendientesRef = useRef([]);
+
+  useEffect(() => {
+    pendientesRef.current = itemsPendientes;
+  }, [itemsPendientes]);
 
   useEffect(() => {
     if (isOpen && envio) {
@@ -58,6 +64,27 @@ const VerificacionEntregaModal = ({
     };
   }, [isOpen, envio]);
 
+  // El progreso llega por push: solo se recarga la lista si cambió desde otro dispositivo.
+  // Si el stream se corta o queda en silencio se relee el estado por la API
+  useEffect(() => {
+    if (!isOpen || !envio?.id) return;
+    const aplicarEstado = (data) => {
+      setEstado(data);
+      if (pendientesRef.current.length !== data.items_pendientes) {
+        cargarItemsPendientes();
+      }
+    };
+    const refrescar = async () => {
+      try {
+        const res = await api_estadoVerificacion(envio.id);
+        aplicarEstado(res.data);
+      } catch (err) {
+        console.error("Error al refrescar el estado de verificación:", err);
+      }
+    };
+    return suscribirEventosEnvio(envio.id, aplicarEstado, { onRefrescar: refrescar });
+  }, [isOpen, envio]);
+
   // Auto-focus input cuando abre
   useEffect(() => {
     if (isOpen && inputRef.current) {
@@ -83,6 +110,15 @@ const VerificacionEntregaModal = ({
     }
   };
 
+  const cargarItemsPendientes = async () => {
+    try {
+      const res = await api_itemsPendientes(envio.id);
+      setItemsPendientes(res.data.pendientes || []);
+    } catch (err) {
+      console.error("Error al cargar items pendientes:", err);
+    }
+  };
+
   const mostrarMensaje = (texto, tipo = "info") => {
     setMensaje(texto);
     setTipoMensaje(tipo);
@@ -116,7 +152,10 @@ const VerificacionEntregaModal = ({
           ? ` (${Math.round(resultado.porcentaje)}% completado)`
           : "";
         mostrarMensaje(`✓ Item escaneado correctamente${pct}`, "success");
-        await cargarDatosVerificacion();
+        // El estado llega por el stream de eventos; la lista se actualiza localmente
+        setItemsPendientes((actuales) =>
+          actuales.filter((item) => item.codigo_barra !== codigo)
+        );
       }
     } catch (err) {
       let errorMsg = "Error al escanear el código.";
@@ -88,6 +88,17 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    // Revoca los tokens en el backend; la sesión local se cierra igual si falla.
+    // El header va explícito: el interceptor corre después de borrar el storage
+    const access = localStorage.getItem('access');
+    const refresh = localStorage.getItem('refresh');
+    if (access) {
+      api
+        .post('/api/auth/logout/', refresh ? { refresh } : {}, {
+          headers: { Authorization: `Bearer ${access}` },
+        })
+        .catch(() => {});
+    }
     localStorage.removeItem('access');
     localStorage.removeItem('refresh');
     setUser(null);
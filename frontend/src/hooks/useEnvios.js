@@ -65,7 +65,7 @@ export const useEnvios = () => {
     try {
       const data = await createEnvio(payload);
       // Después de crear, hacer refresh completo
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -115,7 +115,7 @@ export const useEnvios = () => {
     try {
       await deleteEnvio(id);
       // Hacer refresh completo después de eliminar
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -135,7 +135,7 @@ export const useEnvios = () => {
     try {
       const data = await agregarItemEnvio(envioId, payload);
       // Hacer refresh completo
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -155,7 +155,7 @@ export const useEnvios = () => {
     try {
       const data = await removerItemEnvio(envioId, itemId);
       // Hacer refresh completo
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -188,7 +188,7 @@ export const useEnvios = () => {
     try {
       const data = await cambiarEstadoEnvio(envioId, estado);
       // Hacer refresh completo
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -246,7 +246,7 @@ export const useEnvios = () => {
         );
 
         // Hacer refresh completo
-        const refreshedData = await listEnvios();
+        const refreshedData = await listEnvios({ page: 1 });
         const enviosRefreshed = refreshedData.results || refreshedData;
 
         setEnvios(enviosRefreshed);
@@ -295,7 +295,7 @@ export const useEnvios = () => {
       const data = await forzarCompletarEntrega(envioId);
 
       // Hacer refresh completo
-      const refreshedData = await listEnvios();
+      const refreshedData = await listEnvios({ page: 1 });
       const enviosRefreshed = refreshedData.results || refreshedData;
 
       setEnvios(enviosRefreshed);
@@ -5,6 +5,7 @@ import { useAuth } from "../context/AuthContext";
 import EnvioFormModal from "../components/EnvioFormModal";
 import VerificacionEntregaModal from "../components/VerificacionEntregaModal";
 import api from "../api/axios";
+import { suscribirEventosEnvio } from "../api/envios";
 import toast from "react-hot-toast";
 import {
   RiTruckLine,
@@ -123,6 +124,22 @@ export default function EnvioDetailPage() {
     }
   }, [id, getEnvio]);
 
+  // Cambios de estado en vivo (p. ej. entrega completada desde el celular del conductor)
+  useEffect(() => {
+    if (!id) return;
+    return suscribirEventosEnvio(parseInt(id), (data) => {
+      setEnvio((actual) =>
+        actual && actual.estado !== data.estado
+          ? {
+              ...actual,
+              estado: data.estado,
+              fecha_entrega_verificada: data.fecha_entrega_verificada,
+            }
+          : actual
+      );
+    });
+  }, [id]);
+
   const reloadEnvioDetails = async () => {
     try {
       setLoadingEnvio(true);
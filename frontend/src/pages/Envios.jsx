@@ -8,6 +8,7 @@ import EscaneoMasivoModal from "../components/EscaneoMasivoModal";
 import VerificacionEntregaModal from "../components/VerificacionEntregaModal"; // Importar el nuevo modal
 import { useNavigate } from "react-router-dom";
 import toast from "react-hot-toast";
+import { getEnvio } from "../api/envios";
 import {
   RiAddLine,
   RiSearchLine,
@@ -108,8 +109,21 @@ export default function Envios() {
     };
   }, [search]);
 
-  const handleViewDetail = (envio) => {
-    setSelectedEnvio(envio);
+  // El listado trae solo el resumen del envío: el detalle y la edición necesitan los items
+  const cargarDetalle = async (envio) => {
+    try {
+      return await getEnvio(envio.id);
+    } catch (err) {
+      console.error("Error loading envio:", err);
+      toast.error("No se pudo cargar el envío");
+      return null;
+    }
+  };
+
+  const handleViewDetail = async (envio) => {
+    const detalle = await cargarDetalle(envio);
+    if (!detalle) return;
+    setSelectedEnvio(detalle);
     setOpenDetail(true);
   };
 
@@ -161,8 +175,10 @@ export default function Envios() {
     setOpenForm(true);
   };
 
-  const handleEdit = (envio) => {
-    setEditing(envio);
+  const handleEdit = async (envio) => {
+    const detalle = await cargarDetalle(envio);
+    if (!detalle) return;
+    setEditing(detalle);
     setOpenForm(true);
   };
 
@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from "react";
-import { listUsers, createUser, updateUser, deleteUser } from "../api/users";
+import { listUsers, createUser, updateUser, deleteUser, revokeUserTokens } from "../api/users";
 import UserFormModal from "../components/UserFormModal";
 import ConfirmDialog from "../components/ConfirmDialog";
 import toast from "react-hot-toast";
@@ -18,6 +18,7 @@ import {
   RiArrowLeftSLine,
   RiArrowRightSLine,
   RiShieldUserLine,
+  RiLogoutBoxRLine,
   RiUserStarLine,
   RiBuildingLine,
   RiInformationLine
@@ -424,6 +425,19 @@ export default function Users() {
                               <RiCheckboxCircleLine />
                             )}
                           </button>
+                          <button
+                            onClick={async () => {
+                              try {
+                                await revokeUserTokens(u.id);
+                                toast.success(`Sesiones de ${u.username} cerradas`);
+                              } catch (err) {
+                                toast.error("No se pudieron cerrar las sesiones");
+                              }
+                            }}
+                            className="p-2 text-gray-500 hover:text-purple-600 hover:bg-purple-50 rounded-lg transition-colors"
+                            title="Cerrar todas las sesiones">
+                            <RiLogoutBoxRLine className="text-lg" />
+                          </button>
                           <button
                             onClick={() => askDelete(u)}
                             className="p-2 text-gray-500 hover:text-red-600 hover:bg-red-50 rounded-lg transition-colors"